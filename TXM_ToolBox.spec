@@ -6,7 +6,7 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[],
-    hiddenimports=[],
+    hiddenimports=['src.logic.app_context', 'src.logic.image_container', 'src.logic.workers', 'src.logic.utils', 'src.logic.decorators'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
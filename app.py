@@ -1,5 +1,7 @@
 import os
 import sys
+import time
+import numpy as np
 sys.path.append(os.path.join(os.path.dirname(__file__), '.')) 
 from PyQt5.QtWidgets import QProgressDialog, QApplication, QMainWindow, QFileDialog, QMessageBox, QDialog
 from PyQt5.QtGui import QImage, QPixmap, QFont
@@ -7,9 +9,10 @@ from PyQt5.QtCore import Qt, QTimer
 from src.gui import (AlignViewer, ContrastDialog, FBPViewer,
                      FBPResolutionDialog, MosaicPreviewDialog, ShiftDialog, 
                      ReferenceModeDialog, SplitSliderDialog, resolve_duplicates)
+from src.gui.iterative_dialog import IterativeSettingsDialog
 from src.gui.main_window import Ui_TXM_ToolBox
-from src.logic import (AppContext, TXM_Images, FBPWorker, data_io, 
-                       norm_to_8bit, find_duplicate_angles, angle_sort, handle_errors)
+from src.logic import (AppContext, TXM_Images, FBPWorker, ProgressiveFBPWorker, IterativeWorker, JobSubmitWorker,
+                       data_io, jobs, norm_to_8bit, find_duplicate_angles, angle_sort, handle_errors)
 
 
 class TXM_ToolBox(QMainWindow):
@@ -29,6 +32,13 @@ class TXM_ToolBox(QMainWindow):
         self.resize_timer.setSingleShot(True)
         self.resize_timer.timeout.connect(self.adjust_aspect_ratio)
 
+        # 送到本機工作伺服器的重建：job id -> 輸入檔路徑
+        self.pending_jobs = {}
+        self.submit_workers = []
+        self.job_timer = QTimer(self)
+        self.job_timer.setInterval(1000)
+        self.job_timer.timeout.connect(self.poll_jobs)
+
         self.ui.imageSlider.valueChanged.connect(self.update_image)
         self.ui.action_tomo_txrm.triggered.connect(self.load_tomo_txrm)
         self.ui.action_multi_txrm.triggered.connect(self.load_multiple_txrm)
@@ -45,6 +55,8 @@ class TXM_ToolBox(QMainWindow):
         self.ui.action_adjust_contrast.triggered.connect(self.open_contrast_dialog)
         self.ui.action_alignment.triggered.connect(self.open_align_viewer)
         self.ui.action_reconstruction.triggered.connect(self.get_fbp_result)
+        self.ui.action_ML_EM.triggered.connect(self.get_iterative_result)
+        self.ui.action_live_recon.triggered.connect(self.open_live_recon)
         self.ui.action_full_view.triggered.connect(self.mosaic_stitching)
 
     def resizeEvent(self, event):
@@ -197,7 +209,7 @@ class TXM_ToolBox(QMainWindow):
         self.ui.action_adjust_contrast.setEnabled(True)
         self.ui.action_alignment.setEnabled(self.context.mode == 'tomo')
         self.ui.action_reconstruction.setEnabled(self.context.mode == 'tomo')
-        self.ui.action_ML_EM.setEnabled(self.context.mode == 'tomo' and self.context.ai_available)
+        self.ui.action_ML_EM.setEnabled(self.context.mode == 'tomo')
         self.ui.action_full_view.setEnabled(self.context.mode == 'mosaic')
         self.ui.actionAI_Reference.setEnabled(self.context.ai_available)
 
@@ -246,20 +258,149 @@ class TXM_ToolBox(QMainWindow):
         original_size = self.context.get_image_size()  # （高度、寬度）
 
         # 顯示解析度選擇對話框。
-        resolution_dialog = FBPResolutionDialog(original_size, self)
+        resolution_dialog = FBPResolutionDialog(original_size, self, images=img_array,
+                                                angles=self.context.images.angles,
+                                                center_offset=self.context.images.rotation_center_offset)
         if resolution_dialog.exec_() != QDialog.Accepted:
             return 
 
         target_size = resolution_dialog.get_size()
         angle_interval = resolution_dialog.get_angle_interval()
         astra_available = resolution_dialog.get_astra_available()
-        self.worker = FBPWorker(img_array, self.context.images.angles, target_size, angle_interval, astra_available)
+        self.context.images.rotation_center_offset = resolution_dialog.get_center_offset()
+        if resolution_dialog.get_submit_job():
+            self.submit_fbp_job(resolution_dialog)
+            return
+        worker_class = ProgressiveFBPWorker if resolution_dialog.get_progressive() else FBPWorker
+        self.worker = worker_class(img_array, self.context.images.angles, target_size, angle_interval, astra_available,
+                                   backend=resolution_dialog.get_backend(),
+                                   interpolation=resolution_dialog.get_interpolation(),
+                                   filter_name=resolution_dialog.get_filter_name(),
+                                   cutoff=resolution_dialog.get_cutoff(),
+                                   center_offset=self.context.images.rotation_center_offset,
+                                   rows=resolution_dialog.get_rows(), roi=resolution_dialog.get_roi(),
+                                   n_workers=resolution_dialog.get_n_workers(),
+                                   checkpoint=resolution_dialog.get_checkpoint(), cache=True)
+        if resolution_dialog.get_progressive():
+            self.start_progressive_reconstruction()
+        else:
+            self.start_reconstruction("FBP Reconstruction")
+
+    def submit_fbp_job(self, resolution_dialog):
+        """在背景執行緒將目前的投影存成 .npy 並送到本機工作伺服器，重建期間介面可繼續操作。"""
+        input_dir = os.path.join(os.path.expanduser("~"), ".txm_toolbox", "job_inputs")
+        os.makedirs(input_dir, exist_ok=True)
+        name = self.context.sample_name or "txm"
+        stack = os.path.join(input_dir, f"{name}_{time.strftime('%Y%m%d-%H%M%S')}.npy")
+
+        rows, roi = resolution_dialog.get_rows(), resolution_dialog.get_roi()
+        spec = {
+            'stack': stack,
+            'angles': np.asarray(self.context.images.angles, dtype=float).tolist(),
+            'name': name,
+            'output_dir': os.path.abspath(self.context.last_save_dir),
+            'align': {'method': 'none'},  # 目前的影像已完成校正與對齊
+            'reconstruction': {
+                'target_size': resolution_dialog.get_size(),
+                'angle_interval': resolution_dialog.get_angle_interval(),
+                'backend': resolution_dialog.get_backend(),
+                'interpolation': resolution_dialog.get_interpolation(),
+                'filter_name': resolution_dialog.get_filter_name(),
+                'cutoff': resolution_dialog.get_cutoff(),
+                'center_offset': self.context.images.rotation_center_offset,
+                'rows': None if rows is None else list(rows),
+                'roi': None if roi is None else list(roi),
+                'workers': resolution_dialog.get_n_workers(),
+                'checkpoint': resolution_dialog.get_checkpoint(),
+            },
+            'export': {'reconstruction': True, 'volume': True},
+        }
+        worker = JobSubmitWorker(self.context.get_images(), spec)
+        worker.finished.connect(lambda job_id: self.job_submitted(job_id, stack))
+        worker.failed.connect(lambda message: QMessageBox.warning(self, "Reconstruction Job",
+                                                                  f"Submitting the job failed:\n{message}"))
+        for signal in (worker.finished, worker.failed):
+            signal.connect(lambda *_: (worker.wait(), self.submit_workers.remove(worker)))
+        self.submit_workers.append(worker)
+        self.ui.statusBar.showMessage(f"Saving projections for the reconstruction job to {stack} ...")
+        worker.start()
+
+    def job_submitted(self, job_id, stack):
+        self.pending_jobs[job_id] = stack
+        self.ui.statusBar.showMessage(f"Reconstruction job {job_id} queued")
+        self.job_timer.start()
+
+    def poll_jobs(self):
+        """更新工作伺服器上重建工作的狀態，完成後開啟 FBPViewer。"""
+        messages = []
+        for job_id, stack in list(self.pending_jobs.items()):
+            try:
+                status = jobs.job_status(job_id)
+            except Exception:
+                messages.append(f"{job_id}: server not reachable")
+                continue
+
+            state = status['state']
+            if state not in jobs.FINAL_STATES:
+                messages.append(f"{status.get('name')}: {state} {status.get('progress', 0)}%")
+                continue
+
+            del self.pending_jobs[job_id]
+            if os.path.exists(stack):
+                os.remove(stack)
+            if state == jobs.DONE:
+                outputs = (status.get('result') or {}).get('outputs') or []
+                volume = [p for p in outputs if p.endswith('.npy')]
+                if volume:
+                    viewer = FBPViewer(np.load(volume[0]), self)
+                    viewer.setAttribute(Qt.WA_DeleteOnClose)
+                    viewer.show()
+                    messages.append(f"{status.get('name')}: done, TIFs saved to {outputs[0]}")
+                else:
+                    QMessageBox.information(self, "Reconstruction Job",
+                                            f"Job {job_id} done without a volume to display.\nOutputs:\n" +
+                                            ("\n".join(outputs) or "(none)"))
+                    messages.append(f"{status.get('name')}: done")
+            else:
+                QMessageBox.warning(self, "Reconstruction Job", f"Job {job_id} {state}:\n{status.get('message')}")
+
+        if not self.pending_jobs:
+            self.job_timer.stop()
+        self.ui.statusBar.showMessage("  |  ".join(messages))
 
-        # 顯示進度對話框。
+    @handle_errors(title="Reconstruction Error")
+    def get_iterative_result(self, *args):
+        """在背景執行緒啟動 OS-EM / SIRT 迭代重建"""
+        img_array = self.context.get_images()
+        original_size = self.context.get_image_size()
+
+        settings_dialog = IterativeSettingsDialog(original_size, self,
+                                                  transmission=self.context.images.ref is not None)
+        if settings_dialog.exec_() != QDialog.Accepted:
+            return
+
+        self.worker = IterativeWorker(img_array, self.context.images.angles, settings_dialog.get_size(),
+                                      settings_dialog.get_angle_interval(),
+                                      center_offset=self.context.images.rotation_center_offset,
+                                      rows=settings_dialog.get_rows(), checkpoint=True, cache=True,
+                                      **settings_dialog.get_params())
+        self.start_reconstruction("Iterative Reconstruction")
+
+    def open_live_recon(self, *args):
+        """開啟即時重建視窗（非強制回應），擷取中的投影到達時即更新預覽。"""
+        from src.gui.live_recon_dialog import LiveReconDialog
+
+        center_offset = self.context.images.rotation_center_offset if self.context.images is not None else 0.0
+        dialog = LiveReconDialog(self.context.last_load_dir, self, center_offset=center_offset)
+        dialog.setAttribute(Qt.WA_DeleteOnClose)
+        dialog.show()
+
+    def start_reconstruction(self, title):
+        """顯示進度對話框並啟動 self.worker，完成後以 FBPViewer 顯示結果"""
         self.progress_dialog = QProgressDialog(
             "Reconstructing...", None, 0, 100, self
         )
-        self.progress_dialog.setWindowTitle("FBP Reconstruction")
+        self.progress_dialog.setWindowTitle(title)
         self.progress_dialog.setWindowModality(Qt.WindowModal)
         self.progress_dialog.setFixedSize(350, 100)
         self.progress_dialog.canceled.connect(self.worker.cancel) 
@@ -273,6 +414,31 @@ class TXM_ToolBox(QMainWindow):
         self.worker.finished.connect(lambda recon: (self.progress_dialog.close(), FBPViewer(recon, self).exec_()))
         self.worker.start()
 
+    def start_progressive_reconstruction(self):
+        """啟動漸進式重建：第一個預覽即開啟 FBPViewer，之後持續更新；關閉檢視器即取消。"""
+        self.fbp_viewer = None
+        shown = {'label': ""}
+
+        def show_preview(recon, status):
+            shown['label'] = status
+            if self.fbp_viewer is None:
+                self.fbp_viewer = FBPViewer(recon, self)
+                self.fbp_viewer.finished.connect(lambda *_: self.worker.cancel())
+                self.fbp_viewer.set_status(status)
+                self.fbp_viewer.show()
+            else:
+                self.fbp_viewer.update_volume(recon, status)
+
+        def show_progress(p, remaining):
+            if self.fbp_viewer is not None and shown['label']:
+                self.fbp_viewer.set_status(
+                    f"{shown['label']}  |  refining stage {self.worker.stage + 1}/{len(self.worker.stages)}: {p}%")
+
+        self.worker.preview.connect(show_preview)
+        self.worker.progress.connect(show_progress)
+        self.worker.finished.connect(lambda recon: show_preview(recon, None))
+        self.worker.start()
+
     @handle_errors(title="Mosaic Stitching Error")
     def mosaic_stitching(self, *args):
         mosaic = self.context.images.get_mosaic()
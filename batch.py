@@ -0,0 +1,51 @@
+"""
+Headless batch processing: load -> reference -> align -> reconstruct -> export.
+
+    python batch.py config.json
+    python batch.py config.json --workers 4 --output-dir D:/beamtime/recon
+    python batch.py --write-config config.json
+
+Runs without PyQt5; see src/logic/pipeline.py for the configuration keys.
+"""
+import sys
+import json
+import argparse
+import logging
+from src.logic.pipeline import DEFAULT_CONFIG, load_config, run_batch
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="TXM ToolBox batch reconstruction")
+    parser.add_argument("config", help="JSON configuration file")
+    parser.add_argument("--write-config", action="store_true",
+                        help="write the default configuration to CONFIG and exit")
+    parser.add_argument("-j", "--workers", type=int, help="number of scans processed in parallel")
+    parser.add_argument("-o", "--output-dir", help="override output_dir of the configuration")
+    parser.add_argument("inputs", nargs="*", help="override the inputs of the configuration (paths or globs)")
+    args = parser.parse_args(argv)
+
+    if args.write_config:
+        with open(args.config, 'w', encoding='utf-8') as f:
+            json.dump(DEFAULT_CONFIG, f, indent=2)
+        print(f"Default configuration written to {args.config}")
+        return 0
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(message)s")
+    config = load_config(args.config)
+    if args.workers:
+        config['workers'] = args.workers
+    if args.output_dir:
+        config['output_dir'] = args.output_dir
+    if args.inputs:
+        config['inputs'] = args.inputs
+
+    results = run_batch(config)
+    failed = [r for r in results if r['status'] != 'done']
+    print(f"{len(results) - len(failed)} of {len(results)} scan(s) done")
+    for r in failed:
+        print(f"  {r['scan']}: {r['error']}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,31 @@
+"""
+Local reconstruction job server.
+
+    python job_server.py                    # http://127.0.0.1:8765, cpu_count // 2 workers
+    python job_server.py --port 9000 --workers 6 --spool D:/txm_jobs
+
+Jobs are JSON specs POSTed to /jobs (see src/logic/jobs.py); the GUI submits
+FBP jobs here when "Submit to job server" is ticked. Progress and results are
+written to <spool>/<job id>/status.json.
+"""
+import sys
+import argparse
+import logging
+from src.logic.jobs import DEFAULT_PORT, SPOOL_DIR, serve
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="TXM ToolBox reconstruction job server")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, help="jobs run at once (default: half of the CPU cores)")
+    parser.add_argument("--spool", default=SPOOL_DIR, help="directory of the job folders")
+    parser.add_argument("--host", default="127.0.0.1", help="interface to listen on (default: local only)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    serve(args.port, args.spool, args.workers, args.host)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+import numpy as np
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QDoubleSpinBox,
+                             QSpinBox, QListWidget, QListWidgetItem, QListView, QProgressBar,
+                             QDialogButtonBox)
+from PyQt5.QtCore import Qt, QSize
+from PyQt5.QtGui import QImage, QPixmap, QIcon, QFont
+from src.logic.workers import CenterSweepWorker
+from src.logic.utils import norm_to_8bit
+
+
+class CenterSweepDialog(QDialog):
+    """旋轉中心搜尋：以多個候選中心重建單一切片並以圖庫比較。"""
+    FONT_CTRL = QFont('Calibri', 12)
+    THUMB_SIZE = 180
+
+    def __init__(self, images, angles, target_size, angle_interval=1.0, center_offset=0.0, parent=None,
+                 filter_name='hann', cutoff=1.0):
+        """
+        Args:
+            images: 投影影像 (N, H, W)
+            angles: 每個投影的旋轉角度 (可為 None)
+            target_size: 重建目標解析度
+            angle_interval: 角度間隔（度）
+            center_offset: 目前的旋轉中心偏移（原始偵測器像素）
+            filter_name, cutoff: FBP 濾波器與截止頻率
+        """
+        super().__init__(parent)
+        self.setWindowTitle("Rotation Center Search")
+        self.setFixedSize(1000, 760)
+        self.setFont(self.FONT_CTRL)
+
+        self.images = images
+        self.angles = angles
+        self.target_size = target_size
+        self.angle_interval = angle_interval
+        self.center_offset = center_offset
+        self.filter_name = filter_name
+        self.cutoff = cutoff
+        self.offsets = np.array([])
+        self.worker = None
+
+        n, h, w = images.shape
+        # 搜尋範圍每一步對應重建解析度下約 0.5 像素
+        step = max(0.5, round(w / target_size) / 2)
+
+        layout = QVBoxLayout(self)
+        ctrl_layout = QHBoxLayout()
+
+        self.from_spinbox = self._offset_spinbox(w, center_offset - 20 * step)
+        self.to_spinbox = self._offset_spinbox(w, center_offset + 20 * step)
+        self.step_spinbox = QDoubleSpinBox()
+        self.step_spinbox.setRange(0.5, w / 4)
+        self.step_spinbox.setSingleStep(0.5)
+        self.step_spinbox.setValue(step)
+
+        self.row_spinbox = QSpinBox()
+        self.row_spinbox.setRange(0, h - 1)
+        self.row_spinbox.setValue(h // 2)
+
+        self.run_btn = QPushButton("Run Sweep")
+        self.run_btn.clicked.connect(self.run_sweep)
+
+        for text, widget in (("Offset from:", self.from_spinbox), ("to:", self.to_spinbox),
+                             ("step:", self.step_spinbox), ("Slice row:", self.row_spinbox)):
+            ctrl_layout.addWidget(QLabel(text))
+            ctrl_layout.addWidget(widget)
+        ctrl_layout.addStretch()
+        ctrl_layout.addWidget(self.run_btn)
+        layout.addLayout(ctrl_layout)
+
+        self.gallery = QListWidget()
+        self.gallery.setViewMode(QListView.IconMode)
+        self.gallery.setIconSize(QSize(self.THUMB_SIZE, self.THUMB_SIZE))
+        self.gallery.setResizeMode(QListView.Adjust)
+        self.gallery.setMovement(QListView.Static)
+        self.gallery.setSpacing(6)
+        self.gallery.currentRowChanged.connect(self.select_offset)
+        self.gallery.itemDoubleClicked.connect(lambda item: self.accept())
+        layout.addWidget(self.gallery, stretch=1)
+
+        self.status_label = QLabel(f"Current offset: {center_offset:+.1f} px (reconstruction size {target_size})")
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        status_layout = QHBoxLayout()
+        status_layout.addWidget(self.status_label, stretch=1)
+        status_layout.addWidget(self.progress_bar)
+        layout.addLayout(status_layout)
+
+        button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        button_box.accepted.connect(self.accept)
+        button_box.rejected.connect(self.reject)
+        layout.addWidget(button_box)
+
+    def _offset_spinbox(self, width, value):
+        spinbox = QDoubleSpinBox()
+        spinbox.setRange(-width / 2, width / 2)
+        spinbox.setSingleStep(0.5)
+        spinbox.setDecimals(1)
+        spinbox.setSuffix(" px")
+        spinbox.setValue(value)
+        return spinbox
+
+    def run_sweep(self):
+        """在背景執行緒重建所有候選中心。"""
+        start, stop = self.from_spinbox.value(), self.to_spinbox.value()
+        step = self.step_spinbox.value()
+        if stop < start:
+            start, stop = stop, start
+        self.offsets = np.arange(start, stop + step / 2, step)
+
+        self.run_btn.setEnabled(False)
+        self.gallery.clear()
+        self.progress_bar.setValue(0)
+        self.worker = CenterSweepWorker(self.images, self.angles, self.target_size, self.offsets,
+                                        [self.row_spinbox.value()], self.angle_interval,
+                                        filter_name=self.filter_name, cutoff=self.cutoff)
+        self.worker.progress.connect(lambda p, r: (self.progress_bar.setValue(p), self.status_label.setText(r)))
+        self.worker.finished.connect(self.show_results)
+        self.worker.start()
+
+    def show_results(self, recon, scores):
+        """以縮圖顯示各候選中心的重建切片，並預選分數最高者。"""
+        self.run_btn.setEnabled(True)
+        best = int(np.argmax(scores))
+        for i, (offset, score) in enumerate(zip(self.offsets, scores)):
+            img = np.ascontiguousarray(norm_to_8bit(np.nan_to_num(recon[i, 0])))
+            h, w = img.shape
+            qimg = QImage(img.data, w, h, w, QImage.Format_Grayscale8)
+            pixmap = QPixmap.fromImage(qimg).scaled(self.THUMB_SIZE, self.THUMB_SIZE, Qt.KeepAspectRatio,
+                                                    Qt.SmoothTransformation)
+            mark = "★ " if i == best else ""
+            item = QListWidgetItem(QIcon(pixmap), f"{mark}{offset:+.1f} px\nscore {score:.3f}")
+            item.setTextAlignment(Qt.AlignHCenter)
+            self.gallery.addItem(item)
+        self.gallery.setCurrentRow(best)
+        self.gallery.scrollToItem(self.gallery.item(best))
+
+    def select_offset(self, row):
+        if 0 <= row < len(self.offsets):
+            self.center_offset = float(self.offsets[row])
+            self.status_label.setText(f"Selected offset: {self.center_offset:+.1f} px")
+
+    def get_center_offset(self):
+        """取得選定的旋轉中心偏移（原始偵測器像素）。"""
+        return self.center_offset
+
+    def done(self, result):
+        if self.worker is not None and self.worker.isRunning():
+            self.worker.cancel()
+            self.worker.wait()
+        super().done(result)
@@ -1,8 +1,9 @@
 import numpy as np
-from PyQt5.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QLabel
-from PyQt5.QtGui import QImage, QPixmap
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QTableWidget, QTableWidgetItem,
+                             QComboBox, QDialogButtonBox, QHeaderView, QAbstractItemView)
+from PyQt5.QtGui import QImage, QPixmap, QFont
 from PyQt5.QtCore import Qt
-from src.logic.utils import norm_to_8bit
+from src.logic.utils import norm_to_8bit, auto_select_duplicates
 
 
 class DuplicateAngleResolver(QDialog):
@@ -16,7 +17,8 @@ class DuplicateAngleResolver(QDialog):
 
         for i, (img, fname) in enumerate(zip(images, file_names)):
             label = QLabel()
-            img = img / ref
+            if ref is not None:
+                img = img / ref
             img8 = norm_to_8bit(img)
             h, w = img8.shape
             qimg = QImage(img8.data, w, h, w, QImage.Format_Grayscale8)
@@ -46,20 +48,98 @@ class DuplicateAngleResolver(QDialog):
         return self.selected_idx
 
 
-def resolve_duplicates(images, thetas, duplicates, ref, file_names):
-    selected_indices = set()  # 收集選中索引
+class DuplicateSummaryDialog(QDialog):
+    """自動挑選結果總覽；可逐組改選，雙擊列可開啟影像比較。"""
+
+    def __init__(self, images, thetas, duplicates, ref, file_names, choices, metrics, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(f"Duplicate Angles - {len(duplicates)} groups auto-resolved")
+        self.resize(900, 600)
+        self.setFont(QFont("Calibri", 12))
+
+        self.images = images
+        self.thetas = thetas
+        self.duplicates = duplicates
+        self.ref = ref
+        self.file_names = file_names
+        self.combos = []
+
+        info_label = QLabel("Best candidates were picked by sharpness, transmission and saturation. "
+                            "Change a selection in the table or double-click a row to compare images.")
+        info_label.setWordWrap(True)
+
+        self.table = QTableWidget(len(duplicates), 5)
+        self.table.setHorizontalHeaderLabels(["θ", "Selected", "Sharpness", "Transmission", "Saturation"])
+        self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.cellDoubleClicked.connect(self.compare_group)
+
+        for row, (group, choice, m) in enumerate(zip(duplicates, choices, metrics)):
+            self.table.setItem(row, 0, QTableWidgetItem(f"{thetas[group[0]]:.2f}"))
+            combo = QComboBox()
+            for k, idx in enumerate(group):
+                combo.addItem(f"{file_names[idx]}  (score {m['score'][k]:.3f})")
+            combo.setCurrentIndex(choice)
+            combo.currentIndexChanged.connect(lambda _, r=row: self.update_metrics(r))
+            self.combos.append((combo, m))
+            self.table.setCellWidget(row, 1, combo)
+            self.update_metrics(row)
+
+        button_box = QDialogButtonBox(QDialogButtonBox.Ok)
+        button_box.accepted.connect(self.accept)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(info_label)
+        layout.addWidget(self.table)
+        layout.addWidget(button_box)
+
+    def update_metrics(self, row):
+        combo, m = self.combos[row]
+        k = combo.currentIndex()
+        self.table.setItem(row, 2, QTableWidgetItem(f"{m['sharpness'][k]:.4g}"))
+        self.table.setItem(row, 3, QTableWidgetItem(f"{m['transmission'][k]:.4g}"))
+        self.table.setItem(row, 4, QTableWidgetItem(f"{m['saturation'][k] * 100:.2f} %"))
+
+    def compare_group(self, row, column):
+        """以原本的逐組對話框比較影像並改選。"""
+        group = self.duplicates[row]
+        imgs = [self.images[i] for i in group]
+        names = [self.file_names[i] for i in group]
+        dialog = DuplicateAngleResolver(imgs, self.thetas[group[0]], self.ref, names)
+        if dialog.exec_() == QDialog.Accepted:
+            self.combos[row][0].setCurrentIndex(dialog.get_selection())
 
-    # 處理重複組
-    for group in duplicates:
-        imgs = [images[i] for i in group]
-        theta_val = thetas[group[0]]
-        group_file_names = [file_names[i] for i in group]
+    def get_choices(self):
+        return [combo.currentIndex() for combo, _ in self.combos]
 
-        dialog = DuplicateAngleResolver(imgs, theta_val, ref, group_file_names)
-        if dialog.exec_() == QDialog.Accepted:
-            idx = dialog.get_selection()
-            chosen_idx = group[idx]
-            selected_indices.add(chosen_idx)
+
+def resolve_duplicates(images, thetas, duplicates, ref, file_names, auto=True):
+    """
+    Args:
+        auto: 以影像品質自動挑選並顯示單一總覽對話框；False 則逐組手動選擇
+    """
+    selected_indices = set()  # 收集選中索引
+
+    if auto:
+        # 平行評分所有候選影像，並於總覽中確認或改選
+        choices, metrics = auto_select_duplicates(images, duplicates, ref)
+        dialog = DuplicateSummaryDialog(images, thetas, duplicates, ref, file_names, choices, metrics)
+        dialog.exec_()
+        for group, choice in zip(duplicates, dialog.get_choices()):
+            selected_indices.add(group[choice])
+    else:
+        # 處理重複組
+        for group in duplicates:
+            imgs = [images[i] for i in group]
+            theta_val = thetas[group[0]]
+            group_file_names = [file_names[i] for i in group]
+
+            dialog = DuplicateAngleResolver(imgs, theta_val, ref, group_file_names)
+            if dialog.exec_() == QDialog.Accepted:
+                idx = dialog.get_selection()
+                chosen_idx = group[idx]
+                selected_indices.add(chosen_idx)
 
     # 添加非重複索引（移除 is_integer 條件，保留所有）
     all_idx = set(range(len(thetas)))
@@ -1,23 +1,33 @@
 from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QLabel, QSlider, QSizePolicy,
                               QRadioButton, QDialogButtonBox, QGroupBox, QHBoxLayout,
-                              QSpinBox, QPushButton, QFileDialog, QMessageBox)
+                              QSpinBox, QPushButton, QFileDialog, QMessageBox, QComboBox, QCheckBox,
+                              QDoubleSpinBox, QGridLayout, QScrollArea, QWidget, QFrame, QApplication)
 from PyQt5.QtGui import QImage, QPixmap, QFont
 from PyQt5.QtCore import Qt
 from PIL import Image
 import os
+from src.gui.center_sweep_dialog import CenterSweepDialog
+from src.logic import capabilities, jobs
+from src.logic.fbp import FILTERS
 
 
 class FBPResolutionDialog(QDialog):
     """FBP 重建解析度選擇對話框。"""
 
-    def __init__(self, original_size, parent=None):
+    def __init__(self, original_size, parent=None, images=None, angles=None, center_offset=0.0):
         """
         Args:
             original_size: 原始影像尺寸（高度、寬度）
+            images: 投影影像 (N, H, W)，提供時可搜尋旋轉中心
+            angles: 每個投影的旋轉角度 (可為 None)
+            center_offset: 旋轉中心相對影像中心的偏移（原始偵測器像素）
         """
         super().__init__(parent)
         self.setWindowTitle("FBP Reconstruction Settings")
-        self.setFixedSize(450, 500)
+        self.setMinimumWidth(450)
+        self.images = images
+        self.angles = angles
+        self.original_size = original_size
 
         # 統一 Dialog 外觀
         self.setStyleSheet("""
@@ -29,6 +39,7 @@ class FBPResolutionDialog(QDialog):
         """)
         # 檢查astra套件是否可用
         self.astra_available = self.check_astra()
+        self.sparse_available = self.check_scipy()
 
         # 設定字體。
         font = QFont("Calibri", 12)
@@ -36,10 +47,22 @@ class FBPResolutionDialog(QDialog):
 
         self.selected_size = 128  # 預設值
         self.angle_interval = 1.0  # 預設角度間隔（度）
-
-        # 主版面配置。
-        layout = QVBoxLayout(self)
+        self.backend = 'numpy'  # 預設 CPU 後端
+
+        # 主版面配置：選項放在捲動區，警示與按鈕固定在下方，選項再多也不會超出螢幕。
+        outer_layout = QVBoxLayout(self)
+        content = QWidget()
+        content.setObjectName("content")
+        content.setStyleSheet("QWidget#content { background: transparent; }")
+        layout = QVBoxLayout(content)
+        layout.setContentsMargins(0, 0, 0, 0)
         layout.setSpacing(15)
+        scroll = QScrollArea()
+        scroll.setWidgetResizable(True)
+        scroll.setFrameShape(QFrame.NoFrame)
+        scroll.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        scroll.setWidget(content)
+        outer_layout.addWidget(scroll)
 
         # 資訊標籤。
         info_label = QLabel(f"<b>Original Image Size:</b> {original_size[0]}×{original_size[1]}")
@@ -75,6 +98,99 @@ class FBPResolutionDialog(QDialog):
         angle_group.setLayout(angle_layout)
         layout.addWidget(angle_group)
 
+        # CPU 後端群組。
+        backend_group = QGroupBox("CPU Backend")
+        backend_group.setStyleSheet("font-family: Calibri; font-size: 14pt; font-weight: bold;")
+        backend_layout = QHBoxLayout()
+        backend_layout.setSpacing(10)
+
+        self.backend_combo = QComboBox()
+        self.backend_combo.setStyleSheet("font-family: Calibri; font-size: 14pt; font-weight: normal;")
+        self.backend_combo.addItem("NumPy", 'numpy')
+        if self.sparse_available:
+            self.backend_combo.addItem("Sparse matrix (cached)", 'sparse')
+        self.backend_combo.addItem("Gridding (Fourier)", 'gridding')
+        self.backend_combo.currentIndexChanged.connect(self.set_backend)
+
+        self.linear_checkbox = QCheckBox("Linear interp.")
+        self.linear_checkbox.setStyleSheet("font-family: Calibri; font-size: 14pt; font-weight: normal;")
+        self.linear_checkbox.setToolTip("Linear detector interpolation (sparse backend only)")
+        self.linear_checkbox.setEnabled(False)
+
+        # 多行程重建：投影以共享記憶體傳給各行程，不複製。
+        self.workers_spinbox = QSpinBox()
+        self.workers_spinbox.setStyleSheet("font-family: Calibri; font-size: 14pt; font-weight: normal;")
+        self.workers_spinbox.setRange(1, os.cpu_count() or 1)
+        self.workers_spinbox.setSuffix(" proc.")
+        self.workers_spinbox.setToolTip("Reconstruct slabs of slices in parallel processes (CPU backends)")
+
+        backend_layout.addWidget(self.backend_combo)
+        backend_layout.addWidget(self.linear_checkbox)
+        backend_layout.addWidget(self.workers_spinbox)
+        backend_layout.addStretch()
+        backend_group.setLayout(backend_layout)
+        layout.addWidget(backend_group)
+
+        # 濾波器群組（ASTRA 使用其內建濾波器）。
+        filter_group = QGroupBox("Filter")
+        filter_group.setStyleSheet("font-family: Calibri; font-size: 14pt; font-weight: bold;")
+        filter_layout = QHBoxLayout()
+        filter_layout.setSpacing(10)
+
+        self.filter_combo = QComboBox()
+        self.filter_combo.setStyleSheet("font-family: Calibri; font-size: 14pt; font-weight: normal;")
+        for name in FILTERS:
+            self.filter_combo.addItem(name.title(), name)
+        self.filter_combo.setCurrentIndex(self.filter_combo.findData('hann'))
+        self.filter_combo.setToolTip("Ramp filter window: Ram-Lak keeps the most detail, "
+                                     "Hann and Parzen suppress the most noise")
+
+        cutoff_label = QLabel("Cutoff:")
+        cutoff_label.setStyleSheet("font-family: Calibri; font-size: 14pt; font-weight: normal;")
+        self.cutoff_spinbox = QDoubleSpinBox()
+        self.cutoff_spinbox.setStyleSheet("font-family: Calibri; font-size: 14pt; font-weight: normal;")
+        self.cutoff_spinbox.setRange(0.1, 1.0)
+        self.cutoff_spinbox.setSingleStep(0.05)
+        self.cutoff_spinbox.setValue(1.0)
+        self.cutoff_spinbox.setToolTip("Cutoff frequency as a fraction of the Nyquist frequency")
+
+        filter_layout.addWidget(self.filter_combo)
+        filter_layout.addWidget(cutoff_label)
+        filter_layout.addWidget(self.cutoff_spinbox)
+        filter_layout.addStretch()
+        filter_group.setLayout(filter_layout)
+        layout.addWidget(filter_group)
+
+        # 旋轉中心群組。
+        center_group = QGroupBox("Rotation Center")
+        center_group.setStyleSheet("font-family: Calibri; font-size: 14pt; font-weight: bold;")
+        center_layout = QHBoxLayout()
+        center_layout.setSpacing(10)
+
+        center_label = QLabel("Offset:")
+        center_label.setStyleSheet("font-family: Calibri; font-size: 14pt; font-weight: normal;")
+
+        self.center_spinbox = QDoubleSpinBox()
+        self.center_spinbox.setRange(-original_size[1] / 2, original_size[1] / 2)
+        self.center_spinbox.setSingleStep(0.5)
+        self.center_spinbox.setDecimals(1)
+        self.center_spinbox.setSuffix(" px")
+        self.center_spinbox.setValue(center_offset)
+        self.center_spinbox.setStyleSheet("font-family: Calibri; font-size: 14pt; font-weight: normal;")
+        self.center_spinbox.setToolTip("Rotation axis position relative to the image center (original pixels)")
+
+        self.sweep_button = QPushButton("Search...")
+        self.sweep_button.setStyleSheet("font-family: Calibri; font-size: 14pt; font-weight: normal;")
+        self.sweep_button.setEnabled(images is not None)
+        self.sweep_button.clicked.connect(self.open_center_sweep)
+
+        center_layout.addWidget(center_label)
+        center_layout.addWidget(self.center_spinbox)
+        center_layout.addWidget(self.sweep_button)
+        center_layout.addStretch()
+        center_group.setLayout(center_layout)
+        layout.addWidget(center_group)
+
         # 解析度選擇群組。
         group_box = QGroupBox("Select Reconstruction Resolution")
         group_box.setStyleSheet("font-family: Calibri; font-size: 14pt; font-weight: bold;")
@@ -106,28 +222,149 @@ class FBPResolutionDialog(QDialog):
         group_box.setLayout(group_layout)
         layout.addWidget(group_box)
 
+        # 重建區域群組：只重建指定的切片範圍與切片內區域。
+        self.roi_group = QGroupBox("Region of Interest")
+        self.roi_group.setStyleSheet("font-family: Calibri; font-size: 14pt; font-weight: bold;")
+        self.roi_group.setCheckable(True)
+        self.roi_group.setChecked(False)
+        self.roi_group.toggled.connect(lambda checked: group_box.setEnabled(not checked))
+        roi_layout = QGridLayout()
+        roi_layout.setSpacing(8)
+
+        height, width = original_size
+        self.slice_from_spinbox = self._roi_spinbox(0, height - 1, 0)
+        self.slice_to_spinbox = self._roi_spinbox(1, height, height)
+        self.roi_row_spinbox = self._roi_spinbox(0, width - 1, width // 2)
+        self.roi_col_spinbox = self._roi_spinbox(0, width - 1, width // 2)
+        self.roi_size_spinbox = self._roi_spinbox(1, width, max(1, width // 4))
+        self.roi_row_spinbox.setToolTip("ROI center row in the reconstructed slice (original pixels)")
+        self.roi_col_spinbox.setToolTip("ROI center column in the reconstructed slice (original pixels)")
+        self.binning_combo = QComboBox()
+        self.binning_combo.setStyleSheet("font-family: Calibri; font-size: 14pt; font-weight: normal;")
+        for b in (1, 2, 4):
+            self.binning_combo.addItem(f"B{b}: {width // b}×{width // b}" + (" (native)" if b == 1 else ""), b)
+
+        for row, (text, widgets) in enumerate((
+                ("Slices:", (self.slice_from_spinbox, self.slice_to_spinbox)),
+                ("Center:", (self.roi_row_spinbox, self.roi_col_spinbox)),
+                ("Size:", (self.roi_size_spinbox,)),
+                ("Binning:", (self.binning_combo,)))):
+            label = QLabel(text)
+            label.setStyleSheet("font-family: Calibri; font-size: 14pt; font-weight: normal;")
+            roi_layout.addWidget(label, row, 0)
+            for col, widget in enumerate(widgets):
+                roi_layout.addWidget(widget, row, col + 1, 1, 2 if len(widgets) == 1 else 1)
+        self.roi_group.setLayout(roi_layout)
+        layout.addWidget(self.roi_group)
+
+        # 漸進式預覽選項。
+        self.progressive_checkbox = QCheckBox("Progressive preview (coarse to fine)")
+        self.progressive_checkbox.setStyleSheet("font-family: Calibri; font-size: 14pt; padding-left: 8px;")
+        self.progressive_checkbox.setToolTip("Show a fast low-resolution, reduced-angle reconstruction first and refine it in the background")
+        layout.addWidget(self.progressive_checkbox)
+
+        # 本機工作伺服器選項（勾選時才檢查 job_server.py 是否執行中）。
+        self.job_checkbox = QCheckBox("Submit to local job server")
+        self.job_checkbox.setStyleSheet("font-family: Calibri; font-size: 14pt; padding-left: 8px;")
+        self.job_checkbox.setToolTip("Queue the reconstruction on the job server (python job_server.py) and keep "
+                                     "working; the result opens when the job is done")
+        self.job_checkbox.toggled.connect(self.toggle_submit_job)
+        layout.addWidget(self.job_checkbox)
+
+        # 檢查點：完成的切片存到暫存目錄，中斷後重新執行相同重建時跳過。
+        self.checkpoint_checkbox = QCheckBox("Resume from checkpoints")
+        self.checkpoint_checkbox.setStyleSheet("font-family: Calibri; font-size: 14pt; padding-left: 8px;")
+        self.checkpoint_checkbox.setToolTip("Keep finished slices in ~/.txm_toolbox/scratch; a cancelled or crashed "
+                                            "reconstruction with the same settings continues where it stopped")
+        self.checkpoint_checkbox.setChecked(True)
+        layout.addWidget(self.checkpoint_checkbox)
+
         # 警示標籤。
         warning_label = QLabel(
             "<i>⚠ Higher resolutions require more computation time and memory.</i>"
         )
         warning_label.setStyleSheet("font-family: Calibri; font-size: 13pt; color: #d35400; padding: 8px;")
         warning_label.setWordWrap(True)
-        layout.addWidget(warning_label)
+        outer_layout.addWidget(warning_label)
 
         # 按鈕。
         button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
         button_box.accepted.connect(self.accept)
         button_box.rejected.connect(self.reject)
-        layout.addWidget(button_box)
+        outer_layout.addWidget(button_box)
+
+        # 寬度容納所有選項；高度依內容決定，但不超過螢幕可用高度（其餘以捲動顯示）。
+        scroll.setMinimumWidth(content.sizeHint().width() + scroll.verticalScrollBar().sizeHint().width())
+        chrome_height = self.sizeHint().height() - scroll.sizeHint().height()
+        screen_height = QApplication.primaryScreen().availableGeometry().height()
+        self.resize(self.sizeHint().width(), min(chrome_height + content.sizeHint().height(), screen_height - 80))
 
     def check_astra(self):
-        """檢查astra-toolbox套件是否安裝。"""
-        try:
-            import astra
-            return True
-        except ImportError:
-            return False
-        
+        """檢查astra-toolbox套件是否安裝（不匯入，結果快取）。"""
+        return capabilities.astra_available()
+
+    def check_scipy(self):
+        """檢查稀疏矩陣後端所需的 scipy 套件是否安裝（不匯入，結果快取）。"""
+        return capabilities.scipy_available()
+
+    def set_backend(self, index):
+        """設定 CPU 反投影後端。"""
+        self.backend = self.backend_combo.itemData(index)
+        self.linear_checkbox.setEnabled(self.backend == 'sparse')
+
+    def get_backend(self):
+        """取得 CPU 反投影後端。"""
+        return self.backend
+
+    def get_interpolation(self):
+        """取得稀疏矩陣插值方式。"""
+        return 'linear' if self.backend == 'sparse' and self.linear_checkbox.isChecked() else 'nearest'
+
+    def get_filter_name(self):
+        """取得 FBP 濾波器名稱。"""
+        return self.filter_combo.currentData()
+
+    def get_cutoff(self):
+        """取得濾波器截止頻率（Nyquist 頻率的比例）。"""
+        return self.cutoff_spinbox.value()
+
+    def open_center_sweep(self):
+        """開啟旋轉中心搜尋圖庫，以目前解析度與角度間隔重建候選切片。"""
+        dialog = CenterSweepDialog(self.images, self.angles, self.selected_size, self.angle_interval,
+                                   self.center_spinbox.value(), parent=self, filter_name=self.get_filter_name(),
+                                   cutoff=self.get_cutoff())
+        if dialog.exec_() == QDialog.Accepted:
+            self.center_spinbox.setValue(dialog.get_center_offset())
+
+    def get_progressive(self):
+        """是否使用漸進式預覽。"""
+        return self.progressive_checkbox.isChecked()
+
+    def get_n_workers(self):
+        """CPU 後端的重建行程數。"""
+        return self.workers_spinbox.value()
+
+    def get_checkpoint(self):
+        """是否使用切片檢查點。"""
+        return self.checkpoint_checkbox.isChecked()
+
+    def toggle_submit_job(self, checked):
+        """勾選時檢查工作伺服器是否可連線，無法連線則取消勾選。"""
+        if checked and not jobs.server_available():
+            self.job_checkbox.setChecked(False)
+            QMessageBox.warning(self, "Job Server", "No job server is running.\n"
+                                                    "Start it with: python job_server.py")
+            return
+        self.progressive_checkbox.setEnabled(not checked)
+
+    def get_submit_job(self):
+        """是否送到本機工作伺服器執行。"""
+        return self.job_checkbox.isChecked()
+
+    def get_center_offset(self):
+        """取得旋轉中心偏移（原始偵測器像素）。"""
+        return self.center_spinbox.value()
+
     def get_astra_available(self):
         """取得astra套件可用狀態。"""
         return self.astra_available
@@ -140,10 +377,37 @@ class FBPResolutionDialog(QDialog):
         """設定角度間隔。"""
         self.angle_interval = float(value)
 
+    def _roi_spinbox(self, minimum, maximum, value):
+        spinbox = QSpinBox()
+        spinbox.setRange(minimum, maximum)
+        spinbox.setValue(value)
+        spinbox.setSuffix(" px")
+        spinbox.setStyleSheet("font-family: Calibri; font-size: 14pt; font-weight: normal;")
+        return spinbox
+
     def get_size(self):
-        """取得選取的重建尺寸。"""
+        """取得選取的重建尺寸；啟用 ROI 時為原始寬度除以 binning。"""
+        if self.roi_group.isChecked():
+            return self.original_size[1] // self.binning_combo.currentData()
         return self.selected_size
 
+    def get_rows(self):
+        """取得重建的切片範圍 (start, stop)（原始影像列），未啟用 ROI 時為 None。"""
+        if not self.roi_group.isChecked():
+            return None
+        start, stop = sorted((self.slice_from_spinbox.value(), self.slice_to_spinbox.value()))
+        return start, max(stop, start + 1)
+
+    def get_roi(self):
+        """取得切片內的重建區域 (top, bottom, left, right)（原始像素），未啟用 ROI 時為 None。"""
+        if not self.roi_group.isChecked():
+            return None
+        width = self.original_size[1]
+        size = self.roi_size_spinbox.value()
+        top = min(max(self.roi_row_spinbox.value() - size // 2, 0), width - size)
+        left = min(max(self.roi_col_spinbox.value() - size // 2, 0), width - size)
+        return top, top + size, left, left + size
+
     def get_angle_interval(self):
         """取得角度間隔。"""
         return self.angle_interval
@@ -212,15 +476,41 @@ class FBPViewer(QDialog):
         self.save_button.setStyleSheet("font-family: Calibri; font-size: 12pt; padding: 8px;")
         self.save_button.clicked.connect(self.save_reconstruction)
 
+        # 漸進式重建狀態標籤。
+        self.status_label = QLabel()
+        self.status_label.setAlignment(Qt.AlignCenter)
+        self.status_label.setStyleSheet("font-family: Calibri; font-size: 10pt; color: #1f6feb; padding: 2px;")
+        self.status_label.hide()
+
         # 版面配置。
         layout = QVBoxLayout(self)
         layout.addWidget(self.image_label, stretch=1)
         layout.addWidget(self.info_label)
+        layout.addWidget(self.status_label)
         layout.addWidget(self.slider)
         layout.addWidget(self.save_button)
 
         self.update_image(0)
 
+    def update_volume(self, recon_images, status=None):
+        """以新的重建結果取代目前體積（漸進式重建），維持相對的切片位置。"""
+        position = (self.current_index + 0.5) / self.n_slices
+        self.recon_images = recon_images
+        self.n_slices, self.height, self.width = recon_images.shape
+        index = min(int(position * self.n_slices), self.n_slices - 1)
+
+        self.slider.blockSignals(True)
+        self.slider.setMaximum(self.n_slices - 1)
+        self.slider.setValue(index)
+        self.slider.blockSignals(False)
+        self.set_status(status)
+        self.update_image(index)
+
+    def set_status(self, status):
+        """顯示漸進式重建狀態，None 則隱藏。"""
+        self.status_label.setVisible(bool(status))
+        self.status_label.setText(status or "")
+
     def resizeEvent(self, event):
         """處理視窗大小變更事件。"""
         super().resizeEvent(event)
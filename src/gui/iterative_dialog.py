@@ -0,0 +1,126 @@
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QGridLayout, QLabel, QGroupBox, QComboBox, QSpinBox,
+                             QDoubleSpinBox, QCheckBox, QDialogButtonBox)
+from PyQt5.QtGui import QFont
+
+
+class IterativeSettingsDialog(QDialog):
+    """OS-EM / SIRT 迭代重建設定對話框。"""
+    CTRL_STYLE = "font-family: Calibri; font-size: 14pt; font-weight: normal;"
+
+    def __init__(self, original_size, parent=None, transmission=True):
+        """
+        Args:
+            original_size: 原始影像尺寸（高度、寬度）
+            transmission: 影像是否為參考校正後的穿透率，預設勾選 -log 轉換
+        """
+        super().__init__(parent)
+        self.setWindowTitle("Iterative Reconstruction Settings")
+        self.setFixedSize(450, 560)
+        self.setStyleSheet("""
+            QDialog {
+                border: 1px solid #e2e2e2;
+                border-radius: 12px;
+                background: #fafbfc;
+            }
+        """)
+        self.setFont(QFont("Calibri", 12))
+        height = original_size[0]
+
+        layout = QVBoxLayout(self)
+        layout.setSpacing(15)
+
+        # 演算法群組。
+        method_group = QGroupBox("Algorithm")
+        method_group.setStyleSheet("font-family: Calibri; font-size: 14pt; font-weight: bold;")
+        method_layout = QGridLayout()
+
+        self.method_combo = QComboBox()
+        self.method_combo.addItem("OS-EM (ordered-subset ML-EM)", 'osem')
+        self.method_combo.addItem("SIRT / OS-SART", 'sirt')
+        self.method_combo.currentIndexChanged.connect(self.update_controls)
+
+        self.iter_spinbox = self._spinbox(1, 500, 10)
+        self.subset_spinbox = self._spinbox(1, 64, 10)
+        self.subset_spinbox.setToolTip("Number of ordered subsets, 1 gives plain ML-EM / SIRT")
+        self.relax_spinbox = QDoubleSpinBox()
+        self.relax_spinbox.setRange(0.05, 2.0)
+        self.relax_spinbox.setSingleStep(0.05)
+        self.relax_spinbox.setValue(1.0)
+        self.log_checkbox = QCheckBox("Apply -log (transmission data)")
+        self.log_checkbox.setChecked(transmission)
+
+        rows = (("Method:", self.method_combo), ("Iterations:", self.iter_spinbox),
+                ("Subsets:", self.subset_spinbox), ("Relaxation:", self.relax_spinbox))
+        for row, (text, widget) in enumerate(rows):
+            label = QLabel(text)
+            label.setStyleSheet(self.CTRL_STYLE)
+            widget.setStyleSheet(self.CTRL_STYLE)
+            method_layout.addWidget(label, row, 0)
+            method_layout.addWidget(widget, row, 1)
+        self.log_checkbox.setStyleSheet(self.CTRL_STYLE)
+        method_layout.addWidget(self.log_checkbox, len(rows), 0, 1, 2)
+        method_group.setLayout(method_layout)
+        layout.addWidget(method_group)
+
+        # 幾何與範圍群組。
+        geometry_group = QGroupBox("Geometry")
+        geometry_group.setStyleSheet("font-family: Calibri; font-size: 14pt; font-weight: bold;")
+        geometry_layout = QGridLayout()
+
+        self.size_combo = QComboBox()
+        for size in (128, 256, 512):
+            self.size_combo.addItem(f"{size}×{size}", size)
+        self.angle_spinbox = self._spinbox(1, 90, 1)
+        self.angle_spinbox.setSuffix(" degree(s)")
+        self.slice_from_spinbox = self._spinbox(0, height - 1, 0)
+        self.slice_to_spinbox = self._spinbox(1, height, height)
+
+        for row, (text, widget) in enumerate((("Resolution:", self.size_combo),
+                                              ("Angle interval:", self.angle_spinbox),
+                                              ("First slice:", self.slice_from_spinbox),
+                                              ("Last slice:", self.slice_to_spinbox))):
+            label = QLabel(text)
+            label.setStyleSheet(self.CTRL_STYLE)
+            widget.setStyleSheet(self.CTRL_STYLE)
+            geometry_layout.addWidget(label, row, 0)
+            geometry_layout.addWidget(widget, row, 1)
+        geometry_group.setLayout(geometry_layout)
+        layout.addWidget(geometry_group)
+
+        # 按鈕。
+        button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        button_box.accepted.connect(self.accept)
+        button_box.rejected.connect(self.reject)
+        layout.addWidget(button_box)
+
+        self.update_controls()
+
+    def _spinbox(self, minimum, maximum, value):
+        spinbox = QSpinBox()
+        spinbox.setRange(minimum, maximum)
+        spinbox.setValue(value)
+        return spinbox
+
+    def update_controls(self, *args):
+        """鬆弛係數只用於 SIRT。"""
+        self.relax_spinbox.setEnabled(self.get_method() == 'sirt')
+
+    def get_method(self):
+        return self.method_combo.currentData()
+
+    def get_params(self):
+        """取得迭代參數，可直接傳入 IterativeWorker。"""
+        return dict(method=self.get_method(), n_iter=self.iter_spinbox.value(),
+                    n_subsets=self.subset_spinbox.value(), relaxation=self.relax_spinbox.value(),
+                    log_transform=self.log_checkbox.isChecked())
+
+    def get_size(self):
+        return self.size_combo.currentData()
+
+    def get_angle_interval(self):
+        return float(self.angle_spinbox.value())
+
+    def get_rows(self):
+        """取得重建的切片範圍 (start, stop)（原始影像列）。"""
+        start, stop = sorted((self.slice_from_spinbox.value(), self.slice_to_spinbox.value()))
+        return start, max(stop, start + 1)
@@ -0,0 +1,254 @@
+import os
+import numpy as np
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QGridLayout, QLabel, QGroupBox, QComboBox, QSpinBox,
+                             QDoubleSpinBox, QLineEdit, QPushButton, QProgressBar, QFileDialog, QMessageBox)
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QImage, QPixmap, QFont
+from src.logic import data_io
+from src.logic.fbp import FILTERS, to_uint8
+from src.logic.streaming import txrm_frames, folder_frames
+from src.logic.workers import StreamingFBPWorker
+from src.logic.utils import norm_to_8bit
+from src.logic.decorators import handle_errors
+
+
+class LiveReconDialog(QDialog):
+    """擷取中即時重建：投影一到就反投影到選定切片，預覽每秒更新數次，掃描結束前即可判斷重建品質。"""
+    CTRL_STYLE = "font-family: Calibri; font-size: 12pt; font-weight: normal;"
+    VIEW_SIZE = 512
+
+    def __init__(self, load_dir="", parent=None, center_offset=0.0):
+        """
+        Args:
+            load_dir: 選擇檔案與資料夾的起始目錄
+            center_offset: 預設的旋轉中心偏移（原始偵測器像素）
+        """
+        super().__init__(parent)
+        self.setWindowTitle("Live Reconstruction")
+        self.setFixedSize(1000, 640)
+        self.setFont(QFont("Calibri", 12))
+        self.load_dir = load_dir
+        self.worker = None
+        self.recon = None
+
+        layout = QHBoxLayout(self)
+        ctrl_layout = QVBoxLayout()
+
+        # 資料來源群組。
+        source_group = QGroupBox("Source")
+        source_layout = QGridLayout()
+        self.source_combo = QComboBox()
+        self.source_combo.addItem("TXRM file", 'txrm')
+        self.source_combo.addItem("Watch folder (.tif / .xrm)", 'folder')
+        self.source_combo.currentIndexChanged.connect(self.update_controls)
+        self.path_edit = QLineEdit()
+        browse_btn = QPushButton("Browse")
+        browse_btn.clicked.connect(self.browse_source)
+        self.ref_edit = QLineEdit()
+        self.ref_edit.setPlaceholderText("embedded reference / none")
+        ref_btn = QPushButton("Browse")
+        ref_btn.clicked.connect(self.browse_reference)
+        self.angle_start_spinbox = self._double_spinbox(-360, 360, -90.0, "°")
+        self.angle_step_spinbox = self._double_spinbox(0.01, 10, 1.0, "°")
+        self.angle_start_spinbox.setToolTip("Angle of the first TIF projection; .xrm files carry their own angles")
+        self.n_total_spinbox = QSpinBox()
+        self.n_total_spinbox.setRange(0, 100000)
+        self.n_total_spinbox.setSpecialValueText("until stopped")
+        self.n_total_spinbox.setToolTip("Number of projections to wait for")
+
+        source_layout.addWidget(self.source_combo, 0, 0, 1, 3)
+        source_layout.addWidget(QLabel("Path:"), 1, 0)
+        source_layout.addWidget(self.path_edit, 1, 1)
+        source_layout.addWidget(browse_btn, 1, 2)
+        source_layout.addWidget(QLabel("Reference:"), 2, 0)
+        source_layout.addWidget(self.ref_edit, 2, 1)
+        source_layout.addWidget(ref_btn, 2, 2)
+        source_layout.addWidget(QLabel("First angle:"), 3, 0)
+        source_layout.addWidget(self.angle_start_spinbox, 3, 1)
+        source_layout.addWidget(QLabel("Angle step:"), 4, 0)
+        source_layout.addWidget(self.angle_step_spinbox, 4, 1)
+        source_layout.addWidget(QLabel("Projections:"), 5, 0)
+        source_layout.addWidget(self.n_total_spinbox, 5, 1)
+        source_group.setLayout(source_layout)
+        ctrl_layout.addWidget(source_group)
+
+        # 重建參數群組。
+        recon_group = QGroupBox("Reconstruction")
+        recon_layout = QGridLayout()
+        self.size_spinbox = QSpinBox()
+        self.size_spinbox.setRange(32, 4096)
+        self.size_spinbox.setSingleStep(64)
+        self.size_spinbox.setValue(512)
+        self.size_spinbox.setToolTip("Reconstruction size, at most the image width")
+        self.rows_edit = QLineEdit()
+        self.rows_edit.setPlaceholderText("centre row")
+        self.rows_edit.setToolTip("Detector rows of the slices to reconstruct, e.g. 200, 512, 800")
+        self.center_spinbox = self._double_spinbox(-4096, 4096, center_offset, " px")
+        self.filter_combo = QComboBox()
+        for name in FILTERS:
+            self.filter_combo.addItem(name.title(), name)
+        self.filter_combo.setCurrentIndex(self.filter_combo.findData('hann'))
+        for row, (text, widget) in enumerate((("Size:", self.size_spinbox), ("Slice rows:", self.rows_edit),
+                                              ("Center offset:", self.center_spinbox),
+                                              ("Filter:", self.filter_combo))):
+            recon_layout.addWidget(QLabel(text), row, 0)
+            recon_layout.addWidget(widget, row, 1)
+        recon_group.setLayout(recon_layout)
+        ctrl_layout.addWidget(recon_group)
+
+        for group in (source_group, recon_group):
+            group.setStyleSheet("QGroupBox { font-family: Calibri; font-size: 14pt; font-weight: bold; }")
+            for widget in group.findChildren((QLabel, QComboBox, QSpinBox, QDoubleSpinBox, QLineEdit, QPushButton)):
+                widget.setStyleSheet(self.CTRL_STYLE)
+
+        button_layout = QHBoxLayout()
+        self.start_btn = QPushButton("Start")
+        self.start_btn.clicked.connect(self.start)
+        self.stop_btn = QPushButton("Stop")
+        self.stop_btn.setEnabled(False)
+        self.stop_btn.clicked.connect(self.stop)
+        self.viewer_btn = QPushButton("Open in Viewer")
+        self.viewer_btn.setEnabled(False)
+        self.viewer_btn.clicked.connect(self.open_viewer)
+        for btn in (self.start_btn, self.stop_btn, self.viewer_btn):
+            button_layout.addWidget(btn)
+        ctrl_layout.addLayout(button_layout)
+        ctrl_layout.addStretch()
+        layout.addLayout(ctrl_layout)
+
+        # 預覽區。
+        view_layout = QVBoxLayout()
+        self.image_label = QLabel("No projections yet")
+        self.image_label.setAlignment(Qt.AlignCenter)
+        self.image_label.setFixedSize(self.VIEW_SIZE, self.VIEW_SIZE)
+        self.image_label.setStyleSheet("background: #202020; color: #aaaaaa;")
+        self.slice_spinbox = QSpinBox()
+        self.slice_spinbox.setRange(1, 1)
+        self.slice_spinbox.setPrefix("Slice ")
+        self.slice_spinbox.valueChanged.connect(self.show_slice)
+        self.status_label = QLabel("")
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        status_layout = QHBoxLayout()
+        status_layout.addWidget(self.slice_spinbox)
+        status_layout.addWidget(self.status_label, stretch=1)
+        status_layout.addWidget(self.progress_bar)
+        view_layout.addWidget(self.image_label)
+        view_layout.addLayout(status_layout)
+        layout.addLayout(view_layout)
+
+        self.update_controls()
+
+    def _double_spinbox(self, low, high, value, suffix):
+        spinbox = QDoubleSpinBox()
+        spinbox.setRange(low, high)
+        spinbox.setDecimals(2)
+        spinbox.setSuffix(suffix)
+        spinbox.setValue(value)
+        return spinbox
+
+    def update_controls(self):
+        """角度與投影數只用於監看資料夾（TXRM 檔案自帶角度）。"""
+        folder = self.source_combo.currentData() == 'folder'
+        for widget in (self.angle_start_spinbox, self.angle_step_spinbox, self.n_total_spinbox):
+            widget.setEnabled(folder)
+
+    def browse_source(self):
+        if self.source_combo.currentData() == 'txrm':
+            path, _ = QFileDialog.getOpenFileName(self, "Open .txrm file", self.load_dir, "*.txrm")
+        else:
+            path = QFileDialog.getExistingDirectory(self, "Choose the acquisition folder", self.load_dir)
+        if path:
+            self.path_edit.setText(path)
+            self.load_dir = os.path.dirname(path)
+
+    def browse_reference(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Select Reference File", self.load_dir, "(*.xrm *.tif)")
+        if path:
+            self.ref_edit.setText(path)
+
+    def get_rows(self):
+        """切片列（原始影像座標），空白時為 None（中央列）。"""
+        text = self.rows_edit.text().replace(';', ',').strip()
+        if not text:
+            return None
+        return sorted({int(v) for v in text.split(',') if v.strip()})
+
+    @handle_errors(title="Live Reconstruction Error")
+    def start(self, *args):
+        """開啟資料來源並在背景執行緒開始即時重建。"""
+        path = self.path_edit.text().strip()
+        worker = None
+        ref = data_io.load_ref(self.ref_edit.text().strip()) if self.ref_edit.text().strip() else None
+        if self.source_combo.currentData() == 'txrm':
+            if not os.path.isfile(path):
+                QMessageBox.warning(self, "Live Reconstruction", "Please select a .txrm file!")
+                return
+            frames, n_total, embedded = txrm_frames(path)
+            ref = embedded if ref is None else ref
+        else:
+            if not os.path.isdir(path):
+                QMessageBox.warning(self, "Live Reconstruction", "Please select the acquisition folder!")
+                return
+            n_total = self.n_total_spinbox.value() or None
+            frames = folder_frames(path, self.angle_start_spinbox.value(), self.angle_step_spinbox.value(),
+                                   n_total=n_total, stop=lambda: worker.is_cancelled)
+        rows = self.get_rows()
+
+        worker = StreamingFBPWorker(frames, self.size_spinbox.value(), rows,
+                                    filter_name=self.filter_combo.currentData(),
+                                    center_offset=self.center_spinbox.value(), ref=ref, n_total=n_total)
+        self.worker = worker
+        self.worker.progress.connect(lambda p, text: self.progress_bar.setValue(p))
+        self.worker.preview.connect(self.update_preview)
+        self.worker.finished.connect(lambda recon: (self.update_preview(recon, f"Done: {worker.engine.describe()}"),
+                                                    self.reset_buttons()))
+        self.worker.start()
+
+        self.recon = None
+        n_rows = 1 if rows is None else len(rows)
+        self.slice_spinbox.setRange(1, n_rows)
+        self.slice_spinbox.setSuffix(f" / {n_rows}")
+        self.progress_bar.setValue(0)
+        self.status_label.setText("Waiting for projections...")
+        self.start_btn.setEnabled(False)
+        self.stop_btn.setEnabled(True)
+
+    def stop(self):
+        """停止讀取投影；目前的結果保留並可開啟於檢視器。"""
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker.wait()
+        self.reset_buttons()
+
+    def reset_buttons(self):
+        self.start_btn.setEnabled(True)
+        self.stop_btn.setEnabled(False)
+
+    def update_preview(self, recon, text):
+        self.recon = recon
+        self.status_label.setText(text)
+        self.viewer_btn.setEnabled(True)
+        self.show_slice()
+
+    def show_slice(self, *args):
+        if self.recon is None:
+            return
+        k = min(self.slice_spinbox.value() - 1, len(self.recon) - 1)
+        img = np.ascontiguousarray(norm_to_8bit(self.recon[k]))
+        h, w = img.shape
+        qimg = QImage(img.data, w, h, w, QImage.Format_Grayscale8)
+        self.image_label.setPixmap(QPixmap.fromImage(qimg).scaled(self.VIEW_SIZE, self.VIEW_SIZE,
+                                                                  Qt.KeepAspectRatio, Qt.SmoothTransformation))
+
+    def open_viewer(self):
+        """以 FBPViewer 開啟目前的切片。"""
+        from src.gui.fbp_viewer import FBPViewer
+        if self.recon is not None:
+            FBPViewer(to_uint8(self.recon), self.parent()).exec_()
+
+    def done(self, result):
+        if self.worker is not None and self.worker.isRunning():
+            self.worker.cancel()
+            self.worker.wait()
+        super().done(result)
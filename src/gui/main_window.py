@@ -201,6 +201,12 @@ class Ui_TXM_ToolBox(object):
         font.setPointSize(14)
         self.action_ML_EM.setFont(font)
         self.action_ML_EM.setObjectName("action_ML_EM")
+        self.action_live_recon = QtWidgets.QAction(TXM_ToolBox)
+        font = QtGui.QFont()
+        font.setFamily("Calibri")
+        font.setPointSize(14)
+        self.action_live_recon.setFont(font)
+        self.action_live_recon.setObjectName("action_live_recon")
         self.actionSIno_Alignment = QtWidgets.QAction(TXM_ToolBox)
         self.actionSIno_Alignment.setEnabled(False)
         font = QtGui.QFont()
@@ -227,6 +233,8 @@ class Ui_TXM_ToolBox(object):
         self.menuTomography.addAction(self.action_alignment)
         self.menuTomography.addAction(self.action_reconstruction)
         self.menuTomography.addAction(self.action_ML_EM)
+        self.menuTomography.addSeparator()
+        self.menuTomography.addAction(self.action_live_recon)
         self.menuMosaic.addAction(self.action_full_view)
         self.menuAI_Tools.addAction(self.actionAI_Reference)
         self.menuAI_Tools.addAction(self.actionSIno_Alignment)
@@ -269,6 +277,7 @@ class Ui_TXM_ToolBox(object):
         self.action_single_xrm.setText(_translate("TXM_ToolBox", "Load single"))
         self.actionAI_Reference.setText(_translate("TXM_ToolBox", "AI Reference"))
         self.action_ML_EM.setText(_translate("TXM_ToolBox", "ML-EM"))
+        self.action_live_recon.setText(_translate("TXM_ToolBox", "Live reconstruction"))
         self.actionSIno_Alignment.setText(_translate("TXM_ToolBox", "SIno Alignment"))
 
 
@@ -1,14 +1,17 @@
 import numpy as np
 from PIL import Image, ImageDraw
 from PyQt5.QtWidgets import (QLabel, QDialog, QPushButton, QVBoxLayout, QSizePolicy,
-                             QHBoxLayout, QSlider, QFileDialog)
+                             QHBoxLayout, QSlider, QFileDialog, QProgressDialog)
 from PyQt5.QtCore import Qt, QEvent
 from PyQt5.QtGui import QImage, QPixmap, QFont, QPainter, QPen, QColor
 from src.gui.cc_align_dialog import CCAlignDialog 
-from src.logic.utils import norm_hs_to_8bit
+from src.logic.utils import norm_hs_to_8bit, norm_to_8bit
+from src.logic.workers import SliceBuildWorker, AlignWorker
+from src.logic import data_io
 
 
 class AlignViewer(QDialog):
+    SLICE_SIZE = 256  # resolution of the live slice
     FONT_ZOOM = QFont('Calibri', 14, QFont.Bold)
     FONT_CTRL = QFont('Calibri', 14)
     SLIDER_STYLE = """
@@ -37,8 +40,11 @@ class AlignViewer(QDialog):
         self.tomo = tomography
         self.proj_images = self.tomo.get_norm_images()
         self.last_dir = last_dir
-        self.n_proj, self.raw_size, _ = self.proj_images.shape
-        self.rotational_center = (self.raw_size // 2, self.raw_size // 2)
+        self.n_proj, self.raw_size, self.raw_width = self.proj_images.shape
+        # crosshair: x is the rotation axis, starting from the offset already chosen (FBP dialog, center sweep)
+        center_x = int(round(self.raw_width // 2 + self.tomo.rotation_center_offset))
+        self.rotational_center = (min(max(center_x, 0), self.raw_width - 1), self.raw_size // 2)
+        self.center_moved = False
 
         # GUI variables
         self.view_scale = 1.0
@@ -65,6 +71,13 @@ class AlignViewer(QDialog):
         self.sino_arr_start = None
         self.sino_pix_start = None
 
+        # live slice variables: FBP of the slice at line_y from the unnormalized images with the current shifts
+        self.raw_images = self.tomo.get_full_images()
+        self.slice_recon = None
+        self.slice_worker = None  # rebuilds the slice from all projections in the background
+        self.slice_workers = []  # running workers, including superseded ones
+        self.align_worker = None  # auto-alignment running in the background
+
         # initialize GUI
         self._init_labels()
         self._init_buttons()
@@ -99,6 +112,10 @@ class AlignViewer(QDialog):
         self.sino_label.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         self.sino_label.setStyleSheet(label_style)
 
+        self.slice_label = QLabel("Slice")
+        self.slice_label.setAlignment(Qt.AlignCenter)
+        self.slice_label.setStyleSheet(label_style)
+
     def _init_buttons(self):
         # zoom in / out bottons
         self.zoom_in_btn = QPushButton('Zoom In')
@@ -120,15 +137,24 @@ class AlignViewer(QDialog):
         self.load_btn.setToolTip('Load shifts from a text file')
         self.hs_align_btn = QPushButton('HS Align') 
         self.hs_align_btn.setToolTip('Open auto-alignment dialog (Cross-correlation)')
+        self.ms_align_btn = QPushButton('MS Align')
+        self.ms_align_btn.setToolTip('Multi-scale auto-alignment of vertical and horizontal shifts')
+        self.pc_align_btn = QPushButton('PC Align')
+        self.pc_align_btn.setToolTip('2D phase-correlation auto-alignment against neighbouring projections')
         self.done_btn = QPushButton('Finish')
         self.change_center_btn = QPushButton('Change center')
-        self.change_center_btn.setToolTip('Next click: Change rotational center')
+        self.change_center_btn.setToolTip('Next double-click: set the rotation axis (x) and the view centre (y)')
         self.zoom_tomo_btn = QPushButton('Zoom tomo')
         self.reset_sino_btn = QPushButton('Reset sino')
         self.reset_sino_btn.setToolTip('Reset sinogram view')
+        self.live_slice_btn = QPushButton('Live slice')
+        self.live_slice_btn.setToolTip('Reconstruct the slice at the green line while shifting projections')
+        self.live_slice_btn.setCheckable(True)
+        self.live_slice_btn.setChecked(True)
 
         for btn in [self.prev_btn, self.next_btn, self.save_btn, self.load_btn, self.hs_align_btn,
-                    self.done_btn, self.change_center_btn, self.zoom_tomo_btn, self.reset_sino_btn]:
+                    self.ms_align_btn, self.pc_align_btn, self.done_btn, self.change_center_btn, self.zoom_tomo_btn,
+                    self.reset_sino_btn, self.live_slice_btn]:
             btn.setFont(self.FONT_CTRL)
 
         self.prev_btn.clicked.connect(self.prev_image)
@@ -136,10 +162,13 @@ class AlignViewer(QDialog):
         self.save_btn.clicked.connect(self.save_shifts)
         self.load_btn.clicked.connect(self.load_shifts)
         self.hs_align_btn.clicked.connect(self.open_auto_align_dialog)
+        self.ms_align_btn.clicked.connect(self.multiscale_auto_align)
+        self.pc_align_btn.clicked.connect(self.phase_correlation_auto_align)
         self.done_btn.clicked.connect(self.finish)
         self.change_center_btn.clicked.connect(self.start_change_center)
         self.zoom_tomo_btn.clicked.connect(self.toggle_zoom_tomo)
         self.reset_sino_btn.clicked.connect(self.reset_sino_view)
+        self.live_slice_btn.toggled.connect(self.toggle_live_slice)
 
     def _init_slider(self):
         self.slider = QSlider(Qt.Horizontal)
@@ -154,6 +183,7 @@ class AlignViewer(QDialog):
         zoom_hbox = QHBoxLayout()
         zoom_hbox.addWidget(self.change_center_btn)
         zoom_hbox.addWidget(self.zoom_tomo_btn)
+        zoom_hbox.addWidget(self.live_slice_btn)
         zoom_hbox.addStretch(1)
         zoom_hbox.addWidget(self.reset_sino_btn)
         zoom_hbox.addWidget(self.zoom_in_btn)
@@ -180,6 +210,11 @@ class AlignViewer(QDialog):
         sino_title.setAlignment(Qt.AlignCenter)
         sino_vbox.addWidget(sino_title)
         sino_vbox.addWidget(self.sino_label)
+        self.slice_title = QLabel("Slice")
+        self.slice_title.setFont(QFont('Calibri', 16, QFont.Bold))
+        self.slice_title.setAlignment(Qt.AlignCenter)
+        sino_vbox.addWidget(self.slice_title)
+        sino_vbox.addWidget(self.slice_label, alignment=Qt.AlignCenter)
 
         top_hbox = QHBoxLayout()
         top_hbox.setSpacing(20)
@@ -197,11 +232,18 @@ class AlignViewer(QDialog):
         hbox.addWidget(self.save_btn)
         hbox.addWidget(self.load_btn)
         hbox.addWidget(self.hs_align_btn)
+        hbox.addWidget(self.ms_align_btn)
+        hbox.addWidget(self.pc_align_btn)
         hbox.addWidget(self.done_btn)
         layout.addLayout(hbox)
         layout.addWidget(self.slider)
         self.setLayout(layout)
 
+    def toggle_live_slice(self, checked):
+        if not checked:
+            self._reset_slice()
+        self.resize_view()
+
     def start_change_center(self):
         self.changing_center = True
 
@@ -244,6 +286,14 @@ class AlignViewer(QDialog):
         img_label_size = min(img_label_w, img_label_h)
         self.img_label.setFixedSize(img_label_size, img_label_size)
         self.hs_label.setFixedSize(hs_label_w, hs_label_h)
+        # the live slice shares the sinogram column
+        live = self.live_slice_btn.isChecked()
+        slice_size = min(sino_label_w, total_h // 2)
+        self.slice_label.setFixedSize(slice_size, slice_size)
+        self.slice_label.setVisible(live)
+        self.slice_title.setVisible(live)
+        if live:
+            sino_label_h = total_h - slice_size - 40
         self.sino_label.setFixedSize(sino_label_w, sino_label_h)
         scale_w = img_label_w / self.raw_size
         scale_h = img_label_h / self.raw_size
@@ -269,9 +319,7 @@ class AlignViewer(QDialog):
     def save_shifts(self):
         save_path = QFileDialog.getSaveFileName(self, "Save shifts", self.last_dir, "Text Files (*.txt)")[0]
         if save_path:
-            with open(save_path, 'w') as f:
-                for i, (dy, dx) in enumerate(self.shifts):
-                    f.write(f"{str(i).zfill(3)},{dy},{dx}\n")
+            data_io.save_shifts(save_path, self.shifts)
 
     def load_shifts(self):
         shifts_file, _ = QFileDialog.getOpenFileName(None, "Load Shifts", "*.txt")
@@ -285,6 +333,7 @@ class AlignViewer(QDialog):
                         self.proj_images[idx] = np.roll(self.proj_images[idx], shift=(dy, dx), axis=(0, 1))
                     except Exception:
                         continue
+        self._reset_slice()
         self.update_all()
 
     def open_auto_align_dialog(self):
@@ -295,30 +344,142 @@ class AlignViewer(QDialog):
             calculated_shifts = dlg.get_shifts()
             self._apply_cc_shifts(calculated_shifts)
 
+    def multiscale_auto_align(self):
+        self._start_auto_align('multiscale', "Multiscale Alignment", angles=self.tomo.angles)
+
+    def phase_correlation_auto_align(self):
+        self._start_auto_align('phase_correlation', "Phase-Correlation Alignment", mode='neighbour',
+                               max_shift=self.raw_size // 4, angles=self.tomo.angles)
+
+    def _start_auto_align(self, method, title, **options):
+        """
+        run an AlignWorker with a progress dialog and apply its shifts when it
+        finishes; the window-modal dialog keeps the projections unchanged meanwhile.
+        """
+        self.align_worker = AlignWorker(method, self.proj_images, **options)
+        progress_dialog = QProgressDialog("Aligning...", "Cancel", 0, 100, self)
+        progress_dialog.setWindowTitle(title)
+        progress_dialog.setWindowModality(Qt.WindowModal)
+        progress_dialog.setFixedSize(350, 100)
+        progress_dialog.canceled.connect(self.align_worker.cancel)
+        progress_dialog.show()
+
+        self.align_worker.progress.connect(lambda p, text: (progress_dialog.setValue(p),
+                                                            progress_dialog.setLabelText(text))
+                                           if not progress_dialog.wasCanceled() else None)
+        self.align_worker.finished.connect(lambda shifts: (progress_dialog.close(), self._apply_cc_shifts(shifts)))
+        self.align_worker.start()
+
     def finish(self):
-        for i in range(self.n_proj):
-            img = self.tomo.get_image(i)
-            img = np.roll(img, shift=self.shifts[i], axis=(0, 1))
-            self.tomo.set(i, img)
+        self.tomo.apply_shifts(self.shifts)
+        # the crosshair marks the rotation axis for reconstruction; an offset chosen elsewhere is kept
+        # unless the centre was moved here
+        if self.center_moved:
+            self.tomo.rotation_center_offset = float(self.rotational_center[0] - self.raw_width // 2)
         super().accept()
 
+    def done(self, result):
+        if self.align_worker is not None and self.align_worker.isRunning():
+            self.align_worker.cancel()
+            self.align_worker.wait()
+        for worker in self.slice_workers:
+            worker.cancel()
+            worker.wait()
+        super().done(result)
+
     def update_all(self):
         self.update_tomo()
         self.update_sino()
         self.update_hori_sum()
+        self.update_slice()
 
     # -------------- core logic --------------- 
-    def _apply_cc_shifts(self, y_shifts):
-        for i, dy in enumerate(y_shifts):
-            self.shifts[i][0] += dy 
-            self.proj_images[i] = np.roll(self.proj_images[i], shift=dy, axis=0)
+    def _apply_cc_shifts(self, shifts):
+        """
+        Parameters
+        ----------
+        shifts : np.ndarray
+            vertical shifts of shape (N,), or (dy, dx) pairs of shape (N, 2)
+        """
+        shifts = np.asarray(shifts, dtype=int)
+        if shifts.ndim == 1:
+            shifts = np.stack([shifts, np.zeros_like(shifts)], axis=1)
+        for i, (dy, dx) in enumerate(shifts):
+            self.shifts[i][0] += int(dy)
+            self.shifts[i][1] += int(dx)
+            self.proj_images[i] = np.roll(self.proj_images[i], shift=(dy, dx), axis=(0, 1))
             self.hs_array[:, i] = np.roll(self.hs_array[:, i], shift=dy)
             
+        self._reset_slice()
         self.update_all()
 
+    def _build_slice(self):
+        """
+        start the FBP of the slice at line_y with the current shifts in a
+        SliceBuildWorker; _slice_built installs the result. A build that is
+        still running is superseded.
+        """
+        self._reset_slice()
+        h, w = self.raw_images.shape[1:]
+        rows = self._slice_rows()
+        worker = SliceBuildWorker(rows, self.tomo.angles, self.SLICE_SIZE, [self.line_y], image_shape=(h, w),
+                                  center_offset=self.rotational_center[0] - self.raw_width // 2)
+        worker.finished.connect(lambda engine: self._slice_built(worker, engine, rows))
+        self.slice_worker = worker
+        self.slice_workers.append(worker)
+        self.slice_title.setText("Slice (reconstructing...)")
+        worker.start()
+
+    def _slice_built(self, worker, engine, rows):
+        """
+        install a finished slice build. Projections shifted while it ran are
+        updated with replace_rows, as in _shift_slice.
+        """
+        worker.wait()
+        self.slice_workers.remove(worker)
+        if worker is not self.slice_worker or engine is None:
+            return
+        self.slice_worker = None
+        if engine.raw_rows != [self.line_y]:
+            self._build_slice()
+            return
+        current = self._slice_rows()
+        for i in np.flatnonzero((current != rows).any(axis=1)):
+            engine.replace_rows(rows[i][None], current[i][None], self.tomo.angles[i])
+        self.slice_recon = engine
+        self.slice_title.setText("Slice")
+        self.update_slice()
+
+    def _reset_slice(self):
+        """drop the live slice and any build in progress, e.g. after a bulk shift."""
+        self.slice_recon = None
+        if self.slice_worker is not None:
+            self.slice_worker.cancel()
+            self.slice_worker = None
+            self.slice_title.setText("Slice")
+
+    def _slice_rows(self):
+        """row line_y of all projections under their current shifts, (N, W), see _slice_row."""
+        n, h, w = self.raw_images.shape
+        shifts = np.asarray(self.shifts, dtype=int).reshape(n, 2)
+        rows = self.raw_images[np.arange(n), (self.line_y - shifts[:, 0]) % h].astype(np.float64)
+        cols = (np.arange(w)[None, :] - shifts[:, 1:]) % w
+        return np.take_along_axis(rows, cols, axis=1)
+
+    def _slice_row(self, i):
+        """row line_y of projection i under its current shift, from the unnormalized images."""
+        dy, dx = self.shifts[i]
+        row = self.raw_images[i, (self.line_y - dy) % self.raw_images.shape[1]]
+        return np.roll(row.astype(np.float64), dx)
+
+    def _shift_slice(self, i, old_row):
+        """replace the contribution of projection i to the live slice after it was shifted."""
+        if self.slice_recon is not None:
+            self.slice_recon.replace_rows(old_row[None], self._slice_row(i)[None], self.tomo.angles[i])
+
     def _get_tomo_zoomed_vertex(self):
         center_x, center_y = self.rotational_center
-        x0 = center_x - self.tomo_zoomed_size // 2
+        x0 = min(max(center_x - self.tomo_zoomed_size // 2, 0), self.raw_width - self.tomo_zoomed_size)
         y0 = max(center_y - self.tomo_zoomed_size // 2, 0) 
         y1 = min(y0 + self.tomo_zoomed_size, self.raw_size)
         if y1 - y0 < self.tomo_zoomed_size:
@@ -395,11 +556,13 @@ class AlignViewer(QDialog):
         key = event.key()
         if key in key_map:
             axis, delta = key_map[key]
+            old_row = self._slice_row(self.index)
             self.shifts[self.index][axis] += delta
             img_temp = self.proj_images[self.index]
             self.proj_images[self.index] = np.roll(img_temp, shift=delta, axis=axis)
             if axis == 0:
                 self.hs_array[:, self.index] = np.roll(self.hs_array[:, self.index], shift=delta)
+            self._shift_slice(self.index, old_row)
             self.update_all()
 
     def eventFilter(self, obj, event):
@@ -442,7 +605,7 @@ class AlignViewer(QDialog):
                 img_y = int(event.y() / self.scale)
 
                 # prevent out-of-bounds
-                if img_x < 0 or img_x >= self.raw_size or img_y < 0 or img_y >= self.raw_size:
+                if img_x < 0 or img_x >= self.raw_width or img_y < 0 or img_y >= self.raw_size:
                     return True
                 # change the coordinates if zoomed
                 if self.tomo_zoomed:
@@ -451,10 +614,14 @@ class AlignViewer(QDialog):
                     img_y += self.tomo_vertex[1]
                 
                 if self.changing_center:
-                    self.rotational_center = (self.raw_size // 2, img_y)
+                    self.rotational_center = (img_x, img_y)
+                    self.center_moved = True
                     self.changing_center = False
                     self.tomo_vertex = self._get_tomo_zoomed_vertex()
                     self.update_tomo()
+                    # the live slice is reconstructed around the new rotation axis
+                    self._reset_slice()
+                    self.update_slice()
                     return True
                 # click on green line
                 if abs(img_y - self.line_y) < 5:
@@ -464,10 +631,12 @@ class AlignViewer(QDialog):
                 else:
                     dx = self.rotational_center[0] - img_x
                     dy = self.rotational_center[1] - img_y
+                    old_row = self._slice_row(self.index)
                     self.shifts[self.index][0] += dy
                     self.shifts[self.index][1] += dx 
                     self.proj_images[self.index] = np.roll(self.proj_images[self.index], shift=(dy, dx), axis=(0, 1))
                     self.hs_array[:, self.index] = np.roll(self.hs_array[:, self.index], shift=dy)
+                    self._shift_slice(self.index, old_row)
                     self.update_all()
                     return True
             # moving mouse while dragging line
@@ -480,8 +649,12 @@ class AlignViewer(QDialog):
                 self.update_tomo()
                 self.update_sino()
                 return True
-            # finish dragging line
+            # finish dragging line, then reconstruct the slice at the new line
             elif event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+                if self.dragging_line and (self.slice_worker is not None or (
+                        self.slice_recon is not None and self.slice_recon.raw_rows != [self.line_y])):
+                    self._reset_slice()
+                    self.update_slice()
                 self.dragging_line = False
                 return True
             
@@ -513,6 +686,17 @@ class AlignViewer(QDialog):
 
         self._set_label_pixmap(self.img_label, img_rgb, keep_ratio=True)
 
+    def update_slice(self):
+        """show the live slice at line_y, reconstructed from all projections when needed."""
+        if not self.live_slice_btn.isChecked():
+            return
+        if self.slice_recon is None:
+            if self.slice_worker is None:
+                self._build_slice()
+            return
+        img = norm_to_8bit(self.slice_recon.preview()[0])
+        self._set_label_pixmap(self.slice_label, img, keep_ratio=True)
+
     def update_hori_sum(self):
         hs_8bit = self.hs_array.copy()
         self._set_label_pixmap(self.hs_label, hs_8bit, keep_ratio=False)
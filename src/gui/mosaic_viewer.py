@@ -1,8 +1,103 @@
-from PyQt5.QtWidgets import QDialog, QLabel, QVBoxLayout, QHBoxLayout, QSlider, QPushButton, QFileDialog, QSizePolicy, QMessageBox, QFrame
-from PyQt5.QtCore import Qt, QTimer
-from PyQt5.QtGui import QImage, QPixmap, QFont
+from PyQt5.QtWidgets import QDialog, QLabel, QVBoxLayout, QHBoxLayout, QSlider, QPushButton, QFileDialog, QSizePolicy, QMessageBox, QFrame, QSpinBox, QWidget
+from PyQt5.QtCore import Qt, QTimer, QRectF
+from PyQt5.QtGui import QImage, QFont, QPainter, QColor
 import numpy as np
 from PIL import Image
+from src.logic.pyramid import ImagePyramid, to_8bit
+from src.logic import capabilities
+
+
+class PyramidTileView(QWidget):
+    """只繪製可見圖塊的多解析度影像檢視器（滾輪縮放、拖曳平移、雙擊重設）。"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pyramid = None
+        self.vmin, self.vmax = 0.0, 1.0
+        self.scale = 1.0  # 螢幕像素 / 原始像素
+        self.offset_x, self.offset_y = 0.0, 0.0  # 視窗左上角對應的原始座標
+        self.drag_pos = None
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+
+    def set_pyramid(self, pyramid):
+        self.pyramid = pyramid
+        self.fit_to_view()
+
+    def set_contrast(self, vmin, vmax):
+        self.vmin, self.vmax = vmin, vmax
+        self.update()
+
+    def fit_to_view(self):
+        if self.pyramid is None or self.width() == 0 or self.height() == 0:
+            return
+        h, w = self.pyramid.shape
+        self.scale = min(self.width() / w, self.height() / h)
+        self.offset_x = (w - self.width() / self.scale) / 2
+        self.offset_y = (h - self.height() / self.scale) / 2
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor("#0d0d0d"))
+        if self.pyramid is None:
+            return
+        painter.setRenderHint(QPainter.SmoothPixmapTransform, True)
+
+        level = self.pyramid.level_for_scale(self.scale)
+        factor = 2 ** level
+        ts = self.pyramid.tile_size * factor  # 圖塊在原始座標中的大小
+        n_ty, n_tx = self.pyramid.tile_grid(level)
+        ty0 = max(int(self.offset_y // ts), 0)
+        tx0 = max(int(self.offset_x // ts), 0)
+        ty1 = min(int((self.offset_y + self.height() / self.scale) // ts) + 1, n_ty)
+        tx1 = min(int((self.offset_x + self.width() / self.scale) // ts) + 1, n_tx)
+
+        for ty in range(ty0, ty1):
+            for tx in range(tx0, tx1):
+                tile = self.pyramid.get_tile(level, ty, tx, self.vmin, self.vmax)
+                h, w = tile.shape
+                qimg = QImage(tile.data, w, h, w, QImage.Format_Grayscale8)
+                target = QRectF((tx * ts - self.offset_x) * self.scale,
+                                (ty * ts - self.offset_y) * self.scale,
+                                w * factor * self.scale, h * factor * self.scale)
+                painter.drawImage(target, qimg)
+        painter.end()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.fit_to_view()
+
+    def wheelEvent(self, event):
+        if self.pyramid is None:
+            return
+        zoom = 1.25 if event.angleDelta().y() > 0 else 1 / 1.25
+        pos = event.pos()
+        # 以游標位置為中心縮放。
+        img_x = self.offset_x + pos.x() / self.scale
+        img_y = self.offset_y + pos.y() / self.scale
+        self.scale = min(max(self.scale * zoom, 1e-3), 16.0)
+        self.offset_x = img_x - pos.x() / self.scale
+        self.offset_y = img_y - pos.y() / self.scale
+        self.update()
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self.drag_pos = event.pos()
+
+    def mouseMoveEvent(self, event):
+        if self.drag_pos is not None:
+            delta = event.pos() - self.drag_pos
+            self.offset_x -= delta.x() / self.scale
+            self.offset_y -= delta.y() / self.scale
+            self.drag_pos = event.pos()
+            self.update()
+
+    def mouseReleaseEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self.drag_pos = None
+
+    def mouseDoubleClickEvent(self, event):
+        self.fit_to_view()
 
 
 class MosaicPreviewDialog(QDialog):
@@ -20,6 +115,8 @@ class MosaicPreviewDialog(QDialog):
         self.metadata = context.metadata or {}
         self.clip_lower = 0.0  # 下限裁切百分比
         self.clip_upper = 0.5  # 上限裁切百分比
+        self.overlap = 0.0  # 拼接重疊比例
+        self.downsample = 1  # 預覽降採樣倍率
 
         # 取得拼接尺寸。
         self.height, self.width = mosaic_img.shape
@@ -45,15 +142,12 @@ class MosaicPreviewDialog(QDialog):
         # 以拼接資訊更新視窗標題。
         self.update_window_title()
 
-        self.img_8bit = None
-        self.qimg = None
+        self.pyramid = ImagePyramid(mosaic_img)
+        self.vmin, self.vmax = None, None
 
-        # 影像標籤。
-        self.img_label = QLabel()
-        self.img_label.setFont(QFont("Calibri", 14))
-        self.img_label.setAlignment(Qt.AlignCenter)
-        self.img_label.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
-        self.img_label.setStyleSheet("border-radius: 8px; background-color: #0d0d0d;")
+        # 影像檢視器（多解析度圖塊）。
+        self.img_view = PyramidTileView()
+        self.img_view.setToolTip("Wheel: zoom | Drag: pan | Double-click: fit to window")
 
         # 資訊標籤。
         self.info_label = QLabel()
@@ -132,12 +226,30 @@ class MosaicPreviewDialog(QDialog):
         self.update_timer.setSingleShot(True)
         self.update_timer.timeout.connect(self.apply_contrast_change)
 
+        # 拼接註冊控制項。
+        self.overlap_spinbox = QSpinBox()
+        self.overlap_spinbox.setRange(0, 50)
+        self.overlap_spinbox.setSuffix(" %")
+        self.overlap_spinbox.setStyleSheet("font-family: Calibri; font-size: 11pt;")
+        self.stitch_btn = QPushButton("Register && Blend")
+        self.stitch_btn.setFont(QFont("Calibri", 12))
+        self.stitch_btn.setToolTip("Register neighbouring tiles in their overlaps and blend the seams")
+        self.stitch_btn.clicked.connect(self.apply_stitching)
+
         # 儲存按鈕。
         self.save_btn = QPushButton("Save Image")
         self.save_btn.setFont(QFont("Calibri", 14))
         self.save_btn.setFixedWidth(140)
         self.save_btn.clicked.connect(self.save_image)
 
+        self.save_pyramid_btn = QPushButton("Save Pyramidal TIFF")
+        self.save_pyramid_btn.setFont(QFont("Calibri", 14))
+        self.save_pyramid_btn.setToolTip("Save a tiled multi-resolution TIFF for large mosaics")
+        self.save_pyramid_btn.clicked.connect(self.save_pyramid_tiff)
+        if not capabilities.tifffile_available():
+            self.save_pyramid_btn.setEnabled(False)
+            self.save_pyramid_btn.setToolTip("Requires the 'tifffile' package (pip install tifffile)")
+
         # 版面配置。
         layout = QVBoxLayout()
         layout.setContentsMargins(16, 16, 16, 16)
@@ -152,7 +264,7 @@ class MosaicPreviewDialog(QDialog):
         header_layout.addWidget(self.clip_range_label, stretch=0)
         layout.addWidget(header_frame)
 
-        layout.addWidget(self.img_label, stretch=1)
+        layout.addWidget(self.img_view, stretch=1)
 
         contrast_frame = QFrame()
         contrast_frame.setObjectName("contrast_frame")
@@ -187,10 +299,20 @@ class MosaicPreviewDialog(QDialog):
         upper_row.addWidget(self.upper_value_label)
         contrast_layout.addLayout(upper_row)
 
+        stitch_row = QHBoxLayout()
+        overlap_label = QLabel("Tile Overlap")
+        overlap_label.setStyleSheet("font-family: Calibri; font-size: 11pt; color: #333;")
+        stitch_row.addWidget(overlap_label)
+        stitch_row.addWidget(self.overlap_spinbox)
+        stitch_row.addWidget(self.stitch_btn)
+        stitch_row.addStretch()
+        contrast_layout.addLayout(stitch_row)
+
         layout.addWidget(contrast_frame)
 
         button_box = QHBoxLayout()
         button_box.addStretch()
+        button_box.addWidget(self.save_pyramid_btn)
         button_box.addWidget(self.save_btn)
         layout.addLayout(button_box)
 
@@ -250,46 +372,58 @@ class MosaicPreviewDialog(QDialog):
         self.update_image_data()
         self.update_display()
 
-    def update_image_data(self):
-        """依目前裁切值更新 8 位元影像資料。"""
-        vmin = np.percentile(self.mosaic_img, self.clip_lower)
-        vmax = np.percentile(self.mosaic_img, 100 - self.clip_upper)
-
-        # 避免除以零。
-        if vmax == vmin:
-            vmax = vmin + 1e-7
-
-        # 正規化至 8 位元。
-        normalized = (self.mosaic_img - vmin) / (vmax - vmin)
-        self.img_8bit = np.clip(normalized * 255, 0, 255).astype(np.uint8)
+    def apply_stitching(self):
+        """以相位相關註冊相鄰圖塊並混合重疊區，大型拼接以降採樣預覽。"""
+        images = self.info.images
+        self.overlap = self.overlap_spinbox.value() / 100.0
+        tile_h, tile_w = images.get_image(0).shape
+        full_size = max(tile_h * self.metadata.get('mosaic_row', 1), tile_w * self.metadata.get('mosaic_column', 1))
+        self.downsample = max(1, int(np.ceil(full_size / 4096)))
+
+        self.mosaic_img = images.get_mosaic(self.overlap, self.downsample)
+        self.height, self.width = self.mosaic_img.shape
+        self.pyramid = ImagePyramid(self.mosaic_img)
+        self.update_window_title()
+        self.update_info_label()
+        self.update_image_data()
+        self.update_display()
 
-        h, w = self.img_8bit.shape
-        self.qimg = QImage(self.img_8bit.data, w, h, w, QImage.Format_Grayscale8)
+    def update_image_data(self):
+        """依目前裁切值自快取直方圖更新顯示範圍（不重新掃描整張影像）。"""
+        self.vmin, self.vmax = self.pyramid.clip_values(self.clip_lower, self.clip_upper)
 
     def update_display(self):
-        if self.qimg is None:
-            return
-
-        label_w = self.img_label.width()
-        label_h = self.img_label.height()
-
-        if label_w > 0 and label_h > 0:
-            pixmap = QPixmap.fromImage(self.qimg)
-            scaled_pixmap = pixmap.scaled(
-                label_w, label_h,
-                Qt.KeepAspectRatio,
-                Qt.SmoothTransformation
-            )
-            self.img_label.setPixmap(scaled_pixmap)
-
-    def resizeEvent(self, event):
-        super().resizeEvent(event)
-        self.update_display()
+        if self.img_view.pyramid is not self.pyramid:
+            self.img_view.set_pyramid(self.pyramid)
+        self.img_view.set_contrast(self.vmin, self.vmax)
+
+    def get_full_resolution(self):
+        """取得全解析度拼接影像及其金字塔。"""
+        if self.downsample > 1:
+            # 預覽為降採樣結果，儲存時以全解析度重新拼接。
+            mosaic = self.info.images.get_mosaic(self.overlap)
+            return ImagePyramid(mosaic), mosaic
+        return self.pyramid, self.mosaic_img
 
     def save_image(self):
         """儲存處理後的拼接影像。"""
         sample_name = f"{self.info.sample_name}.tif"
         filename, _ = QFileDialog.getSaveFileName(self, "Save mosaic", sample_name, "TIFF files (*.tif)")
         if filename:
-            Image.fromarray(self.img_8bit).save(filename)
+            pyramid, mosaic = self.get_full_resolution()
+            vmin, vmax = pyramid.clip_values(self.clip_lower, self.clip_upper)
+            Image.fromarray(to_8bit(mosaic, vmin, vmax)).save(filename)
             QMessageBox.information(self, "Save Complete", f"Mosaic saved to:\n{filename}")
+
+    def save_pyramid_tiff(self):
+        """儲存多解析度分塊 TIFF。"""
+        sample_name = f"{self.info.sample_name}_pyramid.tif"
+        filename, _ = QFileDialog.getSaveFileName(self, "Save pyramidal mosaic", sample_name, "TIFF files (*.tif)")
+        if not filename:
+            return
+        try:
+            pyramid, _ = self.get_full_resolution()
+            pyramid.save_tiff(filename, *pyramid.clip_values(self.clip_lower, self.clip_upper))
+            QMessageBox.information(self, "Save Complete", f"Pyramidal mosaic saved to:\n{filename}")
+        except Exception as e:
+            QMessageBox.critical(self, "Save Error", f"Failed to save pyramidal mosaic:\n{str(e)}")
@@ -1,15 +1,25 @@
-from src.logic.app_context import AppContext
-from src.logic.image_container import TXM_Images
-from src.logic.fbp import FBPWorker
-from src.logic.utils import norm_to_8bit, find_duplicate_angles, angle_sort
-from src.logic.decorators import handle_errors
-
-__all__ = [
-    "AppContext",
-    "TXM_Images",
-    "FBPWorker",
-    "norm_to_8bit",
-    "find_duplicate_angles",
-    "angle_sort",
-    'handle_errors',
-]
\ No newline at end of file
+import importlib
+
+# 名稱 -> 所在模組；首次存取時才匯入，批次處理 (pipeline) 因此不會載入 PyQt5。
+_EXPORTS = {
+    "AppContext": "src.logic.app_context",
+    "TXM_Images": "src.logic.image_container",
+    "FBPWorker": "src.logic.workers",
+    "ProgressiveFBPWorker": "src.logic.workers",
+    "IterativeWorker": "src.logic.workers",
+    "JobSubmitWorker": "src.logic.workers",
+    "norm_to_8bit": "src.logic.utils",
+    "find_duplicate_angles": "src.logic.utils",
+    "angle_sort": "src.logic.utils",
+    "handle_errors": "src.logic.decorators",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
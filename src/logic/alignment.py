@@ -0,0 +1,401 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, wait
+import numpy as np
+
+# Threads and per-task memory of phase_correlation_align; every frame of a
+# task holds a float32 copy, its spectrum, the cross-power spectrum and the
+# correlation surface, about 32 bytes per pixel.
+MAX_PC_WORKERS = 4
+PC_TASK_BYTES = 256 * 1024**2
+PC_BYTES_PER_PIXEL = 32
+# projections summed per step of multiscale_align, between progress reports
+SUM_CHUNK = 64
+
+
+def downsample_profiles(profiles: np.ndarray, factor: int):
+    """
+    block-mean downsample 1D profiles along the last axis.
+
+    Parameters
+    ----------
+    profiles : np.ndarray
+        array of shape (N, L)
+    factor : int
+        integer binning factor
+
+    Returns
+    -------
+    np.ndarray
+        array of shape (N, L // factor)
+    """
+    if factor == 1:
+        return profiles
+    n, size = profiles.shape
+    size = (size // factor) * factor
+    return profiles[:, :size].reshape(n, size // factor, factor).mean(axis=-1)
+
+
+def multiscale_align(images: np.ndarray, levels=(8, 4, 2, 1), search_range=150, refine_range=2,
+                     c_line='center', similarity_mode='gradient', angles=None, progress=None, stop=None):
+    """
+    coarse-to-fine estimation of vertical and horizontal projection shifts.
+
+    Vertical shifts come from the common line method on horizontal sums,
+    horizontal shifts from chaining neighbour correlations of the vertical sums.
+    The full `search_range` is only scanned at the coarsest level; every finer
+    level searches `refine_range` pixels around the upsampled estimate, so large
+    drifts cost about the same as small ones.
+
+    Parameters
+    ----------
+    images : np.ndarray
+        projection stack of shape (N, H, W)
+    levels : tuple of int
+        downsampling factors from coarse to fine, ending with 1
+    search_range : int
+        maximum shift in full-resolution pixels
+    refine_range : int
+        search half-width at every level after the coarsest
+    c_line : str
+        'center' or 'average' reference common line for the vertical shifts
+    similarity_mode : str
+        'sum' or 'gradient' profiles for similarity
+    angles : np.ndarray, optional
+        projection angles in degrees; if given, the sinusoidal motion of the
+        sample mass is removed from the horizontal shifts so only jitter remains
+    progress : callable, optional
+        progress(percent, text)
+    stop : callable, optional
+        stop() returns True to cancel the alignment
+
+    Returns
+    -------
+    np.ndarray or None
+        int array of shape (N, 2) with (dy, dx) per projection, in the same
+        convention as np.roll; None if cancelled
+    """
+    # sum in float32 without converting the whole stack
+    images = np.asarray(images)
+    n_proj, h, w = images.shape
+    hs = np.empty((n_proj, h), dtype=np.float32)  # (N, H)
+    vs = np.empty((n_proj, w), dtype=np.float32)  # (N, W)
+    for a in range(0, n_proj, SUM_CHUNK):
+        if stop is not None and stop():
+            return None
+        _report(progress, int(a / n_proj * 50), "Summing projections...")
+        hs[a:a + SUM_CHUNK] = images[a:a + SUM_CHUNK].sum(axis=2, dtype=np.float32)
+        vs[a:a + SUM_CHUNK] = images[a:a + SUM_CHUNK].sum(axis=1, dtype=np.float32)
+
+    dy = np.zeros(n_proj)
+    dx_rel = np.zeros(n_proj - 1)
+    prev_factor = None
+    for k, factor in enumerate(levels):
+        if stop is not None and stop():
+            return None
+        _report(progress, 50 + int(k / len(levels) * 50), f"Aligning at 1/{factor} resolution...")
+        hs_l = _prepare_profiles(downsample_profiles(hs, factor), similarity_mode)
+        vs_l = _prepare_profiles(downsample_profiles(vs, factor), similarity_mode)
+        if prev_factor is None:
+            window = min(int(np.ceil(search_range / factor)), hs_l.shape[1] // 2, vs_l.shape[1] // 2)
+            dy_init = np.zeros(n_proj, dtype=int)
+            dx_init = np.zeros(n_proj - 1, dtype=int)
+        else:
+            window = refine_range
+            dy_init = np.round(dy * prev_factor / factor).astype(int)
+            dx_init = np.round(dx_rel * prev_factor / factor).astype(int)
+
+        # vertical: every horizontal sum against the common line
+        if c_line == 'average':
+            reference = _roll_rows(hs_l, dy_init).mean(axis=0)
+        else:
+            reference = np.roll(hs_l[n_proj // 2], dy_init[n_proj // 2])
+        dy = _windowed_shift_search(hs_l, reference, dy_init, window)
+
+        # horizontal: projection i+1 against projection i
+        if n_proj > 1:
+            dx_rel = _windowed_shift_search(vs_l[1:], vs_l[:-1], dx_init, window)
+        prev_factor = factor
+
+    dy = dy * prev_factor
+    dx_rel = dx_rel * prev_factor
+    dx = np.concatenate(([0], np.cumsum(dx_rel)))
+    dx = dx - dx[n_proj // 2]
+    if angles is not None and n_proj >= 3:
+        dx = dx - _fit_sinusoid(dx, angles)
+    _report(progress, 100, "Done")
+    return np.stack([dy, np.round(dx)], axis=1).astype(int)
+
+
+def phase_correlation_align(images: np.ndarray, mode='neighbour', max_shift=None, subpixel=False,
+                            angles=None, alpha=0.2, n_workers=None, chunk_size=None, progress=None, stop=None):
+    """
+    2D phase-correlation registration of a whole projection stack.
+
+    Hann-windowed spectra are computed in parallel chunks on a thread pool.
+    In 'neighbour' mode every projection is registered against the previous
+    one and the relative shifts are chained outward from the centre projection.
+    In 'running' mode each projection is registered against a running average
+    of the already aligned spectra, starting from the centre projection.
+
+    Parameters
+    ----------
+    images : np.ndarray
+        projection stack of shape (N, H, W)
+    mode : str
+        'neighbour' or 'running'
+    max_shift : int, optional
+        maximum shift between a projection and its reference in pixels
+    subpixel : bool
+        refine correlation peaks with a parabolic fit and return float shifts
+    angles : np.ndarray, optional
+        projection angles in degrees; if given, the sinusoidal motion of the
+        sample is removed from the horizontal shifts so only jitter remains
+    alpha : float
+        update weight of the running reference ('running' mode only)
+    n_workers : int, optional
+        number of threads, default min(MAX_PC_WORKERS, os.cpu_count())
+    chunk_size : int, optional
+        number of projections transformed per task, default as many as fit
+        in PC_TASK_BYTES
+    progress : callable, optional
+        progress(percent, text)
+    stop : callable, optional
+        stop() returns True to cancel the registration
+
+    Returns
+    -------
+    np.ndarray or None
+        array of shape (N, 2) with (dy, dx) per projection, in the same
+        convention as np.roll; None if cancelled
+    """
+    n_proj, h, w = images.shape
+    window = np.outer(np.hanning(h), np.hanning(w)).astype(np.float32)
+    mask = _shift_mask((h, w), max_shift)
+    n_workers = n_workers or min(MAX_PC_WORKERS, os.cpu_count() or 1)
+    chunk_size = chunk_size or max(1, PC_TASK_BYTES // (PC_BYTES_PER_PIXEL * h * w))
+
+    with ThreadPoolExecutor(max_workers=n_workers) as pool:
+        if mode == 'neighbour':
+            starts = range(0, max(n_proj - 1, 0), chunk_size)
+            tasks = [(a, min(a + chunk_size, n_proj - 1)) for a in starts]
+            futures = [pool.submit(_neighbour_block, images, a, b, window, mask, subpixel) for a, b in tasks]
+            results = []
+            for k, future in enumerate(futures):
+                # wait in short steps so a cancel request is noticed while a chunk runs
+                while not wait([future], timeout=0.2).done:
+                    if stop is not None and stop():
+                        break
+                if stop is not None and stop():
+                    for f in futures:
+                        f.cancel()
+                    return None
+                results.append(future.result())
+                _report(progress, int((k + 1) / len(futures) * 100), f"Registered {tasks[k][1] + 1} / {n_proj}")
+            rel = np.concatenate(results) if tasks else np.zeros((0, 2))
+            shifts = np.concatenate([np.zeros((1, 2)), np.cumsum(rel, axis=0)])
+            shifts -= shifts[n_proj // 2]
+        elif mode == 'running':
+            shifts = _running_reference_shifts(images, window, mask, subpixel, alpha, pool, n_workers, chunk_size,
+                                               progress, stop)
+            if shifts is None:
+                return None
+        else:
+            raise ValueError(f"unknown mode: {mode}")
+
+    if angles is not None and n_proj >= 3:
+        shifts[:, 1] -= _fit_sinusoid(shifts[:, 1], angles)
+    if not subpixel:
+        shifts = np.round(shifts).astype(int)
+    return shifts
+
+
+def phase_correlate(reference: np.ndarray, moving: np.ndarray, max_shift=None, subpixel=False):
+    """
+    2D phase correlation of a single image pair.
+
+    Parameters
+    ----------
+    reference : np.ndarray
+        image of shape (H, W)
+    moving : np.ndarray
+        image of shape (H, W)
+    max_shift : int, optional
+        maximum shift in pixels
+    subpixel : bool
+        refine the correlation peak with a parabolic fit
+
+    Returns
+    -------
+    tuple (shift, peak)
+        shift : np.ndarray
+            (dy, dx) such that np.roll(moving, (dy, dx)) best matches reference
+        peak : float
+            height of the phase-correlation peak (0-1), a confidence measure
+    """
+    shape = reference.shape
+    window = np.outer(np.hanning(shape[0]), np.hanning(shape[1])).astype(np.float32)
+    spectra = _windowed_spectra(np.stack([reference, moving]), window)
+    mask = _shift_mask(shape, max_shift)
+    shifts, peaks = _cross_power_shifts(spectra[:1], spectra[1:], shape, mask, subpixel, return_peak=True)
+    return shifts[0], float(peaks[0])
+
+
+def _windowed_spectra(frames, window):
+    frames = frames.astype(np.float32)
+    frames -= frames.mean(axis=(-2, -1), keepdims=True)
+    # numpy < 2 returns complex128 for float32 input
+    return np.fft.rfft2(frames * window).astype(np.complex64, copy=False)
+
+
+def _shift_mask(shape, max_shift):
+    """
+    (rows, cols) indices of the correlation surface entries within max_shift
+    and the matching boolean row/column masks, or None.
+    """
+    if max_shift is None:
+        return None
+    axes = []
+    for size in shape:
+        inside = np.abs(np.fft.fftfreq(size) * size) <= max_shift
+        axes.append((np.flatnonzero(inside), inside))
+    (rows, row_mask), (cols, col_mask) = axes
+    return rows, cols, row_mask, col_mask
+
+
+def _cross_power_shifts(spec_ref, spec_mov, shape, mask, subpixel, return_peak=False):
+    """
+    shifts (dy, dx) such that np.roll(moving, (dy, dx)) best matches reference.
+    """
+    cross = spec_ref * np.conj(spec_mov)
+    cross /= np.abs(cross) + 1e-12
+    corr = np.fft.irfft2(cross, s=shape)
+    del cross
+
+    h, w = shape
+    n = corr.shape[0]
+    rows = np.arange(n)
+    if mask is None:
+        py, px = np.divmod(corr.reshape(n, -1).argmax(axis=1), w)
+    else:
+        # search only the entries within max_shift instead of masking a full copy
+        row_idx, col_idx, row_mask, col_mask = mask
+        window = corr[:, row_idx[:, None], col_idx[None, :]]
+        iy, ix = np.divmod(window.reshape(n, -1).argmax(axis=1), col_idx.size)
+        py, px = row_idx[iy], col_idx[ix]
+    shifts = np.stack([np.where(py > h // 2, py - h, py),
+                       np.where(px > w // 2, px - w, px)], axis=1).astype(np.float64)
+
+    if subpixel:
+        c1 = corr[rows, py, px]
+        for axis, (p, size) in enumerate([(py, h), (px, w)]):
+            lo, hi = (p - 1) % size, (p + 1) % size
+            if axis == 0:
+                c0, c2 = corr[rows, lo, px], corr[rows, hi, px]
+            else:
+                c0, c2 = corr[rows, py, lo], corr[rows, py, hi]
+            if mask is not None:
+                inside = mask[2 + axis]
+                c0, c2 = np.where(inside[lo], c0, -np.inf), np.where(inside[hi], c2, -np.inf)
+            denom = c0 - 2 * c1 + c2
+            with np.errstate(divide='ignore', invalid='ignore'):
+                offset = np.where(np.isfinite(denom) & (denom < 0), 0.5 * (c0 - c2) / denom, 0.)
+            shifts[:, axis] += np.clip(np.nan_to_num(offset), -0.5, 0.5)
+    if return_peak:
+        return shifts, corr[rows, py, px]
+    return shifts
+
+
+def _neighbour_block(images, start, stop, window, mask, subpixel):
+    """relative shifts of projections start+1..stop against their predecessors."""
+    spectra = _windowed_spectra(np.asarray(images[start:stop + 1]), window)
+    return _cross_power_shifts(spectra[:-1], spectra[1:], images.shape[1:], mask, subpixel)
+
+
+def _running_reference_shifts(images, window, mask, subpixel, alpha, pool, n_workers, chunk_size, progress=None,
+                              stop=None):
+    n_proj, h, w = images.shape
+    center = n_proj // 2
+    ky = np.fft.fftfreq(h)[:, None]
+    kx = np.fft.rfftfreq(w)[None, :]
+    shifts = np.zeros((n_proj, 2))
+
+    center_spec = _windowed_spectra(images[center:center + 1], window)[0]
+    n_done = 1
+    for order in (np.arange(center + 1, n_proj), np.arange(center - 1, -1, -1)):
+        reference = center_spec
+        for a in range(0, order.size, chunk_size):
+            if stop is not None and stop():
+                return None
+            idx = order[a:a + chunk_size]
+            parts = np.array_split(idx, min(n_workers, idx.size))
+            spectra = np.concatenate(list(pool.map(lambda p: _windowed_spectra(images[p], window), parts)))
+            for i, spec in zip(idx, spectra):
+                shift = _cross_power_shifts(reference[None], spec[None], (h, w), mask, subpixel)[0]
+                shifts[i] = shift
+                # shift the spectrum in the Fourier domain before folding it into the reference
+                aligned = spec * np.exp(-2j * np.pi * (ky * shift[0] + kx * shift[1]))
+                reference = (1 - alpha) * reference + alpha * aligned
+            n_done += idx.size
+            _report(progress, int(n_done / n_proj * 100), f"Registered {n_done} / {n_proj}")
+    return shifts
+
+
+def _report(progress, value, text):
+    if progress is not None:
+        progress(value, text)
+
+
+def _prepare_profiles(profiles, similarity_mode):
+    if similarity_mode == 'gradient':
+        profiles = np.gradient(profiles, axis=1)
+    return profiles
+
+
+def _roll_rows(signals, shifts):
+    """np.roll each row of signals by its own shift."""
+    size = signals.shape[-1]
+    idx = (np.arange(size)[None, :] - np.asarray(shifts)[:, None]) % size
+    return np.take_along_axis(signals, idx, axis=1)
+
+
+def _windowed_shift_search(signals, reference, centers, window):
+    """
+    best integer circular shift for each signal within centers ± window.
+
+    Parameters
+    ----------
+    signals : np.ndarray
+        array of shape (N, L)
+    reference : np.ndarray
+        array of shape (L,) or (N, L)
+    centers : np.ndarray
+        int array of shape (N,), initial shift estimates
+    window : int
+        search half-width
+
+    Returns
+    -------
+    np.ndarray
+        int array of shape (N,)
+    """
+    signals = signals - signals.mean(axis=-1, keepdims=True)
+    reference = reference - reference.mean(axis=-1, keepdims=True)
+    norm = np.sqrt((signals**2).sum(axis=-1)) * np.sqrt((reference**2).sum(axis=-1))
+    norm = np.where(norm > 0, norm, np.inf)
+
+    offsets = np.arange(-window, window + 1)
+    scores = np.empty((signals.shape[0], offsets.size))
+    for j, d in enumerate(offsets):
+        scores[:, j] = (_roll_rows(signals, centers + d) * reference).sum(axis=-1) / norm
+
+    # offsets are scanned from negative to positive so ties keep the first maximum
+    best = offsets[np.argmax(scores, axis=1)]
+    return np.where(np.isfinite(norm), centers + best, 0)
+
+
+def _fit_sinusoid(values, angles):
+    """least-squares fit of a*cos(theta) + b*sin(theta) + c."""
+    theta = np.deg2rad(np.asarray(angles, dtype=np.float64))
+    design = np.stack([np.cos(theta), np.sin(theta), np.ones_like(theta)], axis=1)
+    coef, *_ = np.linalg.lstsq(design, values, rcond=None)
+    return design @ coef
@@ -1,4 +1,5 @@
 import os
+from src.logic import capabilities
 
 
 class AppContext:
@@ -10,11 +11,10 @@ class AppContext:
         self.images = None
         self.mode = None
 
-        try:
-            import torch
-            self.ai_available = True
-        except ImportError:
-            self.ai_available = False
+    @property
+    def ai_available(self):
+        # 只檢查 torch 是否安裝，實際匯入延後到使用 AI 功能時。
+        return capabilities.ai_available()
 
     def set_from_file(self, filepath, mode):
         self.sample_name = os.path.splitext(os.path.basename(filepath))[0]
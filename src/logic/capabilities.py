@@ -0,0 +1,64 @@
+import functools
+import importlib
+import importlib.util
+
+
+@functools.lru_cache(maxsize=None)
+def is_available(name):
+    """
+    whether a module can be imported, without importing it.
+
+    Only the import system's finders are consulted (importlib.util.find_spec),
+    so probing a heavy package such as torch costs a directory lookup instead
+    of loading it. The answer is cached for the session. For a dotted name
+    the parent package is imported, so probe top-level names where possible.
+
+    Parameters
+    ----------
+    name : str
+        module name, e.g. 'astra' or 'torch'
+
+    Returns
+    -------
+    bool
+    """
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        # a missing parent package of a dotted name, or a broken module entry
+        return False
+
+
+def load(name):
+    """import an optional module when a feature that needs it is used; None if unavailable."""
+    if not is_available(name):
+        return None
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
+
+
+def ai_available():
+    """PyTorch for the AI tools."""
+    return is_available('torch')
+
+
+def astra_available():
+    """astra-toolbox for GPU FBP."""
+    return is_available('astra')
+
+
+def scipy_available():
+    """scipy for the sparse-matrix backprojector."""
+    return is_available('scipy')
+
+
+def numba_available():
+    """Numba for the compiled backprojection kernel."""
+    return is_available('numba')
+
+
+def tifffile_available():
+    """tifffile for pyramidal TIFF export."""
+    return is_available('tifffile')
@@ -0,0 +1,189 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+import numpy as np
+from src.logic.io_utils import read_json, write_json
+
+SCRATCH_DIR = os.path.join(os.path.expanduser("~"), ".txm_toolbox", "scratch")
+MAX_AGE_DAYS = 7
+
+# lock files held by this process; POSIX record locks do not exclude other threads
+_held = set()
+_held_lock = threading.Lock()
+
+
+def hash_array(array, chunk_bytes=64 << 20):
+    """
+    content hash of an array (shape, dtype and data), hex string.
+
+    The data is hashed in blocks along the first axis, so memory-mapped
+    stacks are never loaded at once.
+    """
+    array = np.asarray(array)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr((array.shape, array.dtype.str)).encode())
+    if array.ndim == 0 or array.size == 0:
+        h.update(np.ascontiguousarray(array).tobytes())
+        return h.hexdigest()
+    step = max(1, chunk_bytes // max(array[0].nbytes, 1))
+    for i in range(0, len(array), step):
+        h.update(memoryview(np.ascontiguousarray(array[i:i + step])).cast('B'))
+    return h.hexdigest()
+
+
+def checkpoint_key(input_hash, geometry):
+    """key of a reconstruction: the input hash and the JSON form of its geometry."""
+    text = json.dumps([input_hash, geometry], sort_keys=True, default=str)
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+class SlabCheckpoint:
+    def __init__(self, key, shape, geometry=None, scratch_dir=None):
+        """
+        output volume of a reconstruction on disk, with the finished row ranges.
+
+        <scratch_dir>/<key>/ holds volume.npy (float32, written in place
+        through a memory map) and manifest.json (geometry, shape and the
+        completed [start, stop) ranges along the first axis). A range is
+        added to the manifest only after its rows are flushed, so a crash
+        never leaves rows marked as done that are not on disk. Opening the
+        same key again resumes from the recorded ranges. The checkpoint is
+        locked while open (the lock is released by the OS if the process
+        dies); opening a checkpoint that another process holds raises
+        BlockingIOError.
+
+        Parameters
+        ----------
+        key : str
+            see checkpoint_key
+        shape : tuple of int
+            (rows, height, width) of the output volume
+        geometry : dict, optional
+            stored in the manifest for reference
+        scratch_dir : str, optional
+            default ~/.txm_toolbox/scratch
+        """
+        scratch_dir = scratch_dir or SCRATCH_DIR
+        self.directory = os.path.join(scratch_dir, key)
+        self.manifest_path = os.path.join(self.directory, 'manifest.json')
+        volume_path = os.path.join(self.directory, 'volume.npy')
+        shape = tuple(int(s) for s in shape)
+        os.makedirs(self.directory, exist_ok=True)
+        self.lock = _lock(os.path.join(self.directory, 'lock'))
+
+        manifest = read_json(self.manifest_path)
+        self.volume = None
+        if manifest and tuple(manifest.get('shape', ())) == shape and os.path.exists(volume_path):
+            try:
+                self.volume = np.load(volume_path, mmap_mode='r+')
+            except (OSError, ValueError):
+                self.volume = None
+        if self.volume is None or self.volume.shape != shape:
+            prune(scratch_dir)
+            self.volume = np.lib.format.open_memmap(volume_path, mode='w+', dtype=np.float32, shape=shape)
+            manifest = {'shape': list(shape), 'geometry': geometry, 'completed': [], 'created': time.time()}
+            write_json(self.manifest_path, manifest)
+        self.path = volume_path
+        self.manifest = manifest
+        self.completed = [tuple(r) for r in manifest['completed']]
+
+    @property
+    def n_done(self):
+        return sum(b - a for a, b in self.completed)
+
+    def missing(self, start=0, stop=None):
+        """[start, stop) ranges within [start, stop) that are not done yet."""
+        stop = len(self.volume) if stop is None else stop
+        gaps, pos = [], start
+        for a, b in self.completed:
+            if b <= pos or a >= stop:
+                continue
+            if a > pos:
+                gaps.append((pos, a))
+            pos = max(pos, b)
+        if pos < stop:
+            gaps.append((pos, stop))
+        return gaps
+
+    def done(self, start, stop):
+        """record rows [start, stop) of `volume` as written."""
+        self.volume.flush()
+        ranges = sorted(self.completed + [(int(start), int(stop))])
+        merged = [ranges[0]]
+        for a, b in ranges[1:]:
+            if a <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], b))
+            else:
+                merged.append((a, b))
+        self.completed = merged
+        self.manifest.update(completed=[list(r) for r in merged], updated=time.time())
+        write_json(self.manifest_path, self.manifest)
+
+    def close(self):
+        """release the lock; the checkpoint stays on disk."""
+        self.volume = None
+        if self.lock is not None:
+            _unlock(self.lock)
+            self.lock = None
+
+    def clear(self):
+        """delete the checkpoint; `volume` must not be used afterwards."""
+        self.volume = None
+        for name in ('manifest.json', 'volume.npy'):
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+        self.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def _lock(path):
+    """
+    exclusive non-blocking lock on `path`; returns the open file that holds it.
+
+    lockf locks belong to the process and are not inherited by forked pool
+    workers, so workers that outlive a cancelled run do not block a restart.
+    """
+    path = os.path.abspath(path)
+    with _held_lock:
+        if path in _held:
+            raise BlockingIOError(f"checkpoint in use: {os.path.dirname(path)}")
+        f = open(path, 'a+')
+        try:
+            if os.name == 'nt':
+                import msvcrt
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.lockf(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            raise BlockingIOError(f"checkpoint in use by another process: {os.path.dirname(path)}") from None
+        _held.add(path)
+    return f
+
+
+def _unlock(f):
+    with _held_lock:
+        _held.discard(os.path.abspath(f.name))
+        f.close()
+
+
+def prune(scratch_dir=SCRATCH_DIR, max_age_days=MAX_AGE_DAYS):
+    """delete checkpoints that were not updated for `max_age_days`."""
+    if not os.path.isdir(scratch_dir):
+        return
+    limit = time.time() - max_age_days * 86400
+    for name in os.listdir(scratch_dir):
+        manifest = read_json(os.path.join(scratch_dir, name, 'manifest.json'))
+        if manifest and manifest.get('updated', manifest.get('created', 0)) < limit:
+            try:
+                lock = _lock(os.path.join(scratch_dir, name, 'lock'))
+            except OSError:
+                continue
+            _unlock(lock)
+            shutil.rmtree(os.path.join(scratch_dir, name), ignore_errors=True)
@@ -1,7 +1,7 @@
 import os, glob, olefile, struct
 import numpy as np
 from PIL import Image
-from src.logic.utils import split_mosaic, norm_to_8bit
+from src.logic.utils import split_mosaic, norm_stack_to_8bit
 
 
 def read_txm_raw(filename: str, mode: str):
@@ -80,6 +80,76 @@ def read_txm_raw(filename: str, mode: str):
         return image, metadata, reference
 
 
+def read_txm_lazy(filename: str):
+    """
+    open a tomography TXRM file without reading the projections
+
+    The projections are decoded one at a time while `frames` is consumed,
+    e.g. to reconstruct during reading (StreamingReconstructor); the file
+    stays open until the generator is exhausted or closed.
+
+    Parameters
+    ----------
+    filename : str
+
+    Returns
+    -------
+    tuple (frames, metadata, thetas, reference)
+        frames : generator of np.ndarray
+            projections of shape (H, W) in file order, flipped like read_txm_raw
+        metadata : dict
+        thetas : np.ndarray
+            angles of shape (N,)
+        reference : np.ndarray or None
+    """
+    ole = olefile.OleFileIO(filename)
+    n_img = len([entry for entry in ole.listdir() if entry[0] in ['ImageData1', 'ImageData2']])
+    metadata = read_ole_metadata(ole, 'tomo', n_img)
+    info = dict(metadata)
+    thetas = np.around(metadata.pop('thetas')[:n_img], decimals=1)
+    reference = metadata.pop('reference')
+    if reference is not None:
+        reference = np.flip(reference, axis=0)
+    metadata.pop('reference_data_type', None)
+    metadata.pop('data_type', None)
+
+    def frames():
+        try:
+            for idx in range(info["number_of_images"]):
+                img_string = "ImageData{}/Image{}".format(int(np.ceil((idx + 1) / 100.0)), int(idx + 1))
+                yield np.flip(_read_ole_image(ole, img_string, info), axis=0)
+        finally:
+            ole.close()
+
+    return frames(), metadata, thetas, reference
+
+
+def read_projection(filename):
+    """
+    read one projection image and its rotation angle
+
+    Parameters
+    ----------
+    filename : str
+        .xrm or .tif file
+
+    Returns
+    -------
+    tuple (image, theta)
+        image : np.ndarray of shape (H, W)
+        theta : float or None
+            angle stored in the .xrm file, None for TIFs
+    """
+    if filename.split('.')[-1].lower() != 'xrm':
+        return np.array(Image.open(filename)), None
+    image, _, _ = read_txm_raw(filename, 'single')
+    ole = olefile.OleFileIO(filename)
+    thetas = _read_ole_arr(ole, 'ImageInfo/Angles', '<1f')
+    ole.close()
+    theta = None if thetas is None or len(thetas) == 0 else round(float(thetas[0]), 1)
+    return image.squeeze(), theta
+
+
 def read_multiple_txrm(filelist):
     """
     read multiple TXRM files and concatenate the images and angles
@@ -174,9 +244,7 @@ def save_tif(folder, sample_name, imgs, mode):
         imgs = imgs/imgs.max()
         imgs = (imgs*255).astype(np.uint8)
     elif mode == 'each':
-        for i in range(len(imgs)):
-            imgs[i] = norm_to_8bit(imgs[i])
-        imgs = imgs.astype(np.uint8)
+        imgs = norm_stack_to_8bit(imgs)
 
     for i in range(len(imgs)):  
         img_temp = imgs[i] 
@@ -184,6 +252,46 @@ def save_tif(folder, sample_name, imgs, mode):
         img_temp.save(f"{folder}/{sample_name}_{str(i+1).zfill(4)}.tif")
 
 
+def save_shifts(filename, shifts):
+    """
+    save alignment shifts in the format of the alignment tool, one "index,dy,dx" line per projection.
+
+    Parameters
+    ----------
+    filename : str
+    shifts : array-like
+        integer shifts of shape (N, 2), rows (y_shift, x_shift)
+    """
+    with open(filename, 'w') as f:
+        for i, (dy, dx) in enumerate(np.asarray(shifts, dtype=int)):
+            f.write(f"{str(i).zfill(3)},{dy},{dx}\n")
+
+
+def load_shifts(filename, n_images=None):
+    """
+    load alignment shifts written by save_shifts or the alignment tool.
+
+    Returns
+    -------
+    np.ndarray
+        integer shifts of shape (N, 2); projections missing from the file get (0, 0)
+    """
+    entries = {}
+    with open(filename, 'r') as f:
+        for line in f:
+            try:
+                idx, dy, dx = map(int, line.strip().split(','))
+            except ValueError:
+                continue
+            entries[idx] = (dy, dx)
+    n_images = n_images or (max(entries) + 1 if entries else 0)
+    shifts = np.zeros((n_images, 2), dtype=int)
+    for idx, value in entries.items():
+        if idx < n_images:
+            shifts[idx] = value
+    return shifts
+
+
 # ------- core logic of txm raw data decoding; don't modify unless you know what you are doing ------- #
 def read_ole_metadata(ole, mode, n_img=None):
     """
@@ -1,6 +1,5 @@
 import functools
 import traceback
-from PyQt5.QtWidgets import QMessageBox
 
 
 def handle_errors(title="Error"):
@@ -10,6 +9,7 @@ def handle_errors(title="Error"):
             try:
                 return func(self, *args, **kwargs)
             except Exception as e:
+                from PyQt5.QtWidgets import QMessageBox  # 只在顯示錯誤時載入 Qt
                 error_msg = f"An error occurred: {str(e)}"
                 QMessageBox.critical(self, title, error_msg)
                 print(f"Error in {func.__name__}: {e}")
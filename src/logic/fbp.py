@@ -1,26 +1,53 @@
+import os
 import time
+from functools import lru_cache
 import numpy as np
-from PIL import Image
-from PyQt5.QtCore import QThread, pyqtSignal
+from src.logic.utils import resample_stack
 
 
-class FBPWorker(QThread):
-    progress = pyqtSignal(int, str)
-    finished = pyqtSignal(np.ndarray)
-    def __init__(self, images, angles, target_size, angle_interval=1.0, astra_available=False):
+class FBPReconstructor:
+    def __init__(self, images, angles, target_size, angle_interval=1.0, astra_available=False,
+                 backend='numpy', interpolation='nearest', filter_name='hann', cutoff=1.0, center_offset=0.0,
+                 rows=None, roi=None, progress=None, n_workers=1, checkpoint=False, scratch_dir=None, cache=False, cache_dir=None):
         """
-        FBP worker thread for reconstruction.
+        FBP 重建引擎，不依賴 Qt；GUI 的 FBPWorker 與批次處理皆使用此類別。
         Args:
             images: 輸入投影影像 (N, H, W)
             angles: 每個投影的旋轉角度 (可為 None)
             target_size: 重建目標解析度 (int)
             angle_interval: 角度間隔 (度，預設 1.0)
             astra_available: 是否可使用 ASTRA GPU 加速 (bool)
+            backend: CPU 反投影後端，'numpy'、'sparse'（快取稀疏矩陣）或 'gridding'（傅立葉網格化）
+            interpolation: 稀疏矩陣插值方式，'nearest' 或 'linear'
+            filter_name: 濾波器，FILTERS 中的名稱（ASTRA 使用其內建濾波器）
+            cutoff: 濾波器截止頻率，Nyquist 頻率的比例 (0, 1]
+            center_offset: 旋轉中心相對影像中心的偏移（原始偵測器像素）
+            rows: 重建的切片範圍 (start, stop)，原始影像列座標，預設全部
+            roi: 切片內的重建區域 (top, bottom, left, right)，原始像素座標，預設整個切片
+            progress: 進度回呼 progress(百分比, 說明文字)，可為 None
+            n_workers: CPU 後端的重建行程數；大於 1 時切片分批在多個行程重建，投影經共享記憶體傳遞
+            checkpoint: 是否將完成的切片存到暫存目錄；取消或當機後以相同輸入與參數重建時跳過已完成的切片
+            scratch_dir: 檢查點目錄，預設 ~/.txm_toolbox/scratch
+            cache: 是否使用結果快取；相同輸入與參數的重建直接從磁碟讀取
+            cache_dir: 結果快取目錄，預設 ~/.txm_toolbox/recon_cache
         """
-        super().__init__()
         self.is_cancelled = False
+        self.progress = progress
+        self.n_workers = n_workers
+        self.checkpoint = checkpoint
+        self.scratch_dir = scratch_dir
+        self.cache = cache
+        self.cache_dir = cache_dir
+        self.slabs = None
+        self._input_hash = None
+        self.stage = 0
         self.angle_interval = angle_interval
         self.astra_available = astra_available
+        self.backend = backend
+        self.interpolation = interpolation
+        self.filter_name = filter_name
+        self.cutoff = cutoff
+        get_filter(filter_name, 64, cutoff)  # 及早檢查名稱
 
         if self.astra_available:
             try:
@@ -29,140 +56,648 @@ class FBPWorker(QThread):
             except ImportError:
                 self.astra_available = False
 
-        # 依影像數量與角度間隔建立角度序列。
-        n_images = len(images)
-        if angles is None or len(angles) == 0:
-            # 依間隔建立角度，假設掃描範圍為 -90 到 +90。
-            self.angles = np.arange(n_images) * angle_interval - 90.0
-        else:
-            # 使用提供的角度，但依影像數量與間隔重建角度序列。
-            self.angles = np.arange(n_images) * angle_interval + angles[0]
+        self.angles = projection_angles(len(images), angles, angle_interval)
+        # 原始影像在執行緒中逐批縮放至目標解析度。
+        self.images = images
+        self.center_offset = center_offset
+        self.raw_rows = rows
+        self.raw_roi = roi
+        self.set_target_size(target_size)
+
+    def set_target_size(self, target_size):
+        """設定重建解析度，並將旋轉中心、切片範圍與 ROI 換算至該解析度。"""
+        self.target_size = target_size
+        scale_y = target_size / self.images.shape[1]
+        scale_x = target_size / self.images.shape[2]
+        self.center = target_size // 2 + self.center_offset * scale_x
 
-        # 若指定目標解析度則縮放影像。
-        self.images = []
-        for i in range(len(images)):
-            img_temp = Image.fromarray(images[i])
-            img_temp = img_temp.resize((target_size, target_size), Image.Resampling.LANCZOS)
-            self.images.append(np.array(img_temp))
-        self.images = np.array(self.images)
+        # 只重建切片範圍與 ROI 內的體素。
+        rows, roi = self.raw_rows, self.raw_roi
+        if rows is None:
+            self.rows = (0, target_size)
+        else:
+            start = min(int(rows[0] * scale_y), target_size - 1)
+            self.rows = (start, min(max(int(np.ceil(rows[1] * scale_y)), start + 1), target_size))
+        if roi is None:
+            self.roi = (0, target_size, 0, target_size)
+        else:
+            top, left = (min(int(v * scale_x), target_size - 1) for v in (roi[0], roi[2]))
+            bottom = min(max(int(np.ceil(roi[1] * scale_x)), top + 1), target_size)
+            right = min(max(int(np.ceil(roi[3] * scale_x)), left + 1), target_size)
+            self.roi = (top, bottom, left, right)
 
     def cancel(self):
         self.is_cancelled = True
 
-    def run(self):
-        n, h, w = self.images.shape
-        recon = np.zeros((h, w, w))
-        start_time = time.time()
+    def iter_slabs(self, slab=16):
+        """逐批縮放尚未完成的列，產生 (起始列, (N, 列數, w) 投影)。"""
+        for start, stop in self.pending_rows():
+            for i in range(start, stop, slab):
+                if self.is_cancelled:
+                    return
+                rows = np.arange(i, min(i + slab, stop))
+                yield i, resample_stack(self.images, self.target_size, rows)
+
+    def pending_rows(self):
+        """尚未完成的列範圍 [(start, stop), ...]；沒有檢查點時為整個切片範圍。"""
+        start, stop = self.rows
+        if self.slabs is None:
+            return [(start, stop)]
+        return [(start + a, start + b) for a, b in self.slabs.missing()]
+
+    def slab_done(self, i, n):
+        """記錄從第 i 列開始的 n 列已寫入檢查點；取消時不記錄（該批可能未完成）。"""
+        if self.slabs is not None and not self.is_cancelled:
+            start = self.rows[0]
+            self.slabs.done(i - start, i - start + n)
+
+    def get_filter(self):
+        """目前解析度的濾波器（依名稱、長度與截止頻率快取）。"""
+        return get_filter(self.filter_name, padded_length(self.target_size), self.cutoff)
+
+    def checkpoint_geometry(self):
+        """決定重建結果的參數，與輸入雜湊一起作為檢查點與結果快取的鍵。"""
+        from src.logic.checkpoint import hash_array
+        return {'method': 'fbp', 'target_size': self.target_size, 'rows': list(self.rows), 'roi': list(self.roi),
+                'center': float(self.center), 'angles': hash_array(np.asarray(self.angles, dtype=np.float64)),
+                'backend': 'astra' if self.astra_available else self.backend, 'interpolation': self.interpolation,
+                'filter': None if self.astra_available else [self.filter_name, float(self.cutoff)]}
+
+    def result_key(self):
+        """輸入影像內容的雜湊與 checkpoint_geometry 組成的鍵（同一組影像只計算一次雜湊）。"""
+        from src.logic.checkpoint import checkpoint_key, hash_array
+
+        if self._input_hash is None or self._input_hash[0] is not self.images:
+            self.report(0, "Hashing projections...")
+            self._input_hash = (self.images, hash_array(self.images))
+        return checkpoint_key(self._input_hash[1], self.checkpoint_geometry())
+
+    def result_cache(self):
+        from src.logic.result_cache import ResultCache
+        return ResultCache(self.cache_dir)
+
+    def open_checkpoint(self, shape, key):
+        """開啟（或續用）此重建的檢查點；未啟用時回傳 None。"""
+        if not self.checkpoint:
+            return None
+        from src.logic.checkpoint import SlabCheckpoint
 
+        try:
+            slabs = SlabCheckpoint(key, shape, self.checkpoint_geometry(), self.scratch_dir)
+        except BlockingIOError:
+            # 相同的重建正在其他行程執行，不使用檢查點
+            return None
+        if slabs.n_done:
+            self.report(int(slabs.n_done / shape[0] * 100), f"Resuming: {slabs.n_done}/{shape[0]} slices done")
+        return slabs
+
+    def reconstruct(self):
+        """
+        以目前的影像、角度與解析度重建，回傳浮點數體積。
+        啟用 cache 時相同輸入與參數直接讀取快取結果；啟用 checkpoint 時跳過已完成的切片。
+        """
         if self.is_cancelled:
             return
-        
+        key = self.result_key() if self.cache or self.checkpoint else None
+        if self.cache:
+            recon = self.result_cache().get(key)
+            if recon is not None:
+                self.report(100, "Loaded from the result cache")
+                return recon
+
+        start, stop = self.rows
+        top, bottom, left, right = self.roi
+        self.slabs = self.open_checkpoint((stop - start, bottom - top, right - left), key)
+        slabs = self.slabs
+        try:
+            recon = self.reconstruct_rows()
+            if slabs is not None and recon is not None and not self.is_cancelled:
+                # 完成後讀出結果並刪除檢查點
+                recon = np.array(recon)
+                slabs.clear()
+        finally:
+            self.slabs = None
+            if slabs is not None:
+                slabs.close()
+        if self.cache and recon is not None and not self.is_cancelled:
+            self.result_cache().put(key, recon)
+        return recon
+
+    def reconstruct_rows(self):
+        """重建 pending_rows 的切片；有檢查點時結果寫入檢查點的體積。"""
+        n, w = len(self.images), self.target_size
+        start, stop = self.rows
+        top, bottom, left, right = self.roi
+        h = stop - start
+        if self.n_workers > 1 and not self.astra_available and h > 1:
+            # 平行重建自行配置結果，不先建立整個 float64 體積
+            return self.reconstruct_parallel()
+
+        if self.slabs is None:
+            recon = np.zeros((h, bottom - top, right - left))
+            resumed = 0
+        else:
+            recon = self.slabs.volume
+            resumed = self.slabs.n_done
+        start_time = time.time()
+
         if self.astra_available:
-            for i in range(h):
-                if self.is_cancelled:
-                    break 
-
-                sino = self.images[:, i, :]
-                temp = self.recon_fbp_astra(sino, angle_interval=self.angle_interval, norm=False) 
-                recon[i] = temp
-            
-                progress = int((i + 1) / h * 100)
-                elapsed = time.time() - start_time
-                if progress > 0:
-                    total_est = elapsed / (progress / 100.0)
-                    remaining = total_est - elapsed
-                    mins, secs = divmod(int(remaining), 60)
-                    remaining_str = f"Estimated time left: {mins}m {secs}s"
-                else:
-                    remaining_str = ""
-                
-                self.progress.emit(progress, remaining_str)
+            for i0, block in self.iter_slabs():
+                for j in range(block.shape[1]):
+                    if self.is_cancelled:
+                        break
+
+                    i = i0 + j - start
+                    sino = block[:, j, :]
+                    if self.center != w // 2:
+                        # astra 固定以偵測器中心為旋轉軸，先以整數位移對齊。
+                        sino = np.roll(sino, -int(round(self.center - w // 2)), axis=-1)
+                    temp = self.recon_fbp_astra(sino, angle_interval=self.angle_interval, norm=False)
+                    recon[i] = temp[top:bottom, left:right]
+                    self.emit_progress(i + 1, h, start_time, resumed)
+                self.slab_done(i0, block.shape[1])
+
+        elif self.backend == 'sparse':
+            from src.logic.recon_sparse import get_backprojection_matrix, sparse_back_projection
+
+            filt = self.get_filter()
+            self.report(0, "Preparing system matrix...")
+            matrix = get_backprojection_matrix(w, self.angles, center=self.center, interpolation=self.interpolation,
+                                               roi=self.roi)
+            shape = (bottom - top, right - left)
+
+            recon_0 = sparse_back_projection(matrix, filter_sinogram(np.ones((n, 1, w)), filt), shape)[0]
+
+            for i, block in self.iter_slabs():
+                filtered = filter_sinogram(block, filt)
+                recon[i - start:i - start + block.shape[1]] = sparse_back_projection(matrix, filtered, shape) / recon_0
+                self.slab_done(i, block.shape[1])
+                self.emit_progress(i - start + block.shape[1], h, start_time, resumed)
+
+        elif self.backend == 'gridding':
+            from src.logic.recon_gridding import GriddingReconstructor
+
+            filt = self.get_filter()
+            self.report(0, "Preparing gridding tables...")
+            gridder = GriddingReconstructor(w, self.angles, filt, center=self.center)
+
+            recon_0 = gridder.reconstruct(np.ones((n, 1, w)))[0, top:bottom, left:right]
+
+            for i, block in self.iter_slabs():
+                recon[i - start:i - start + block.shape[1]] = gridder.reconstruct(block)[:, top:bottom, left:right] / recon_0
+                self.slab_done(i, block.shape[1])
+                self.emit_progress(i - start + block.shape[1], h, start_time, resumed)
 
         else: 
-            img_size_padded = max(64, 2 ** int(np.ceil(np.log2(2 * w))))
-            hann = get_hann_filter(img_size_padded)
-            center, x, y, cos_vals, sin_vals = prepare_fbp_geometry(w, self.angles)
+            filt = self.get_filter()
+            center, x, y, cos_vals, sin_vals = prepare_fbp_geometry(w, self.angles, center=self.center)
+            x, y = x[top:bottom, left:right], y[top:bottom, left:right]
 
             empty_sino = np.ones((n, w))
-            recon_0 = filter_back_projection_fast(empty_sino, cos_vals, sin_vals, center, x, y, hann)
+            recon_0 = filter_back_projection_fast(empty_sino, cos_vals, sin_vals, center, x, y, filt)
+
+            for i0, block in self.iter_slabs():
+                for j in range(block.shape[1]):
+                    if self.is_cancelled:
+                        break
+
+                    i = i0 + j - start
+                    sino = block[:, j, :]
+                    temp = filter_back_projection_fast(sino, cos_vals, sin_vals, center, x, y, filt, filtered=True, circle=False)
+
+                    temp /= recon_0
+                    recon[i] = temp
+                    self.emit_progress(i + 1, h, start_time, resumed)
+                self.slab_done(i0, block.shape[1])
+
+        return recon
+
+    def emit_progress(self, done, total, start_time, resumed=0):
+        """回報進度與預估剩餘時間；resumed 為從檢查點續用、不計入耗時的完成量。"""
+        progress = int(done / total * 100)
+        elapsed = time.time() - start_time
+        if progress > 0 and done > resumed:
+            remaining = elapsed * (total - done) / (done - resumed)
+            mins, secs = divmod(int(remaining), 60)
+            remaining_str = f"Estimated time left: {mins}m {secs}s"
+        else:
+            remaining_str = ""
+
+        self.report(progress, remaining_str)
+
+    def report(self, value, text):
+        if self.progress is not None:
+            self.progress(value, text)
+
+    def reconstruct_parallel(self, min_rows=4):
+        """
+        在 n_workers 個行程中分批重建切片。投影放在共享記憶體（若已在共享記憶體則直接使用，
+        例如 TXM_Images.to_shared），各行程依名稱連結並寫入共享的輸出體積，不經 pickle 複製；
+        有檢查點時改為直接寫入檢查點的體積檔，只重建尚未完成的列。取消或行程異常時，共享記憶體一律釋放。
+        """
+        from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+        from src.logic.shared import SharedArray, share
+
+        start, stop = self.rows
+        top, bottom, left, right = self.roi
+        h = stop - start
+        chunks = []
+        for a, b in self.pending_rows():
+            n_chunks = max(1, min(self.n_workers * 2, (b - a) // min_rows))
+            bounds = np.linspace(a, b, n_chunks + 1).astype(int)
+            chunks += [(int(lo), int(hi)) for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo]
+        if not chunks:
+            return self.slabs.volume
+        if self.backend == 'sparse':
+            # 先在主行程建立並快取系統矩陣，各行程只需從磁碟載入。
+            from src.logic.recon_sparse import get_backprojection_matrix
+            self.report(0, "Preparing system matrix...")
+            get_backprojection_matrix(self.target_size, self.angles, center=self.center,
+                                      interpolation=self.interpolation, roi=self.roi)
+
+        params = dict(angles=self.angles, target_size=self.target_size, angle_interval=self.angle_interval,
+                      backend=self.backend, interpolation=self.interpolation, filter_name=self.filter_name,
+                      cutoff=self.cutoff, center_offset=self.center_offset, roi=self.raw_roi)
+
+        images, owned = share(self.images)
+        if self.slabs is None:
+            out = SharedArray((h, bottom - top, right - left), np.float32)
+            target, resumed = out.descriptor, 0
+        else:
+            out = None
+            target, resumed = self.slabs.path, self.slabs.n_done
+        n_procs = min(self.n_workers, len(chunks))
+        # NumPy 後端的編譯核心為多執行緒，各行程平分核心
+        init = {'initializer': _init_worker, 'initargs': (max(1, (os.cpu_count() or 1) // n_procs),)} \
+            if self.backend == 'numpy' else {}
+        pool = ProcessPoolExecutor(max_workers=n_procs, **init)
+        start_time = time.time()
+        pending, aborted = {}, False
+        try:
+            pending = {pool.submit(_reconstruct_rows, images.descriptor, target, params, rows, start): rows
+                       for rows in chunks}
+            done_rows = resumed
+            while pending:
+                done, _ = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                for future in done:
+                    a, b = pending.pop(future)
+                    done_rows += future.result()
+                    self.slab_done(a, b - a)
+                    self.emit_progress(done_rows, h, start_time, resumed)
+                if self.is_cancelled:
+                    return None
+            if out is None:
+                return self.slabs.volume
+            # 輸出直接使用共享記憶體；釋放後仍有效，最後一個參照消失時才解除對應
+            return out.array
+        except BaseException:
+            aborted = True
+            raise
+        finally:
+            # 取消或行程出錯時，尚未開始的批次直接取消，不等其餘批次完成
+            aborted = aborted or self.is_cancelled
+            if aborted:
+                for future in pending:
+                    future.cancel()
+            pool.shutdown(wait=not aborted)
+            if out is not None:
+                out.release()
+            if owned:
+                images.release()
 
-            for i in range(h):
+    def iter_stages(self, stages):
+        """
+        由粗到細依序重建，每完成一個階段產生 (階段索引, 浮點數體積)。
+        Args:
+            stages: progressive_stages 產生的 [(解析度, 角度抽取間隔), ...]
+        """
+        images, angles, target_size = self.images, self.angles, self.target_size
+        checkpoint, cache = self.checkpoint, self.cache
+        last = len(stages) - 1
+        if cache:
+            # 最終結果已在快取中時不需要預覽
+            recon = self.result_cache().get(self.result_key())
+            if recon is not None:
+                self.stage = last
+                yield last, recon
+                return
+        try:
+            for k, (size, step) in enumerate(stages):
                 if self.is_cancelled:
-                    break 
-
-                sino = self.images[:, i, :]
-                temp = filter_back_projection_fast(sino, cos_vals, sin_vals, center, x, y, hann, filtered=True, circle=False)
-                
-                temp /= recon_0
-                recon[i] = temp
-                
-                progress = int((i + 1) / h * 100)
-                elapsed = time.time() - start_time
-                if progress > 0:
-                    total_est = elapsed / (progress / 100.0)
-                    remaining = total_est - elapsed
-                    mins, secs = divmod(int(remaining), 60)
-                    remaining_str = f"Estimated time left: {mins}m {secs}s"
-                else:
-                    remaining_str = ""
-                
-                self.progress.emit(progress, remaining_str)
-
-        if not self.is_cancelled:
-            recon -= recon.min()
-            recon /= recon.max()
-            recon = (recon * 255).astype(np.uint8)
-            self.finished.emit(recon)
+                    return
+                self.stage = k
+                # 預覽階段很快，只有最後一個階段使用檢查點與結果快取
+                self.checkpoint, self.cache = checkpoint and k == last, cache and k == last
+                self.images, self.angles = images[::step], angles[::step]
+                self.set_target_size(size)
+                recon = self.reconstruct()
+                if self.is_cancelled:
+                    return
+                yield k, recon
+        finally:
+            self.images, self.angles, self.checkpoint, self.cache = images, angles, checkpoint, cache
+            self.set_target_size(target_size)
+
+
+def _init_worker(n_threads):
+    """reconstruct_parallel 子行程的初始化：限制編譯核心的執行緒數，行程數 × 執行緒數不超過核心數。"""
+    from src.logic import recon_numba
+    recon_numba.set_threads(n_threads)
+
+
+def _reconstruct_rows(images_desc, out_desc, params, rows, offset):
+    """
+    reconstruct_parallel 的子行程：連結共享記憶體，重建 rows（縮放後列座標）並寫入輸出。
+    out_desc 為共享記憶體的描述，或檢查點體積檔（.npy）的路徑。
+    """
+    from src.logic.shared import SharedArray
+
+    images = SharedArray.attach(images_desc)
+    try:
+        if isinstance(out_desc, str):
+            out = np.load(out_desc, mmap_mode='r+')
+            _reconstruct_into(images.array, out, params, rows, offset)
+            out.flush()
+            del out
+        else:
+            out = SharedArray.attach(out_desc)
+            try:
+                _reconstruct_into(images.array, out.array, params, rows, offset)
+            finally:
+                out.release()
+    finally:
+        images.release()
+    return rows[1] - rows[0]
+
+
+def _reconstruct_into(images, out, params, rows, offset):
+    engine = FBPReconstructor(images, **params)
+    engine.rows = rows
+    out[rows[0] - offset:rows[1] - offset] = engine.reconstruct()
+
+
+def progressive_stages(target_size, n_stages=3, min_size=32):
+    """
+    漸進式重建的階段：先以抽取的角度子集與低解析度快速重建，再逐步加倍角度與解析度。
+    Args:
+        n_stages: 階段數（最後一階段為完整角度與目標解析度）
+        min_size: 第一階段的最小解析度
+    Returns:
+        [(解析度, 角度抽取間隔), ...]，例如 128 -> [(32, 4), (64, 2), (128, 1)]
+    """
+    stages = []
+    for k in range(n_stages - 1, -1, -1):
+        size = max(min_size, target_size >> k)
+        if stages and stages[-1][0] >= size:
+            continue
+        stages.append((min(size, target_size), 2 ** k))
+    stages[-1] = (target_size, 1)
+    return stages
+
+
+def stage_label(stages, k):
+    """階段說明文字。"""
+    size, step = stages[k]
+    angles = "all angles" if step == 1 else f"1/{step} of the angles"
+    return f"Stage {k + 1}/{len(stages)}: {size}×{size}, {angles}"
+
+
+
+class CenterSweep:
+    def __init__(self, images, angles, target_size, offsets, rows, angle_interval=1.0, progress=None,
+                 filter_name='hann', cutoff=1.0):
+        """
+        旋轉中心搜尋：對少數切片以多個候選中心重建並評分，不依賴 Qt。
+        Args:
+            images: 輸入投影影像 (N, H, W)
+            angles: 每個投影的旋轉角度 (可為 None)
+            target_size: 重建目標解析度 (int)
+            offsets: 候選旋轉中心偏移（原始偵測器像素）
+            rows: 要重建的切片列（原始影像座標）
+            angle_interval: 角度間隔 (度，預設 1.0)
+            progress: 進度回呼 progress(百分比, 說明文字)，可為 None
+            filter_name, cutoff: 濾波器，同 FBPReconstructor
+        """
+        self.is_cancelled = False
+        self.progress = progress
+        self.filter_name = filter_name
+        self.cutoff = cutoff
+        self.offsets = np.asarray(offsets, dtype=np.float64)
+        self.angles = projection_angles(len(images), angles, angle_interval)
+        self.images = images
+        self.target_size = target_size
+        # 原始列換算為縮放後的列，執行時只縮放這些列。
+        self.rows = [min(int(row * target_size / images.shape[1]), target_size - 1) for row in rows]
+        self.centers = target_size // 2 + self.offsets * target_size / images.shape[2]
+
+    def cancel(self):
+        self.is_cancelled = True
+
+    def run(self):
+        """回傳 (重建切片 (C, R, w, w), 分數 (C,))；取消時回傳 None。"""
+        sinos = resample_stack(self.images, self.target_size, self.rows)
+        n, n_rows, w = sinos.shape
+        filt = get_filter(self.filter_name, padded_length(w), self.cutoff)
+        # 評分區域限制在所有候選中心都完整覆蓋的圓內
+        radius = max(w // 4, int(w // 2 - np.abs(self.centers - w // 2).max()) - 1)
+
+        recon = np.zeros((len(self.centers), n_rows, w, w), dtype=np.float32)
+        start_time = time.time()
+        chunk = 8
+        for i in range(0, len(self.centers), chunk):
+            if self.is_cancelled:
+                return None
+            recon[i:i + chunk] = center_sweep(sinos, self.angles, self.centers[i:i + chunk], filt)
+            self.emit_progress(min(i + chunk, len(self.centers)), len(self.centers), start_time)
+
+        scores = np.array([np.mean([center_score(s, radius) for s in slices]) for slices in recon])
+        return recon, scores
+
+    emit_progress = FBPReconstructor.emit_progress
+    report = FBPReconstructor.report
+
+
+def to_uint8(recon):
+    """將重建結果線性縮放至 0-255。"""
+    recon = recon - recon.min()
+    recon /= max(recon.max(), 1e-12)
+    return (recon * 255).astype(np.uint8)
+
+
+def projection_angles(n_images, angles=None, angle_interval=1.0):
+    """依影像數量與角度間隔建立角度序列。"""
+    if angles is None or len(angles) == 0:
+        # 依間隔建立角度，假設掃描範圍為 -90 到 +90。
+        return np.arange(n_images) * angle_interval - 90.0
+    # 使用提供的角度，但依影像數量與間隔重建角度序列。
+    return np.arange(n_images) * angle_interval + angles[0]
 
 
 # ---- FBP core functions; don't modify unless you know what you are doing ---- #
-def get_hann_filter(img_size):
-    """濾波器預計算。"""
+# 斜坡濾波器的頻率窗，q 為頻率 / 截止頻率（0 到 1）
+FILTERS = {
+    'ram-lak': lambda q: np.ones_like(q),
+    'shepp-logan': lambda q: np.sinc(q / 2),
+    'cosine': lambda q: np.cos(np.pi * q / 2),
+    'hamming': lambda q: 0.54 + 0.46 * np.cos(np.pi * q),
+    'hann': lambda q: 0.5 + 0.5 * np.cos(np.pi * q),
+    'parzen': lambda q: np.where(q <= 0.5, 1 - 6 * q ** 2 + 6 * q ** 3, 2 * (1 - q) ** 3),
+}
+
+
+def next_fast_len(n):
+    """不小於 n 的最小偶數 5-smooth 長度（只有 2、3、5 因數），實數 FFT 在此長度最快。"""
+    m = max(2, n + n % 2)
+    while True:
+        k = m
+        for p in (2, 3, 5):
+            while k % p == 0:
+                k //= p
+        if k == 1:
+            return m
+        m += 2
+
+
+def padded_length(L):
+    """偵測器寬度 L 的濾波長度：至少 2L（避免循環卷積的混疊），取 next_fast_len。"""
+    return next_fast_len(max(64, 2 * L))
+
+
+def get_filter(name, size, cutoff=1.0):
+    """
+    FBP 濾波器（快取，唯讀）：以空間域離散斜坡核計算的斜坡濾波器乘上頻率窗，截止頻率以上為 0。
+    Args:
+        name: FILTERS 中的濾波器名稱
+        size: 濾波長度（偶數，通常為 padded_length(L)）
+        cutoff: 截止頻率，Nyquist 頻率的比例 (0, 1]
+    Returns:
+        實數 FFT 的頻域濾波器，長度 size // 2 + 1
+    """
+    if name not in FILTERS:
+        raise ValueError(f"unknown filter: {name}, expected one of {', '.join(FILTERS)}")
+    return _filter(name, int(size), float(cutoff))
+
+
+@lru_cache(maxsize=32)
+def _filter(name, size, cutoff):
     n = np.concatenate((
-        np.arange(1, img_size//2 + 1, 2),
-        np.arange(img_size//2 - 1, 0, -2)
+        np.arange(1, size//2 + 1, 2),
+        np.arange(size//2 - 1, 0, -2)
     ))
-    f = np.zeros(img_size)
+    f = np.zeros(size)
     f[0] = 0.25
     f[1::2] = -1 / (np.pi * n) ** 2
-    ramp = 2 * np.real(np.fft.fft(f))
-    hann = np.hanning(img_size)
-    hann = np.fft.fftshift(hann)
-    return ramp * hann
+    ramp = 2 * np.fft.rfft(f).real
+    q = np.fft.rfftfreq(size) / (0.5 * cutoff)
+    filt = np.where(q <= 1, ramp * FILTERS[name](np.minimum(q, 1)), 0.0)
+    filt.flags.writeable = False
+    return filt
 
 
-def prepare_fbp_geometry(L, angles_deg):
-    """準備FBP幾何參數。"""
-    center = L // 2
-    x, y = np.meshgrid(np.arange(L) - center, np.arange(L) - center, indexing='ij')
+def prepare_fbp_geometry(L, angles_deg, center=None):
+    """準備FBP幾何參數；center 為旋轉軸在偵測器上的位置（預設 L // 2），重建網格固定以影像中心為原點。"""
+    x, y = np.meshgrid(np.arange(L) - L // 2, np.arange(L) - L // 2, indexing='ij')
+    if center is None:
+        center = L // 2
     angles = np.deg2rad(angles_deg)
     cos_vals = np.cos(angles + np.pi/2)
     sin_vals = np.sin(angles + np.pi/2)
     return center, x, y, cos_vals, sin_vals
 
 
-def filter_back_projection_fast(sino, cos_vals, sin_vals, center, x, y, hann=None, filtered=True, circle=False):
-    """快速反投影演算法實作。"""
+def filter_sinogram(sino, filt):
+    """沿最後一軸（偵測器方向）以實數 FFT 濾波，可一次處理多個切片；filt 為 get_filter 的結果，補零長度由其決定。"""
+    L = sino.shape[-1]
+    size = 2 * (filt.size - 1)
+    spectrum = np.fft.rfft(sino, n=size, axis=-1)
+    spectrum *= filt
+    return np.fft.irfft(spectrum, n=size, axis=-1)[..., :L]
+
+
+def filter_back_projection_fast(sino, cos_vals, sin_vals, center, x, y, filt=None, filtered=True, circle=False,
+                                compiled=True):
+    """快速反投影演算法實作；有 Numba 時使用編譯核心（結果逐位元相同），compiled=False 強制使用 NumPy。"""
     n_proj, L = sino.shape
 
-    if filtered and hann is not None:
-        pad_width = hann.size - L
-        sino_padded = np.pad(sino, ((0, 0), (0, pad_width)), mode='constant', constant_values=0)
-        sino_fft = np.fft.fft(sino_padded, axis=-1)
-        sino = np.real(np.fft.ifft(sino_fft * hann, axis=-1))[:, :L]
+    if filtered and filt is not None:
+        sino = filter_sinogram(sino, filt)
+
+    from src.logic import recon_numba
+    if compiled and recon_numba.get_kernel() is not None:
+        recon = recon_numba.back_project(sino, cos_vals, sin_vals, center, x, y)
+    else:
+        recon = np.zeros(x.shape, dtype=np.float32)
+        for i in range(n_proj):
+            t = x * cos_vals[i] + y * sin_vals[i]
+            t_idx = np.round(t + center).astype(np.int32)
+            valid = (t_idx >= 0) & (t_idx < L)
+            recon[valid] += sino[i, t_idx[valid]]
+
+    if circle:
+        dist_from_center = np.sqrt(x ** 2 + y ** 2)
+        mask = dist_from_center > min(center, L - center)
+        recon[mask] = 0
+
+    return recon
+
+
+def center_sweep(sinos, angles_deg, centers, filt):
+    """
+    以多個候選旋轉中心重建少數切片。
+
+    濾波只做一次；每個角度的索引表 floor(t + 0.5) 只算一次，各候選中心僅加上整數位移，
+    零填充的投影讓越界位置自動貢獻 0，結果與 filter_back_projection_fast 相同（僅 .5 取整方向不同）。
+    Args:
+        sinos: 投影 (N, n_rows, L)
+        angles_deg: 角度（度）
+        centers: 候選旋轉中心（重建解析度下的偵測器位置）
+        filt: get_filter 的濾波器
+    Returns:
+        (n_centers, n_rows, L, L) float32，已除以各中心的 recon_0
+    """
+    n_proj, n_rows, L = sinos.shape
+    centers = np.asarray(centers, dtype=np.float64)
+    # 依小數部分排序，讓同一索引表的候選中心在結果中連續
+    order = np.argsort(np.round(centers % 1, 6), kind='stable')
+    whole = np.floor(centers[order]).astype(np.int64)
+    fracs = np.round(centers[order] - whole, 6)
+    groups = [(frac, np.flatnonzero(fracs == frac)) for frac in np.unique(fracs)]
 
-    recon = np.zeros((L, L), dtype=np.float32)
+    # 最後一列為常數投影，用於計算各中心的 recon_0
+    filtered = filter_sinogram(np.concatenate([sinos, np.ones((n_proj, 1, L))], axis=1), filt)
+    margin = 2 * L + int(np.abs(whole).max()) + 1
+    padded = np.zeros((n_proj, n_rows + 1, L + 2 * margin), dtype=np.float32)
+    padded[:, :, margin:margin + L] = filtered
 
+    _, x, y, cos_vals, sin_vals = prepare_fbp_geometry(L, angles_deg)
+    recon = np.zeros((n_rows + 1, len(centers), L, L), dtype=np.float32)
     for i in range(n_proj):
         t = x * cos_vals[i] + y * sin_vals[i]
-        t_idx = np.round(t + center).astype(np.int32)
-        valid = (t_idx >= 0) & (t_idx < L)
-        recon[valid] += sino[i, t_idx[valid]]
+        for frac, sel in groups:
+            base = np.floor(t + frac + 0.5).astype(np.int64) + margin
+            idx = base[None] + whole[sel, None, None]
+            recon[:, sel[0]:sel[-1] + 1] += np.take(padded[i], idx, axis=1)
+
+    recon = recon[:n_rows] / recon[n_rows:]
+    result = np.empty((len(centers), n_rows, L, L), dtype=np.float32)
+    result[order] = recon.transpose(1, 0, 2, 3)
+    return result
 
-    if circle:
-        Y, X = np.ogrid[:L, :L]
-        dist_from_center = np.sqrt((X - center) ** 2 + (Y - center) ** 2)
-        mask = dist_from_center > center
-        recon[mask] = 0
 
-    return recon
\ No newline at end of file
+def center_score(recon, radius=None):
+    """
+    旋轉中心評分：圓形區域內灰階直方圖的負熵，中心正確時影像最清晰、分數最高。
+    Args:
+        recon: 重建切片 (L, L)
+        radius: 評分區域半徑，預設 L // 2
+    Returns:
+        float
+    """
+    L = recon.shape[-1]
+    radius = L // 2 if radius is None else radius
+    Y, X = np.ogrid[:L, :L]
+    values = recon[(X - L // 2) ** 2 + (Y - L // 2) ** 2 < radius ** 2]
+    values = values[np.isfinite(values)]
+    hist, _ = np.histogram(values, bins=256)
+    p = hist[hist > 0] / hist.sum()
+    return float((p * np.log(p)).sum())
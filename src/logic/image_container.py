@@ -1,5 +1,6 @@
 import numpy as np
-from src.logic.utils import mosaic_stitching, norm_to_8bit, image_resize
+from src.logic.utils import mosaic_stitching, norm_to_8bit, norm_stack_to_8bit, image_resize
+from src.logic.stitching import registered_mosaic_stitching
 
 
 class TXM_Images:
@@ -24,6 +25,8 @@ class TXM_Images:
         self.metadata = metadata or {}
         self.ref = None
         self.shift_array = None
+        self.rotation_center_offset = 0.0  # rotation axis offset from the image centre, in pixels
+        self.shared = None  # SharedArray holding self.images after to_shared()
 
         if mode == 'tomo':
             if angles is None:
@@ -46,15 +49,26 @@ class TXM_Images:
         return self.images
     
     def get_norm_images(self):
-        norm_images = np.zeros_like(self.images, dtype=np.uint8)
-        for i in range(self.images.shape[0]):
-            norm_images[i] = norm_to_8bit(self.images[i])
-        return norm_images
+        return norm_stack_to_8bit(self.images)
     
-    def get_mosaic(self):
+    def get_mosaic(self, overlap=0.0, downsample=1):
+        """
+        stitch the mosaic tiles and normalize to 8-bit.
+
+        Parameters
+        ----------
+        overlap : float
+            nominal tile overlap fraction; if > 0 the tiles are registered by
+            phase correlation and blended in the overlaps
+        downsample : int
+            binning factor of the returned mosaic, for previews
+        """
         if self.mode == 'mosaic':
             rows, cols = self.metadata['mosaic_row'], self.metadata['mosaic_column']
-            mosaic = mosaic_stitching(self.images, rows, cols)
+            if overlap > 0 or downsample > 1:
+                mosaic = registered_mosaic_stitching(self.images, rows, cols, overlap, downsample)
+            else:
+                mosaic = mosaic_stitching(self.images, rows, cols)
             mosaic = norm_to_8bit(mosaic, clip_lower=0., clip_upper=0.)
             return mosaic
         return None
@@ -71,6 +85,36 @@ class TXM_Images:
         """
         self.images = images
 
+    def to_shared(self):
+        """
+        move the working images into shared memory.
+
+        Worker processes (e.g. FBPReconstructor with n_workers > 1) then
+        attach to the segment by name instead of receiving a pickled copy.
+        The segment is unlinked by release_shared() or when this container is
+        garbage collected.
+
+        Returns
+        -------
+        SharedArray
+        """
+        from src.logic.shared import SharedArray, lookup
+
+        if self.shared is None or lookup(self.images) is not self.shared:
+            self.release_shared()
+            self.shared = SharedArray.from_array(np.ascontiguousarray(self.images))
+            self.images = self.shared.array
+        return self.shared
+
+    def release_shared(self):
+        """
+        free the shared segment; the images stay usable in this process, but
+        worker processes can no longer attach to them.
+        """
+        if self.shared is not None:
+            self.shared.release()
+            self.shared = None
+
     def set_shift_array(self, shift_array):
         """
         set the shift array for all images.
@@ -96,6 +140,19 @@ class TXM_Images:
         """
         self.images = np.roll(self.images, shift_value, axis=1)
 
+    def apply_shifts(self, shifts):
+        """
+        roll every image by its integer (y_shift, x_shift).
+
+        Parameters
+        ----------
+        shifts : array-like
+            Array of shape (N, 2) where each row is (y_shift, x_shift)
+        """
+        for i, (dy, dx) in enumerate(np.asarray(shifts, dtype=int)):
+            if dy or dx:
+                self.images[i] = np.roll(self.images[i], shift=(dy, dx), axis=(0, 1))
+
     def apply_ref(self, ref_image1, ref_image2=None, split_point=None):
         """
         apply reference image(s) to the TXM images.
@@ -0,0 +1,332 @@
+import os
+import json
+import time
+import heapq
+import getpass
+import logging
+import itertools
+import threading
+import uuid
+import urllib.request
+import urllib.error
+from concurrent.futures import ProcessPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from src.logic.io_utils import read_json, write_json
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8765
+DEFAULT_URL = f"http://127.0.0.1:{DEFAULT_PORT}"
+SPOOL_DIR = os.path.join(os.path.expanduser("~"), ".txm_toolbox", "jobs")
+
+# states of a job; the last three are final
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+FINAL_STATES = (DONE, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+# ---------------- status files ---------------- #
+def update_status(job_dir, **fields):
+    status = read_json(os.path.join(job_dir, 'status.json'), {})
+    status.update(fields, updated=time.time())
+    write_json(os.path.join(job_dir, 'status.json'), status)
+    return status
+
+
+# ---------------- worker process ---------------- #
+def init_job_process(threads):
+    """pool process initializer: the Numba kernel of a job uses its share of the cores."""
+    from src.logic import recon_numba
+    recon_numba.set_threads(threads)
+
+
+def run_job(job_dir):
+    """
+    run one job in a pool process and record its progress in <job_dir>/status.json.
+
+    A job either names raw files (`files`, optional `reference` and
+    `align`, like one scan of the batch pipeline) or an already corrected
+    projection stack (`stack`: path of a .npy file and `angles`). Creating
+    <job_dir>/cancel stops a running job at the next progress report.
+    """
+    import numpy as np
+    from src.logic import pipeline
+    from src.logic.image_container import TXM_Images
+
+    spec = read_json(os.path.join(job_dir, 'spec.json'))
+    cancel_file = os.path.join(job_dir, 'cancel')
+    update_status(job_dir, state=RUNNING, progress=0, message="Starting", pid=os.getpid(), started=time.time())
+    last = {'time': 0.0}
+
+    def progress(value, text):
+        if os.path.exists(cancel_file):
+            raise JobCancelled()
+        now = time.time()
+        last['progress'] = int(value)
+        if now - last['time'] > 0.5 or value >= 100:
+            last['time'] = now
+            update_status(job_dir, progress=int(value), message=text)
+
+    config = pipeline.merge_config({k: spec[k] for k in ('reference', 'align', 'reconstruction', 'export',
+                                                         'output_dir') if k in spec})
+    name = spec.get('name')
+    if spec.get('stack'):
+        images = np.load(spec['stack'], mmap_mode='c')
+        tomo = TXM_Images(np.asarray(images), 'tomo', angles=np.asarray(spec['angles'], dtype=np.float64))
+        result = pipeline.process_stack(tomo, name or os.path.splitext(os.path.basename(spec['stack']))[0],
+                                        config, progress)
+    else:
+        files = spec['files'] if isinstance(spec['files'], list) else [spec['files']]
+        result = pipeline.process_scan(files, config, progress)
+
+    if os.path.exists(cancel_file):
+        state = CANCELLED
+    else:
+        state = DONE if result['status'] == 'done' else FAILED
+    return update_status(job_dir, state=state, progress=100 if state == DONE else last.get('progress', 0),
+                         message=result.get('error', state), result=result, finished=time.time())
+
+
+# ---------------- scheduler ---------------- #
+class JobQueue:
+    def __init__(self, spool_dir=SPOOL_DIR, max_workers=None):
+        """
+        priority queue of reconstruction jobs on a bounded process pool.
+
+        Jobs wait in the queue (highest priority first, then first come) until
+        one of the `max_workers` pool processes is free, so a burst of
+        submissions never oversubscribes the machine. Every job lives in
+        <spool_dir>/<job id>/ as spec.json and status.json; queued and
+        interrupted jobs of a previous server session are picked up again on
+        start.
+
+        Parameters
+        ----------
+        spool_dir : str
+            directory of the job folders
+        max_workers : int, optional
+            number of jobs run at once, default os.cpu_count() // 2. Each
+            job gets os.cpu_count() // max_workers cores: the kernel threads
+            of its process and the `reconstruction.workers` of its spec are
+            limited to that share.
+        """
+        self.spool_dir = spool_dir
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) // 2)
+        self.job_threads = max(1, (os.cpu_count() or 1) // self.max_workers)
+        os.makedirs(spool_dir, exist_ok=True)
+
+        self.heap = []
+        self.counter = itertools.count()
+        self.cond = threading.Condition()
+        self.running = set()
+        self.stopped = False
+        self.pool = ProcessPoolExecutor(max_workers=self.max_workers, initializer=init_job_process,
+                                        initargs=(self.job_threads,))
+
+        self._recover()
+        self.thread = threading.Thread(target=self._dispatch, daemon=True)
+        self.thread.start()
+
+    def job_dir(self, job_id):
+        return os.path.join(self.spool_dir, os.path.basename(job_id))
+
+    def submit(self, spec):
+        """queue a job spec (dict); returns the job id."""
+        if not spec.get('files') and not spec.get('stack'):
+            raise ValueError("a job needs 'files' or 'stack'")
+        job_id = time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+        job_dir = self.job_dir(job_id)
+        os.makedirs(job_dir)
+        spec = dict(spec, id=job_id, priority=int(spec.get('priority', 0)))
+        if 'workers' in (spec.get('reconstruction') or {}):
+            workers = max(1, min(int(spec['reconstruction']['workers'] or 1), self.job_threads))
+            spec['reconstruction'] = dict(spec['reconstruction'], workers=workers)
+        spec.setdefault('user', 'unknown')
+        write_json(os.path.join(job_dir, 'spec.json'), spec)
+        update_status(job_dir, id=job_id, user=spec['user'], name=spec.get('name'), priority=spec['priority'],
+                      state=QUEUED, progress=0, message="Queued", submitted=time.time())
+        self._push(job_id, spec['priority'])
+        logger.info("job %s queued by %s (priority %d)", job_id, spec['user'], spec['priority'])
+        return job_id
+
+    def cancel(self, job_id):
+        """cancel a queued job, or ask a running job to stop; returns the new status."""
+        job_dir = self.job_dir(job_id)
+        status = self.status(job_id)
+        if status is None or status['state'] in FINAL_STATES:
+            return status
+        open(os.path.join(job_dir, 'cancel'), 'w').close()
+        with self.cond:
+            if job_id not in self.running:
+                # still in the heap; the dispatcher skips it
+                return update_status(job_dir, state=CANCELLED, message=CANCELLED, finished=time.time())
+        return update_status(job_dir, message="Cancelling")
+
+    def status(self, job_id):
+        return read_json(os.path.join(self.job_dir(job_id), 'status.json'))
+
+    def jobs(self):
+        """status of all jobs, newest first."""
+        statuses = (self.status(name) for name in sorted(os.listdir(self.spool_dir), reverse=True))
+        return [s for s in statuses if s]
+
+    def summary(self):
+        with self.cond:
+            queued = sum(1 for _, _, job_id in self.heap if self.status(job_id)['state'] == QUEUED)
+            return {'workers': self.max_workers, 'running': len(self.running), 'queued': queued,
+                    'spool_dir': self.spool_dir}
+
+    def shutdown(self):
+        with self.cond:
+            self.stopped = True
+            self.cond.notify_all()
+        self.pool.shutdown(wait=False)
+
+    def _push(self, job_id, priority):
+        with self.cond:
+            heapq.heappush(self.heap, (-priority, next(self.counter), job_id))
+            self.cond.notify()
+
+    def _recover(self):
+        for status in reversed(self.jobs()):
+            if status.get('state') == QUEUED:
+                self._push(status['id'], status.get('priority', 0))
+            elif status.get('state') == RUNNING:
+                # the reconstruction resumes from its checkpoint, see FBPReconstructor(checkpoint=True)
+                update_status(self.job_dir(status['id']), state=QUEUED, message="Requeued after a server restart")
+                self._push(status['id'], status.get('priority', 0))
+
+    def _dispatch(self):
+        while True:
+            with self.cond:
+                while not self.stopped and (not self.heap or len(self.running) >= self.max_workers):
+                    self.cond.wait()
+                if self.stopped:
+                    return
+                _, _, job_id = heapq.heappop(self.heap)
+                status = self.status(job_id)
+                if status is None or status['state'] != QUEUED:
+                    continue
+                self.running.add(job_id)
+            logger.info("job %s started", job_id)
+            future = self.pool.submit(run_job, self.job_dir(job_id))
+            future.add_done_callback(lambda f, job_id=job_id: self._finished(job_id, f))
+
+    def _finished(self, job_id, future):
+        try:
+            status = future.result()
+        except Exception as e:
+            # the job itself records failures; this is a crash of the pool process
+            status = update_status(self.job_dir(job_id), state=FAILED, message=f"{type(e).__name__}: {e}",
+                                   finished=time.time())
+        logger.info("job %s %s", job_id, status.get('state'))
+        with self.cond:
+            self.running.discard(job_id)
+            self.cond.notify()
+
+
+# ---------------- HTTP front end ---------------- #
+class JobRequestHandler(BaseHTTPRequestHandler):
+    """
+    JSON API of the job server:
+        GET    /health        workers, running and queued job counts
+        GET    /jobs          status of all jobs
+        GET    /jobs/<id>     status of one job
+        POST   /jobs          submit a job spec, returns {"id": ...}
+        DELETE /jobs/<id>     cancel a job
+    """
+    queue = None
+
+    def do_GET(self):
+        parts = self.path.strip('/').split('/')
+        if parts == ['health']:
+            self._send(200, self.queue.summary())
+        elif parts == ['jobs']:
+            self._send(200, self.queue.jobs())
+        elif len(parts) == 2 and parts[0] == 'jobs':
+            status = self.queue.status(parts[1])
+            self._send(200 if status else 404, status or {'error': 'unknown job'})
+        else:
+            self._send(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if self.path.strip('/') != 'jobs':
+            return self._send(404, {'error': 'not found'})
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            spec = json.loads(self.rfile.read(length) or b'{}')
+            self._send(201, {'id': self.queue.submit(spec)})
+        except (ValueError, TypeError) as e:
+            self._send(400, {'error': str(e)})
+
+    def do_DELETE(self):
+        parts = self.path.strip('/').split('/')
+        if len(parts) != 2 or parts[0] != 'jobs':
+            return self._send(404, {'error': 'not found'})
+        status = self.queue.cancel(parts[1])
+        self._send(200 if status else 404, status or {'error': 'unknown job'})
+
+    def _send(self, code, data):
+        body = json.dumps(data).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("%s " + format, self.address_string(), *args)
+
+
+def serve(port=DEFAULT_PORT, spool_dir=SPOOL_DIR, max_workers=None, host='127.0.0.1'):
+    """run the job server until interrupted; only local connections are accepted by default."""
+    queue = JobQueue(spool_dir, max_workers)
+    handler = type('Handler', (JobRequestHandler,), {'queue': queue})
+    server = ThreadingHTTPServer((host, port), handler)
+    logger.info("job server on http://%s:%d, %d worker(s), spool %s", host, port, queue.max_workers, spool_dir)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        queue.shutdown()
+
+
+# ---------------- client ---------------- #
+def _request(method, path, url=DEFAULT_URL, data=None, timeout=5.0):
+    body = None if data is None else json.dumps(data).encode()
+    req = urllib.request.Request(url.rstrip('/') + path, data=body, method=method,
+                                 headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        raise RuntimeError(json.loads(e.read() or b'{}').get('error', str(e))) from None
+
+
+def server_available(url=DEFAULT_URL, timeout=0.3):
+    """whether a job server answers at `url`."""
+    try:
+        _request('GET', '/health', url, timeout=timeout)
+        return True
+    except (OSError, ValueError, RuntimeError):
+        return False
+
+
+def submit_job(spec, url=DEFAULT_URL):
+    """submit a job spec; returns the job id."""
+    spec = dict(spec)
+    spec.setdefault('user', getpass.getuser())
+    return _request('POST', '/jobs', url, spec)['id']
+
+
+def job_status(job_id, url=DEFAULT_URL):
+    return _request('GET', f'/jobs/{job_id}', url)
+
+
+def cancel_job(job_id, url=DEFAULT_URL):
+    return _request('DELETE', f'/jobs/{job_id}', url)
@@ -0,0 +1,323 @@
+import os
+import copy
+import glob
+import json
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from src.logic import data_io
+from src.logic.image_container import TXM_Images
+from src.logic.utils import find_duplicate_angles, auto_select_duplicates, angle_sort
+from src.logic.fbp import FBPReconstructor, to_uint8
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {
+    # glob patterns or paths of .txrm files; a nested list is one scan split over several files
+    "inputs": [],
+    "output_dir": "batch_output",
+    # reference image (.xrm / .tif) for every scan; null uses the reference embedded in the file
+    "reference": None,
+    "align": {
+        "method": "phase_correlation",  # 'none', 'phase_correlation', 'multiscale' or 'shifts'
+        "options": {},                  # keyword arguments of the alignment function; for 'shifts':
+                                        # {"shifts": [[dy, dx], ...] or a file saved by the alignment tool}
+    },
+    "reconstruction": {
+        "enabled": True,
+        "target_size": 512,
+        "angle_interval": None,         # null: median spacing of the file angles
+        "backend": "numpy",             # 'numpy', 'sparse' or 'gridding'
+        "center_offset": 0.0,           # rotation axis offset from the image centre, detector pixels
+        "rows": None,                   # [start, stop] slice range in detector rows, null for all
+        "roi": None,                    # [top, bottom, left, right] in detector pixels, null for all
+        "interpolation": "nearest",     # 'nearest' or 'linear' (sparse backend)
+        "filter_name": "hann",          # 'ram-lak', 'shepp-logan', 'cosine', 'hamming', 'hann' or 'parzen'
+        "cutoff": 1.0,                  # filter cutoff, fraction of the Nyquist frequency
+        "workers": 1,                   # processes per reconstruction, slices shared via shared memory
+        "checkpoint": True,             # keep finished slices on disk; a restarted run skips them
+        "scratch_dir": None,            # checkpoint directory, null for ~/.txm_toolbox/scratch
+        "cache": False,                 # reuse volumes of identical reconstructions from the result cache
+        "cache_dir": None,              # result cache directory, null for ~/.txm_toolbox/recon_cache
+    },
+    "export": {
+        "projections": None,            # null, 'raw', 'global' or 'each' (modes of data_io.save_tif)
+        "reconstruction": True,         # 8-bit TIF slices
+        "volume": False,                # 8-bit volume as <scan>_recon.npy
+    },
+    "workers": 1,
+}
+
+
+def load_config(path):
+    """
+    read a JSON batch configuration and fill in the defaults.
+
+    Parameters
+    ----------
+    path : str
+        JSON file; sections that are left out take the values of DEFAULT_CONFIG
+
+    Returns
+    -------
+    dict
+        the merged configuration
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        user = json.load(f)
+    return merge_config(user)
+
+
+def merge_config(user):
+    """DEFAULT_CONFIG updated with `user`, one level deep for the section dicts."""
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    for key, value in user.items():
+        if key not in config:
+            raise ValueError(f"unknown config key: {key}")
+        if isinstance(config[key], dict) and isinstance(value, dict):
+            config[key].update(value)
+        else:
+            config[key] = value
+    return config
+
+
+def expand_scans(inputs):
+    """
+    expand the `inputs` entries into scans.
+
+    Parameters
+    ----------
+    inputs : list
+        glob patterns or file paths; every matched file is one scan, a nested
+        list of patterns is a single scan read with read_multiple_txrm
+
+    Returns
+    -------
+    list of list of str
+        files of every scan, in input order without duplicates
+    """
+    def match(pattern):
+        files = sorted(glob.glob(os.path.expanduser(pattern)))
+        if not files:
+            logger.warning("no file matches %s", pattern)
+        return files
+
+    scans, seen = [], set()
+    for entry in inputs:
+        if isinstance(entry, (list, tuple)):
+            groups = [[f for pattern in entry for f in match(pattern)]]
+        else:
+            groups = [[f] for f in match(entry)]
+        for files in groups:
+            if files and tuple(files) not in seen:
+                seen.add(tuple(files))
+                scans.append(files)
+    return scans
+
+
+def scan_name(files):
+    """output name of a scan: the file name, with '_merged' for multi-file scans."""
+    name = os.path.splitext(os.path.basename(files[0]))[0]
+    return name if len(files) == 1 else f"{name}_merged"
+
+
+def load_scan(files, reference=None):
+    """
+    load one tomography scan and apply the reference.
+
+    Duplicate angles of multi-file scans are resolved with
+    auto_select_duplicates, the same choice the GUI proposes.
+
+    Returns
+    -------
+    TXM_Images
+    """
+    if len(files) == 1:
+        images, metadata, angles, ref = data_io.read_txm_raw(files[0], mode='tomo')
+    else:
+        images, angles, ref, _ = data_io.read_multiple_txrm(files)
+        metadata = None
+        duplicates = find_duplicate_angles(angles)
+        if duplicates:
+            choices, _ = auto_select_duplicates(images, duplicates, ref)
+            dropped = {i for group, choice in zip(duplicates, choices) for i in group if i != group[choice]}
+            keep = [i for i in range(len(angles)) if i not in dropped]
+            images, angles = images[keep], angles[keep]
+        images, angles = angle_sort(images, angles)
+
+    tomo = TXM_Images(images, 'tomo', metadata, angles)
+    if reference is not None:
+        ref = data_io.load_ref(reference)
+    if ref is not None:
+        tomo.apply_ref(ref)
+    else:
+        logger.warning("%s: no reference image, projections are not normalized", scan_name(files))
+    return tomo
+
+
+def align_scan(tomo, method='phase_correlation', **options):
+    """
+    auto-align the projections in place, like the buttons of the alignment tool.
+
+    Returns
+    -------
+    np.ndarray
+        integer (dy, dx) shifts of shape (N, 2)
+    """
+    from src.logic.alignment import multiscale_align, phase_correlation_align
+
+    if method in (None, 'none'):
+        return np.zeros((len(tomo), 2), dtype=int)
+    if method == 'shifts':
+        shifts = options['shifts']
+        if isinstance(shifts, str):
+            shifts = data_io.load_shifts(shifts, len(tomo))
+        shifts = np.asarray(shifts, dtype=int).reshape(len(tomo), 2)
+        tomo.apply_shifts(shifts)
+        return shifts
+
+    proj_images = tomo.get_norm_images()
+    options.setdefault('angles', tomo.angles)
+    if method == 'phase_correlation':
+        options.setdefault('max_shift', proj_images.shape[1] // 4)
+        shifts = phase_correlation_align(proj_images, **options)
+    elif method == 'multiscale':
+        shifts = multiscale_align(proj_images, **options)
+    else:
+        raise ValueError(f"unknown alignment method: {method}")
+
+    shifts = np.asarray(shifts, dtype=int)
+    if shifts.ndim == 1:
+        shifts = np.stack([shifts, np.zeros_like(shifts)], axis=1)
+    tomo.apply_shifts(shifts)
+    return shifts
+
+
+def reconstruct_scan(tomo, target_size=512, angle_interval=None, backend='numpy', center_offset=0.0, rows=None,
+                     roi=None, interpolation='nearest', filter_name='hann', cutoff=1.0, workers=1, checkpoint=False,
+                     scratch_dir=None, cache=False, cache_dir=None, progress=None):
+    """
+    FBP reconstruction of an aligned scan.
+
+    Returns
+    -------
+    np.ndarray
+        float volume of shape (n_rows, target_size, target_size)
+    """
+    angles = np.asarray(tomo.angles, dtype=np.float64)
+    if angle_interval is None:
+        angle_interval = float(np.median(np.diff(angles))) if len(angles) > 1 else 1.0
+    if workers > 1:
+        tomo.to_shared()
+    images = tomo.get_full_images()
+    target_size = min(int(target_size), images.shape[2])
+    engine = FBPReconstructor(images, angles, target_size, angle_interval, backend=backend,
+                              interpolation=interpolation, filter_name=filter_name, cutoff=cutoff,
+                              center_offset=center_offset, rows=rows, roi=roi, progress=progress, n_workers=workers,
+                              checkpoint=checkpoint, scratch_dir=scratch_dir, cache=cache, cache_dir=cache_dir)
+    try:
+        return engine.reconstruct()
+    finally:
+        tomo.release_shared()
+
+
+def process_scan(files, config, progress=None):
+    """
+    load -> reference -> align -> reconstruct -> export for one scan.
+
+    Parameters
+    ----------
+    files : list of str
+        files of the scan, see expand_scans
+    config : dict
+        batch configuration, see DEFAULT_CONFIG
+    progress : callable, optional
+        progress(percent, text) of the reconstruction step
+
+    Returns
+    -------
+    dict
+        'scan', 'status' ('done' or 'failed'), 'outputs', 'seconds' and, on
+        failure, 'error'
+    """
+    logger.info("%s: loading %d file(s)", scan_name(files), len(files))
+    result = _process(scan_name(files), lambda: load_scan(files, config['reference']), config, progress)
+    result['files'] = list(files)
+    return result
+
+
+def process_stack(tomo, name, config, progress=None):
+    """process_scan for projections that are already in memory (e.g. corrected in the GUI)."""
+    return _process(name, lambda: tomo, config, progress)
+
+
+def _process(name, load, config, progress=None):
+    result = {'scan': name, 'status': 'done', 'outputs': []}
+    start_time = time.time()
+    try:
+        out_dir = os.path.join(config['output_dir'], name)
+        os.makedirs(out_dir, exist_ok=True)
+        tomo = load()
+
+        align = dict(config['align'])
+        method = align.get('method')
+        logger.info("%s: aligning (%s)", name, method)
+        shifts = align_scan(tomo, method, **dict(align.get('options') or {}))
+        data_io.save_shifts(os.path.join(out_dir, f"{name}_shifts.txt"), shifts)
+
+        mode = config['export']['projections']
+        if mode:
+            folder = os.path.join(out_dir, 'projections')
+            os.makedirs(folder, exist_ok=True)
+            data_io.save_tif(folder, name, tomo.get_full_images(), mode)
+            result['outputs'].append(folder)
+
+        recon_cfg = dict(config['reconstruction'])
+        if recon_cfg.pop('enabled', True):
+            logger.info("%s: reconstructing at %s px", name, recon_cfg.get('target_size'))
+            recon = to_uint8(reconstruct_scan(tomo, progress=progress, **recon_cfg))
+            if config['export']['reconstruction']:
+                folder = os.path.join(out_dir, 'recon')
+                os.makedirs(folder, exist_ok=True)
+                data_io.save_tif(folder, f"{name}_recon", recon, 'raw')
+                result['outputs'].append(folder)
+            if config['export']['volume']:
+                path = os.path.join(out_dir, f"{name}_recon.npy")
+                np.save(path, recon)
+                result['outputs'].append(path)
+    except Exception as e:
+        logger.exception("%s: failed", name)
+        result.update(status='failed', error=f"{type(e).__name__}: {e}")
+
+    result['seconds'] = round(time.time() - start_time, 1)
+    logger.info("%s: %s in %.1f s", name, result['status'], result['seconds'])
+    return result
+
+
+def run_batch(config, scans=None):
+    """
+    process all scans of a configuration, `workers` scans at a time.
+
+    Each scan runs in its own process; a failing scan is reported and does
+    not stop the others. A summary is written to <output_dir>/batch_summary.json.
+
+    Returns
+    -------
+    list of dict
+        process_scan results in input order
+    """
+    scans = expand_scans(config['inputs']) if scans is None else scans
+    os.makedirs(config['output_dir'], exist_ok=True)
+    n_workers = max(1, min(int(config['workers'] or 1), len(scans) or 1))
+    logger.info("processing %d scan(s) with %d worker(s)", len(scans), n_workers)
+
+    if n_workers == 1:
+        results = [process_scan(files, config) for files in scans]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            results = list(pool.map(process_scan, scans, [config] * len(scans)))
+
+    with open(os.path.join(config['output_dir'], 'batch_summary.json'), 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    return results
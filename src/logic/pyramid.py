@@ -0,0 +1,140 @@
+from collections import OrderedDict
+import numpy as np
+
+
+class ImagePyramid:
+    def __init__(self, image: np.ndarray, tile_size=256, n_bins=4096, cache_tiles=512):
+        """
+        Tiled multi-resolution pyramid of a large 2D image.
+
+        Level 0 is the image itself; every next level is a 2x2 block mean of the
+        previous one, down to a single tile. A histogram of level 0 is computed
+        once so contrast changes never rescan the image.
+
+        Parameters
+        ----------
+        image : np.ndarray
+            2D image of shape (H, W)
+        tile_size : int
+            tile edge length in pixels (multiple of 16 for TIFF export)
+        n_bins : int
+            number of histogram bins used for percentile lookup
+        cache_tiles : int
+            number of rendered 8-bit tiles kept in memory
+        """
+        self.tile_size = tile_size
+        self.levels = [image]
+        while max(self.levels[-1].shape) > tile_size:
+            prev = self.levels[-1]
+            h, w = prev.shape[0] // 2 * 2, prev.shape[1] // 2 * 2
+            if h == 0 or w == 0:
+                break
+            self.levels.append(prev[:h, :w].reshape(h // 2, 2, w // 2, 2).mean(axis=(1, 3), dtype=np.float32))
+
+        vmin, vmax = float(image.min()), float(image.max())
+        if vmax == vmin:
+            vmax = vmin + 1e-7
+        hist, self.bin_edges = np.histogram(image, bins=n_bins, range=(vmin, vmax))
+        self.cdf = np.cumsum(hist) / hist.sum()
+
+        self._cache = OrderedDict()
+        self._cache_size = cache_tiles
+
+    @property
+    def shape(self):
+        return self.levels[0].shape
+
+    @property
+    def n_levels(self):
+        return len(self.levels)
+
+    def clip_values(self, clip_lower=0.0, clip_upper=0.0):
+        """
+        clip points for the given percentiles, looked up in the cached histogram.
+
+        Returns
+        -------
+        tuple (vmin, vmax)
+        """
+        lower = np.interp(clip_lower / 100, self.cdf, self.bin_edges[1:])
+        upper = np.interp(1 - clip_upper / 100, self.cdf, self.bin_edges[1:])
+        if clip_lower <= 0:
+            lower = self.bin_edges[0]
+        if upper <= lower:
+            upper = lower + 1e-7
+        return float(lower), float(upper)
+
+    def level_for_scale(self, scale):
+        """
+        coarsest level that still has at least one pixel per screen pixel.
+
+        Parameters
+        ----------
+        scale : float
+            screen pixels per level-0 pixel
+        """
+        if scale >= 1:
+            return 0
+        level = int(np.floor(np.log2(1 / scale)))
+        return min(level, self.n_levels - 1)
+
+    def tile_grid(self, level):
+        """number of tile rows and columns at a level."""
+        h, w = self.levels[level].shape
+        return -(-h // self.tile_size), -(-w // self.tile_size)
+
+    def get_tile(self, level, ty, tx, vmin, vmax):
+        """
+        8-bit tile (ty, tx) of a level; edge tiles are smaller than tile_size.
+        """
+        key = (level, ty, tx, vmin, vmax)
+        tile = self._cache.get(key)
+        if tile is not None:
+            self._cache.move_to_end(key)
+            return tile
+
+        ts = self.tile_size
+        data = self.levels[level][ty * ts:(ty + 1) * ts, tx * ts:(tx + 1) * ts]
+        tile = np.ascontiguousarray(to_8bit(data, vmin, vmax))
+        self._cache[key] = tile
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return tile
+
+    def iter_tiles(self, level, vmin, vmax):
+        """yield full-size 8-bit tiles of a level in row-major order, zero padded at the edges."""
+        ts = self.tile_size
+        n_ty, n_tx = self.tile_grid(level)
+        for ty in range(n_ty):
+            for tx in range(n_tx):
+                data = to_8bit(self.levels[level][ty * ts:(ty + 1) * ts, tx * ts:(tx + 1) * ts], vmin, vmax)
+                if data.shape != (ts, ts):
+                    data = np.pad(data, ((0, ts - data.shape[0]), (0, ts - data.shape[1])))
+                yield data
+
+    def save_tiff(self, filename, vmin, vmax):
+        """
+        export the pyramid as a tiled, pyramidal (sub-IFD) 8-bit BigTIFF.
+
+        Requires the optional `tifffile` package.
+        """
+        try:
+            import tifffile
+        except ImportError:
+            raise ImportError("Pyramidal TIFF export requires the 'tifffile' package (pip install tifffile)")
+
+        ts = self.tile_size
+        with tifffile.TiffWriter(filename, bigtiff=True) as tif:
+            for level in range(self.n_levels):
+                options = dict(shape=self.levels[level].shape, dtype=np.uint8, tile=(ts, ts), photometric='minisblack')
+                if level == 0:
+                    options['subifds'] = self.n_levels - 1
+                else:
+                    options['subfiletype'] = 1
+                tif.write(self.iter_tiles(level, vmin, vmax), **options)
+
+
+def to_8bit(img, vmin, vmax):
+    """linearly map [vmin, vmax] to 0-255."""
+    img = (img - vmin) / (vmax - vmin)
+    return (np.clip(img, 0, 1) * 255).astype(np.uint8)
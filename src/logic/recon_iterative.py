@@ -0,0 +1,256 @@
+import time
+import numpy as np
+from src.logic.fbp import FBPReconstructor, prepare_fbp_geometry
+
+
+class ParallelProjector:
+    def __init__(self, width, angles_deg, center=None):
+        """
+        Matched forward / back projector of a parallel-beam geometry.
+
+        Uses the nearest-bin geometry of filter_back_projection_fast. The
+        detector is zero padded on both sides so every pixel of the L x L grid
+        maps to a valid bin and no per-angle masks are needed.
+
+        Parameters
+        ----------
+        width : int
+            detector width, also the reconstruction size
+        angles_deg : np.ndarray
+            projection angles in degrees
+        center : float, optional
+            rotation centre on the detector, default width // 2
+        """
+        L = width
+        center, x, y, cos_vals, sin_vals = prepare_fbp_geometry(L, angles_deg, center)
+        self.width = L
+        self.n_angles = len(cos_vals)
+        self.margin = L + int(np.ceil(abs(center - L // 2)))
+        self.n_bins = L + 2 * self.margin
+
+        # detector bin (in the padded detector) hit by every pixel, per angle
+        self.bins = np.empty((self.n_angles, L * L), dtype=np.int32)
+        for i in range(self.n_angles):
+            t = x * cos_vals[i] + y * sin_vals[i]
+            self.bins[i] = np.round(t + center).astype(np.int32).ravel() + self.margin
+
+        self.ray_sums = self.forward(np.ones((1, L, L), dtype=np.float32))[:, 0]
+
+    def forward(self, volume, angles=None):
+        """
+        project slices.
+
+        Parameters
+        ----------
+        volume : np.ndarray
+            slices of shape (R, L, L)
+        angles : array-like, optional
+            indices of the projections to compute, default all
+
+        Returns
+        -------
+        np.ndarray
+            float32 projections of shape (len(angles), R, L)
+        """
+        angles = range(self.n_angles) if angles is None else angles
+        n_rows, L = volume.shape[0], self.width
+        flat = volume.reshape(n_rows, -1)
+        offsets = (np.arange(n_rows) * self.n_bins)[:, None]
+        sino = np.empty((len(angles), n_rows, L), dtype=np.float32)
+        for o, k in enumerate(angles):
+            proj = np.bincount((offsets + self.bins[k]).ravel(), weights=flat.ravel(),
+                               minlength=n_rows * self.n_bins)
+            sino[o] = proj.reshape(n_rows, self.n_bins)[:, self.margin:self.margin + L]
+        return sino
+
+    def back(self, sino, angles=None):
+        """
+        backproject projections, the transpose of forward.
+
+        Parameters
+        ----------
+        sino : np.ndarray
+            projections of shape (len(angles), R, L)
+        angles : array-like, optional
+            indices of the given projections, default all
+
+        Returns
+        -------
+        np.ndarray
+            float32 slices of shape (R, L, L)
+        """
+        angles = range(self.n_angles) if angles is None else angles
+        n_rows, L = sino.shape[1], self.width
+        padded = np.zeros((n_rows, self.n_bins), dtype=np.float32)
+        volume = np.zeros((n_rows, L * L), dtype=np.float32)
+        for o, k in enumerate(angles):
+            padded[:, self.margin:self.margin + L] = sino[o]
+            volume += padded[:, self.bins[k]]
+        return volume.reshape(n_rows, L, L)
+
+
+def ordered_subsets(n_angles, n_subsets):
+    """interleaved projection subsets, e.g. [0, 4, 8, ...], [1, 5, 9, ...]."""
+    n_subsets = max(1, min(n_subsets, n_angles))
+    return [np.arange(s, n_angles, n_subsets) for s in range(n_subsets)]
+
+
+def os_em(sino, projector, n_iter=10, n_subsets=10, callback=None):
+    """
+    ordered-subset expectation maximization.
+
+    Parameters
+    ----------
+    sino : np.ndarray
+        non-negative projections of shape (N, R, L)
+    projector : ParallelProjector
+        projector of the acquisition geometry
+    n_iter : int
+        number of passes over all subsets
+    n_subsets : int
+        number of ordered subsets, 1 gives plain ML-EM
+    callback : callable, optional
+        called with the finished iteration number; returning True stops early
+
+    Returns
+    -------
+    np.ndarray
+        float32 slices of shape (R, L, L)
+    """
+    n_rows, L = sino.shape[1], projector.width
+    subsets = ordered_subsets(projector.n_angles, n_subsets)
+    sensitivity = [projector.back(np.ones((len(s), 1, L), dtype=np.float32), s)[0] for s in subsets]
+
+    volume = np.ones((n_rows, L, L), dtype=np.float32)
+    for it in range(n_iter):
+        for s, sens in zip(subsets, sensitivity):
+            estimate = projector.forward(volume, s)
+            ratio = np.divide(sino[s], estimate, out=np.zeros_like(estimate), where=estimate > 1e-12)
+            volume *= np.divide(projector.back(ratio, s), sens, out=np.zeros_like(volume), where=sens > 0)
+        if callback is not None and callback(it + 1):
+            break
+    return volume
+
+
+def sirt(sino, projector, n_iter=10, n_subsets=1, relaxation=1.0, nonnegative=True, callback=None):
+    """
+    simultaneous iterative reconstruction technique, optionally with ordered subsets (OS-SART).
+
+    Parameters
+    ----------
+    sino : np.ndarray
+        projections of shape (N, R, L)
+    projector : ParallelProjector
+        projector of the acquisition geometry
+    n_iter : int
+        number of passes over all subsets
+    n_subsets : int
+        number of ordered subsets, 1 gives plain SIRT
+    relaxation : float
+        update step size
+    nonnegative : bool
+        clip negative values after every update
+    callback : callable, optional
+        called with the finished iteration number; returning True stops early
+
+    Returns
+    -------
+    np.ndarray
+        float32 slices of shape (R, L, L)
+    """
+    n_rows, L = sino.shape[1], projector.width
+    subsets = ordered_subsets(projector.n_angles, n_subsets)
+    row_weights = np.divide(1.0, projector.ray_sums, out=np.zeros_like(projector.ray_sums),
+                            where=projector.ray_sums > 0)[:, None, :]
+    sensitivity = [projector.back(np.ones((len(s), 1, L), dtype=np.float32), s)[0] for s in subsets]
+
+    volume = np.zeros((n_rows, L, L), dtype=np.float32)
+    for it in range(n_iter):
+        for s, sens in zip(subsets, sensitivity):
+            residual = (sino[s] - projector.forward(volume, s)) * row_weights[s]
+            update = np.divide(projector.back(residual, s), sens, out=np.zeros_like(volume), where=sens > 0)
+            volume += relaxation * update
+            if nonnegative:
+                np.maximum(volume, 0, out=volume)
+        if callback is not None and callback(it + 1):
+            break
+    return volume
+
+
+def transmission_to_attenuation(sino, floor=1e-6):
+    """line integrals -log(I / I0) of reference-corrected transmission data."""
+    return -np.log(np.clip(sino, floor, None))
+
+
+class IterativeReconstructor(FBPReconstructor):
+    def __init__(self, images, angles, target_size, angle_interval=1.0, method='osem', n_iter=10, n_subsets=10,
+                 relaxation=1.0, log_transform=False, center_offset=0.0, rows=None, progress=None, checkpoint=False,
+                 scratch_dir=None, cache=False, cache_dir=None):
+        """
+        OS-EM / SIRT reconstruction of a projection stack.
+
+        Resampling, slice range, checkpoints, result cache, cancellation
+        and progress reporting are those of FBPReconstructor; slabs of 16 rows are
+        reconstructed at once.
+
+        Parameters
+        ----------
+        method : str
+            'osem' or 'sirt'
+        n_iter : int
+            number of passes over all subsets
+        n_subsets : int
+            number of ordered subsets
+        relaxation : float
+            SIRT update step size
+        log_transform : bool
+            take -log of the (reference-corrected transmission) projections first
+        """
+        super().__init__(images, angles, target_size, angle_interval, center_offset=center_offset, rows=rows,
+                         progress=progress, checkpoint=checkpoint, scratch_dir=scratch_dir,
+                         cache=cache, cache_dir=cache_dir)
+        self.method = method
+        self.n_iter = n_iter
+        self.n_subsets = n_subsets
+        self.relaxation = relaxation
+        self.log_transform = log_transform
+
+    def checkpoint_geometry(self):
+        geometry = super().checkpoint_geometry()
+        geometry.update(method=self.method, n_iter=self.n_iter, n_subsets=self.n_subsets, relaxation=self.relaxation,
+                        log_transform=self.log_transform, backend='projector', filter=None)
+        return geometry
+
+    def reconstruct_rows(self, slab=16):
+        """
+        Returns
+        -------
+        np.ndarray
+            float32 volume of shape (stop - start, target_size, target_size)
+        """
+        w = self.target_size
+        start, stop = self.rows
+        h = stop - start
+        recon = np.zeros((h, w, w), dtype=np.float32) if self.slabs is None else self.slabs.volume
+        resumed = 0 if self.slabs is None else self.slabs.n_done // slab * self.n_iter
+        start_time = time.time()
+
+        self.report(0, "Preparing projector...")
+        projector = ParallelProjector(w, self.angles, self.center)
+        total = -(-h // slab) * self.n_iter
+
+        for i, block in self.iter_slabs(slab):
+            sino = transmission_to_attenuation(block) if self.log_transform else block
+            done = (i - start) // slab * self.n_iter
+
+            def callback(it, done=done):
+                self.emit_progress(done + it, total, start_time, resumed)
+                return self.is_cancelled
+
+            if self.method == 'osem':
+                result = os_em(np.maximum(sino, 0), projector, self.n_iter, self.n_subsets, callback)
+            else:
+                result = sirt(sino, projector, self.n_iter, self.n_subsets, self.relaxation, callback=callback)
+            recon[i - start:i - start + block.shape[1]] = result
+            self.slab_done(i, block.shape[1])
+        return recon
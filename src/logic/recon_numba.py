@@ -0,0 +1,131 @@
+import os
+import logging
+import threading
+import numpy as np
+from src.logic import capabilities
+
+logger = logging.getLogger(__name__)
+
+# numba.prange once the kernel is compiled; plain range keeps the module importable without Numba
+prange = range
+
+
+def _back_project(sino, cos_vals, sin_vals, center, x, y):
+    n_proj, L = sino.shape
+    h, w = x.shape
+    recon = np.zeros((h, w), dtype=np.float32)
+    # rows in parallel; within a row every pixel still sums the projections in order, as the NumPy loop does
+    for r in prange(h):
+        row = recon[r]
+        for i in range(n_proj):
+            cos_i, sin_i = cos_vals[i], sin_vals[i]
+            for c in range(w):
+                k = np.rint(x[r, c] * cos_i + y[r, c] * sin_i + center)
+                if 0 <= k < L:
+                    row[c] = np.float32(row[c] + sino[i, int(k)])
+    return recon
+
+
+# compiled kernels by `parallel`, None after a failed compilation
+_kernels = {}
+# the threaded kernel has run in this process; forked children must not start its thread pool again
+_threads_started = False
+_forked = False
+# the workqueue thread pool is not thread-safe: one threaded call at a time
+_call_lock = threading.Lock()
+
+
+def _after_fork():
+    global _forked
+    _forked = _threads_started
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def get_kernel():
+    """
+    the compiled backprojection kernel, or None if Numba is unavailable.
+
+    Compiled on first use (parallel over reconstruction rows, no
+    temporary arrays) and cached on disk by Numba where the package directory
+    is writable; a failed compilation falls back to NumPy. Processes forked
+    after the threaded kernel has run get a single-threaded build, since
+    the thread pool does not survive a fork. Set TXM_DISABLE_NUMBA=1 to
+    force the NumPy loop.
+    """
+    if os.environ.get('TXM_DISABLE_NUMBA') or not capabilities.numba_available():
+        return None
+    parallel = not _forked
+    if parallel not in _kernels:
+        _kernels[parallel] = _compile(parallel)
+    return _kernels[parallel]
+
+
+def _compile(parallel):
+    global prange
+    try:
+        import numba
+        prange = numba.prange
+        if 'NUMBA_THREADING_LAYER' not in os.environ:
+            # TBB's scheduler deadlocks at interpreter exit once the process has forked (worker pools)
+            numba.config.THREADING_LAYER = 'workqueue'
+        try:
+            kernel = numba.njit(parallel=parallel, cache=True)(_back_project)
+        except RuntimeError:
+            # no writable cache location, e.g. inside a frozen application
+            kernel = numba.njit(parallel=parallel)(_back_project)
+        # compile now, so that a failure falls back here instead of in the middle of a reconstruction
+        _run(kernel, parallel, np.zeros((1, 2)), np.ones(1), np.zeros(1), 0.0,
+             np.zeros((1, 1), dtype=np.int64), np.zeros((1, 1), dtype=np.int64))
+        return kernel
+    except Exception as e:
+        logger.warning("Numba backprojection kernel unavailable, using NumPy: %s", e)
+        return None
+
+
+def _run(kernel, parallel, *args):
+    global _threads_started
+    if not parallel:
+        return kernel(*args)
+    with _call_lock:
+        _threads_started = True
+        return kernel(*args)
+
+
+def back_project(sino, cos_vals, sin_vals, center, x, y):
+    """
+    unfiltered backprojection of one slice with the compiled kernel.
+
+    Bit-identical to the NumPy loop of filter_back_projection_fast: the
+    same float64 detector coordinate, round-half-to-even index and
+    per-pixel float32 accumulation in projection order.
+
+    Parameters
+    ----------
+    sino : np.ndarray
+        (filtered) projections of shape (N, L)
+    cos_vals, sin_vals : np.ndarray
+        direction cosines of the projections, see prepare_fbp_geometry
+    center : float
+        rotation centre on the detector
+    x, y : np.ndarray
+        integer pixel coordinates of the reconstruction region
+
+    Returns
+    -------
+    np.ndarray
+        float32 image of x.shape
+    """
+    kernel = get_kernel()
+    return _run(kernel, not _forked, np.ascontiguousarray(sino), np.ascontiguousarray(cos_vals, dtype=np.float64),
+                np.ascontiguousarray(sin_vals, dtype=np.float64), float(center), x, y)
+
+
+def set_threads(n):
+    """limit the kernel threads of this process, e.g. in each of several worker processes."""
+    if get_kernel() is None or _forked:
+        return
+    import numba
+    numba.set_num_threads(max(1, min(int(n), numba.config.NUMBA_NUM_THREADS)))
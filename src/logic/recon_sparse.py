@@ -0,0 +1,201 @@
+import os
+import hashlib
+import zipfile
+import numpy as np
+from src.logic.fbp import prepare_fbp_geometry
+from src.logic.result_cache import ResultCache, logger
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".txm_toolbox", "sparse_bp")
+MAX_BYTES = 8 << 30
+
+_matrix_cache = {}
+
+
+def geometry_key(width, angles_deg, center=None, interpolation='nearest', roi=None):
+    """
+    hash identifying a backprojection geometry.
+
+    Returns
+    -------
+    str
+        hex digest of (width, angles, center, interpolation, roi)
+    """
+    if center is None:
+        center = width // 2
+    h = hashlib.sha1()
+    h.update(f"{width}|{float(center)!r}|{interpolation}|".encode())
+    if roi is not None and tuple(roi) != (0, width, 0, width):
+        h.update(f"roi{tuple(int(v) for v in roi)}|".encode())
+    h.update(np.ascontiguousarray(angles_deg, dtype=np.float64).tobytes())
+    return h.hexdigest()
+
+
+def build_backprojection_matrix(width, angles_deg, center=None, interpolation='nearest', roi=None):
+    """
+    sparse backprojection operator of a parallel-beam geometry.
+
+    Row p = i * w + j of the matrix is reconstruction pixel (i, j) of the
+    (h, w) region, column k * width + s is detector bin s of projection k, so
+    that recon.ravel() = matrix @ sino.ravel() for one slice.
+
+    Parameters
+    ----------
+    width : int
+        detector width, also the reconstruction size
+    angles_deg : np.ndarray
+        projection angles in degrees
+    center : float, optional
+        rotation centre on the detector, default width // 2
+    interpolation : str
+        'nearest' (same as filter_back_projection_fast) or 'linear'
+    roi : tuple, optional
+        (top, bottom, left, right) region of the slice, default the whole slice
+
+    Returns
+    -------
+    scipy.sparse.csr_matrix
+        float32 matrix of shape (h * w, n_angles * width)
+    """
+    from scipy import sparse
+
+    L = width
+    default_center, x, y, cos_vals, sin_vals = prepare_fbp_geometry(L, angles_deg)
+    if center is None:
+        center = default_center
+    if roi is not None:
+        top, bottom, left, right = roi
+        x, y = x[top:bottom, left:right], y[top:bottom, left:right]
+    n_pixels = x.size
+    x, y = x.ravel(), y.ravel()
+    pixels = np.arange(n_pixels, dtype=np.int32)
+
+    rows, cols, data = [], [], []
+    for i in range(len(cos_vals)):
+        t = x * cos_vals[i] + y * sin_vals[i] + center
+        if interpolation == 'nearest':
+            t_idx = np.round(t).astype(np.int32)
+            valid = (t_idx >= 0) & (t_idx < L)
+            rows.append(pixels[valid])
+            cols.append(i * L + t_idx[valid])
+            data.append(np.ones(valid.sum(), dtype=np.float32))
+        elif interpolation == 'linear':
+            t0 = np.floor(t).astype(np.int32)
+            frac = (t - t0).astype(np.float32)
+            for idx, weight in ((t0, 1 - frac), (t0 + 1, frac)):
+                valid = (idx >= 0) & (idx < L) & (weight > 0)
+                rows.append(pixels[valid])
+                cols.append(i * L + idx[valid])
+                data.append(weight[valid])
+        else:
+            raise ValueError(f"unknown interpolation: {interpolation}")
+
+    matrix = sparse.csr_matrix(
+        (np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))),
+        shape=(n_pixels, len(cos_vals) * L), dtype=np.float32)
+    return matrix
+
+
+class MatrixCache(ResultCache):
+    SUFFIX = '.npz'
+
+    def __init__(self, directory=None, max_bytes=MAX_BYTES):
+        """
+        on-disk cache of backprojection matrices with the LRU eviction of
+        ResultCache; every matrix is stored as <directory>/<key>.npz.
+
+        Parameters
+        ----------
+        directory : str, optional
+            default ~/.txm_toolbox/sparse_bp
+        max_bytes : int
+            size limit of the cache directory, default 8 GiB
+        """
+        super().__init__(directory or CACHE_DIR, max_bytes)
+
+    def get(self, key):
+        """cached matrix of `key`, or None."""
+        from scipy import sparse
+
+        path = self.path(key)
+        try:
+            matrix = sparse.load_npz(path).tocsr()
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            logger.warning("dropping unreadable cache entry %s", path)
+            self._remove(path)
+            return None
+        self._touch(path)
+        return matrix
+
+    def put(self, key, matrix):
+        """store `matrix` under `key` and evict old entries; matrices larger than the cache are skipped."""
+        from scipy import sparse
+
+        if matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes > self.max_bytes:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            sparse.save_npz(f, matrix, compressed=False)
+        os.replace(tmp_path, path)
+        self.evict()
+
+
+def get_backprojection_matrix(width, angles_deg, center=None, interpolation='nearest', roi=None,
+                              cache_dir=CACHE_DIR, max_bytes=MAX_BYTES):
+    """
+    backprojection matrix for a geometry, cached in memory and on disk.
+
+    The first request for a geometry builds the matrix and stores it in
+    `cache_dir` as <width>_<key>.npz; later requests, also in later sessions,
+    only load it. The least recently used matrices are deleted once the
+    directory holds more than `max_bytes`.
+    """
+    key = geometry_key(width, angles_deg, center, interpolation, roi)
+    if key in _matrix_cache:
+        return _matrix_cache[key]
+
+    disk_cache = MatrixCache(cache_dir, max_bytes) if cache_dir else None
+    name = f"{width}_{key[:16]}"
+    matrix = disk_cache.get(name) if disk_cache else None
+    if matrix is None:
+        matrix = build_backprojection_matrix(width, angles_deg, center, interpolation, roi)
+        if disk_cache:
+            disk_cache.put(name, matrix)
+
+    _matrix_cache.clear()  # keep a single geometry in memory
+    _matrix_cache[key] = matrix
+    return matrix
+
+
+def clear_matrix_cache(cache_dir=CACHE_DIR):
+    """delete all cached backprojection matrices in `cache_dir` and in memory."""
+    _matrix_cache.clear()
+    MatrixCache(cache_dir).clear()
+
+
+def sparse_back_projection(matrix, filtered, shape=None):
+    """
+    backproject many slices with one sparse-times-dense product.
+
+    Parameters
+    ----------
+    matrix : scipy.sparse.csr_matrix
+        from get_backprojection_matrix, shape (h * w, N * L)
+    filtered : np.ndarray
+        filtered projections of shape (N, n_rows, L)
+    shape : tuple, optional
+        (h, w) of the reconstructed region, default (L, L)
+
+    Returns
+    -------
+    np.ndarray
+        reconstructed slices of shape (n_rows, h, w)
+    """
+    n, n_rows, L = filtered.shape
+    shape = (L, L) if shape is None else tuple(shape)
+    block = np.ascontiguousarray(filtered.transpose(0, 2, 1), dtype=np.float32).reshape(n * L, n_rows)
+    recon = matrix @ block  # (h * w, n_rows)
+    return np.ascontiguousarray(recon.T).reshape(n_rows, *shape)
@@ -0,0 +1,109 @@
+import os
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".txm_toolbox", "recon_cache")
+MAX_BYTES = 8 << 30
+
+
+class ResultCache:
+    SUFFIX = '.npy'
+
+    def __init__(self, directory=None, max_bytes=MAX_BYTES):
+        """
+        content-addressed cache of reconstructed volumes with LRU eviction.
+
+        Every volume is stored as <directory>/<key>.npy (float32), where the
+        key identifies the input stack and every parameter that changes the
+        result (see FBPReconstructor.result_key); display settings are not
+        part of it. Reading an entry refreshes its modification time, and
+        after each store the least recently used entries are deleted until
+        the directory holds at most `max_bytes`.
+
+        Parameters
+        ----------
+        directory : str, optional
+            default ~/.txm_toolbox/recon_cache
+        max_bytes : int
+            size limit of the cache directory, default 8 GiB
+        """
+        self.directory = directory or CACHE_DIR
+        self.max_bytes = max_bytes
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}{self.SUFFIX}")
+
+    def get(self, key):
+        """cached volume of `key`, or None."""
+        path = self.path(key)
+        try:
+            volume = np.load(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            logger.warning("dropping unreadable cache entry %s", path)
+            self._remove(path)
+            return None
+        self._touch(path)
+        return volume
+
+    def put(self, key, volume):
+        """store `volume` under `key` and evict old entries; volumes larger than the cache are skipped."""
+        volume = np.asarray(volume, dtype=np.float32)
+        if volume.nbytes > self.max_bytes:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, volume)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def entries(self):
+        """(path, size, last use) of all entries, least recently used first."""
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(self.SUFFIX):
+                path = os.path.join(self.directory, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((path, st.st_size, st.st_mtime))
+        return sorted(entries, key=lambda e: e[2])
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """delete least recently used entries until the cache fits in max_bytes."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def clear(self):
+        for path, _, _ in self.entries():
+            self._remove(path)
+
+    @staticmethod
+    def _touch(path):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,130 @@
+import os
+import sys
+import weakref
+from multiprocessing import shared_memory
+import numpy as np
+
+# segments created by this process, by name; used to find the segment behind an array
+_owned = weakref.WeakValueDictionary()
+
+
+class _SharedMemory(shared_memory.SharedMemory):
+    # SharedMemory.close() unmaps the segment even while NumPy views of it exist (NumPy keeps a
+    # reference to the buffer object, not a buffer export), so only drop the references here:
+    # the mapping is freed by reference counting together with the last view.
+    def close(self):
+        self._buf = None
+        self._mmap = None
+        if getattr(self, '_fd', -1) >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class SharedArray:
+    def __init__(self, shape, dtype, name=None, create=True):
+        """
+        NumPy array in a named shared-memory segment.
+
+        The creating process owns the segment: it is unlinked by release(),
+        when the owner object is garbage collected, or at interpreter exit. If
+        the owner is killed, multiprocessing's resource tracker unlinks it
+        (POSIX); on Windows the memory is freed with the last handle. Other
+        processes attach with SharedArray.attach(descriptor) and only unmap.
+
+        Parameters
+        ----------
+        shape : tuple of int
+        dtype : np.dtype or str
+        name : str, optional
+            segment name; required with create=False
+        create : bool
+            create a new segment, or attach to the existing segment `name`
+        """
+        dtype = np.dtype(dtype)
+        nbytes = max(int(np.prod(shape)) * dtype.itemsize, 1)
+        if create:
+            self.shm = _SharedMemory(name=name, create=True, size=nbytes)
+        elif sys.version_info >= (3, 13):
+            self.shm = _SharedMemory(name=name, track=False)
+        else:
+            self.shm = _SharedMemory(name=name)
+        self.owner = create
+        self.array = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf)
+        self._finalizer = weakref.finalize(self, _release, self.shm, create)
+        if create:
+            _owned[self.shm.name] = self
+
+    @classmethod
+    def from_array(cls, array):
+        """copy `array` into a new segment (the only copy made)."""
+        shared = cls(array.shape, array.dtype)
+        shared.array[...] = array
+        return shared
+
+    @classmethod
+    def attach(cls, descriptor):
+        """attach to a segment created in another process, see `descriptor`."""
+        name, shape, dtype = descriptor
+        return cls(shape, dtype, name=name, create=False)
+
+    @property
+    def descriptor(self):
+        """picklable (name, shape, dtype) that identifies the array in other processes."""
+        return self.shm.name, tuple(self.array.shape), self.array.dtype.str
+
+    def release(self):
+        """
+        unlink the segment (owner only) and unmap it.
+
+        Views of `array` that are still referenced stay valid; the memory is
+        unmapped when the last of them is gone, but other processes can no
+        longer attach.
+        """
+        self.array = None
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def _release(shm, unlink):
+    shm.close()
+    if unlink:
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def lookup(array):
+    """
+    the SharedArray whose full array is `array`, or None.
+
+    Lets code that only receives an ndarray (e.g. TXM_Images.images after
+    to_shared) hand the segment name to worker processes instead of pickling
+    the data.
+    """
+    if not isinstance(array, np.ndarray):
+        return None
+    address = array.__array_interface__['data'][0]
+    for shared in list(_owned.values()):
+        arr = shared.array
+        if arr is not None and arr.__array_interface__['data'][0] == address \
+                and arr.shape == array.shape and arr.dtype == array.dtype and array.flags.c_contiguous:
+            return shared
+    return None
+
+
+def share(array):
+    """
+    (SharedArray, owned) for `array`: the existing segment if `array` already
+    lives in shared memory, otherwise a new segment with a copy of it; `owned`
+    tells whether the caller should release it.
+    """
+    shared = lookup(array)
+    if shared is not None:
+        return shared, False
+    return SharedArray.from_array(np.ascontiguousarray(array)), True
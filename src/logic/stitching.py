@@ -0,0 +1,185 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from src.logic.alignment import phase_correlate
+
+
+def nominal_tile_positions(rows: int, cols: int, tile_shape, overlap=0.0):
+    """
+    top-left corners (y, x) of the tiles on the rigid acquisition grid.
+
+    Tiles are ordered like mosaic_stitching: tile i * cols + j is row i counted
+    from the bottom, column j counted from the left.
+
+    Returns
+    -------
+    np.ndarray
+        array of shape (rows * cols, 2)
+    """
+    h, w = tile_shape
+    step_y = int(round(h * (1 - overlap)))
+    step_x = int(round(w * (1 - overlap)))
+    positions = np.zeros((rows * cols, 2))
+    for i in range(rows):
+        for j in range(cols):
+            positions[i * cols + j] = ((rows - 1 - i) * step_y, j * step_x)
+    return positions
+
+
+def tile_pairs(rows: int, cols: int):
+    """
+    neighbouring tile pairs as (a, b, axis); b is right of a (axis 1) or below a (axis 0).
+    """
+    pairs = []
+    for i in range(rows):
+        for j in range(cols):
+            k = i * cols + j
+            if j + 1 < cols:
+                pairs.append((k, k + 1, 1))
+            if i > 0:
+                # row i - 1 is displayed below row i
+                pairs.append((k, k - cols, 0))
+    return pairs
+
+
+def register_tiles(patches: np.ndarray, rows: int, cols: int, overlap=0.1, max_shift=None,
+                   min_peak=0.03, n_workers=None):
+    """
+    estimate tile positions from phase correlation of neighbouring overlap strips.
+
+    Every neighbouring pair is correlated in parallel, then a global weighted
+    least-squares layout is solved from all pairwise offsets. Pairs with a weak
+    correlation peak fall back to the nominal offset with a small weight.
+
+    Parameters
+    ----------
+    patches : np.ndarray
+        tiles of shape (rows * cols, H, W)
+    rows, cols : int
+        mosaic grid size
+    overlap : float
+        nominal overlap fraction between neighbouring tiles
+    max_shift : int, optional
+        maximum deviation from the nominal offset in pixels, default half the overlap
+    min_peak : float
+        minimum phase-correlation peak accepted as a valid match
+    n_workers : int, optional
+        number of threads, default os.cpu_count()
+
+    Returns
+    -------
+    np.ndarray
+        top-left corners (y, x) of shape (rows * cols, 2), shifted so the minimum is 0
+    """
+    n_tiles = rows * cols
+    h, w = patches.shape[1:]
+    nominal = nominal_tile_positions(rows, cols, (h, w), overlap)
+    if overlap <= 0 or n_tiles == 1:
+        return nominal
+
+    ov_y = h - int(round(h * (1 - overlap)))
+    ov_x = w - int(round(w * (1 - overlap)))
+    if max_shift is None:
+        max_shift = max(1, min(ov_y, ov_x) // 2)
+
+    def measure(pair):
+        a, b, axis = pair
+        if axis == 1:
+            strip_a, strip_b = patches[a][:, w - ov_x:], patches[b][:, :ov_x]
+        else:
+            strip_a, strip_b = patches[a][h - ov_y:, :], patches[b][:ov_y, :]
+        shift, peak = phase_correlate(strip_a, strip_b, max_shift=max_shift, subpixel=True)
+        return shift, peak
+
+    pairs = tile_pairs(rows, cols)
+    n_workers = n_workers or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=n_workers) as pool:
+        results = list(pool.map(measure, pairs))
+
+    # least squares on p_b - p_a = nominal offset + measured correction
+    system = np.zeros((len(pairs) + 1, n_tiles))
+    target = np.zeros((len(pairs) + 1, 2))
+    for r, ((a, b, _), (shift, peak)) in enumerate(zip(pairs, results)):
+        offset = nominal[b] - nominal[a]
+        if peak >= min_peak:
+            weight = peak
+            offset = offset + shift
+        else:
+            weight = 0.1 * min_peak
+        system[r, a], system[r, b] = -weight, weight
+        target[r] = weight * offset
+    # anchor the first tile at its nominal position
+    system[-1, 0] = 1.
+    target[-1] = nominal[0]
+
+    positions, *_ = np.linalg.lstsq(system, target, rcond=None)
+    return positions - positions.min(axis=0)
+
+
+def blend_tiles(patches: np.ndarray, positions: np.ndarray, downsample=1):
+    """
+    blend tiles onto one canvas with linear feathering in the overlaps.
+
+    Parameters
+    ----------
+    patches : np.ndarray
+        tiles of shape (N, H, W)
+    positions : np.ndarray
+        top-left corners (y, x) of shape (N, 2)
+    downsample : int
+        integer block-mean binning applied to the tiles before blending,
+        for fast previews
+
+    Returns
+    -------
+    np.ndarray
+        float32 mosaic
+    """
+    n_tiles, h, w = patches.shape
+    h_b, w_b = h // downsample, w // downsample
+    positions = np.round(np.asarray(positions) / downsample).astype(int)
+    canvas_h = int(positions[:, 0].max()) + h_b
+    canvas_w = int(positions[:, 1].max()) + w_b
+
+    ramp_y = np.minimum(np.arange(1, h_b + 1), np.arange(h_b, 0, -1)).astype(np.float32)
+    ramp_x = np.minimum(np.arange(1, w_b + 1), np.arange(w_b, 0, -1)).astype(np.float32)
+    weight = np.outer(ramp_y, ramp_x)
+
+    acc = np.zeros((canvas_h, canvas_w), dtype=np.float32)
+    acc_w = np.zeros((canvas_h, canvas_w), dtype=np.float32)
+    for tile, (y, x) in zip(patches, positions):
+        if downsample > 1:
+            tile = tile[:h_b * downsample, :w_b * downsample]
+            tile = tile.reshape(h_b, downsample, w_b, downsample).mean(axis=(1, 3))
+        acc[y:y + h_b, x:x + w_b] += tile * weight
+        acc_w[y:y + h_b, x:x + w_b] += weight
+
+    return acc / np.maximum(acc_w, 1e-12)
+
+
+def registered_mosaic_stitching(patches: np.ndarray, rows: int, cols: int, overlap=0.1, downsample=1, **kwargs):
+    """
+    register neighbouring tiles and blend them into one mosaic.
+
+    Parameters
+    ----------
+    patches : np.ndarray
+        tiles of shape (N, H, W); only the first rows * cols are used
+    rows, cols : int
+        mosaic grid size
+    overlap : float
+        nominal overlap fraction between neighbouring tiles
+    downsample : int
+        binning factor of the returned mosaic
+    **kwargs
+        passed to register_tiles
+
+    Returns
+    -------
+    np.ndarray
+        float32 mosaic
+    """
+    assert len(patches) % (rows * cols) == 0, "區塊數量無法剛好組成拼接影像"
+    patches = patches[:rows * cols]
+    positions = register_tiles(patches, rows, cols, overlap, **kwargs)
+    return blend_tiles(patches, positions, downsample)
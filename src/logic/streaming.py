@@ -0,0 +1,251 @@
+import os
+import glob
+import time
+import numpy as np
+from src.logic import data_io
+from src.logic.utils import resample_stack, resample_rows, image_resize
+from src.logic.fbp import get_filter, padded_length, filter_sinogram, prepare_fbp_geometry, filter_back_projection_fast
+
+
+class StreamingReconstructor:
+    def __init__(self, target_size, rows=None, filter_name='hann', cutoff=1.0, center_offset=0.0, ref=None,
+                 image_shape=None, progress=None):
+        """
+        FBP of a few slices that is updated projection by projection.
+
+        FBP is a sum over projections, so every projection is filtered and
+        backprojected into running accumulators as soon as it arrives (from
+        a watch folder, read_txm_lazy or a shifted projection in the
+        alignment tool) and preview() is the reconstruction from the
+        projections seen so far. Like FBPReconstructor the slices are
+        normalized by the backprojection of a constant projection over the
+        same angles, which is accumulated alongside; once all projections
+        have arrived the result equals FBPReconstructor's (numpy backend, same
+        angles) to float32 precision. The angle of each projection is used
+        as given, so projections may arrive in any order.
+
+        Parameters
+        ----------
+        target_size : int
+            reconstruction size, at most the image width
+        rows : list of int, optional
+            slice rows in raw image coordinates, default the centre row
+        filter_name, cutoff : str, float
+            FBP filter, see FBPReconstructor
+        center_offset : float
+            rotation axis offset from the image centre, raw detector pixels
+        ref : np.ndarray, optional
+            reference image; projections are divided by it as in TXM_Images.apply_ref
+        image_shape : tuple of int, optional
+            (H, W) of the projections; taken from the first projection if omitted
+        progress : callable, optional
+            progress(percent, text)
+        """
+        self.is_cancelled = False
+        self.progress = progress
+        self.target_size = target_size
+        self.raw_rows = rows
+        self.filter_name = filter_name
+        self.cutoff = cutoff
+        self.center_offset = center_offset
+        self.raw_ref = ref
+        self.image_shape = None
+        self.angles = []
+        get_filter(filter_name, 64, cutoff)  # fail early on an unknown name
+        if image_shape is not None:
+            self.setup(image_shape)
+
+    def setup(self, image_shape):
+        """allocate the accumulators for projections of shape (H, W) and clear them."""
+        h, w = image_shape[-2:]
+        self.image_shape = (h, w)
+        self.target_size = size = min(int(self.target_size), w)
+        rows = [h // 2] if self.raw_rows is None else self.raw_rows
+        self.rows = [min(int(row * size / h), size - 1) for row in rows]
+        self.center = size // 2 + self.center_offset * size / w
+        self.ref = None if self.raw_ref is None else image_resize(self.raw_ref, w).astype(np.float32)
+        self.filt = get_filter(self.filter_name, padded_length(size), self.cutoff)
+        _, x, y, _, _ = prepare_fbp_geometry(size, [], center=self.center)
+        self.x, self.y = x, y
+        self.filtered_ones = filter_sinogram(np.ones((1, size)), self.filt)
+        self.recon = np.zeros((len(self.rows), size, size))
+        self.recon_0 = np.zeros((size, size))
+        self.angles = []
+
+    @property
+    def n_projections(self):
+        return len(self.angles)
+
+    def cancel(self):
+        self.is_cancelled = True
+
+    def add(self, image, angle):
+        """filter and backproject one raw projection (H, W) taken at `angle` degrees."""
+        if self.image_shape is None:
+            self.setup(image.shape)
+        image = np.asarray(image, dtype=np.float32)
+        if self.ref is not None:
+            image = image / self.ref
+        self.add_rows(resample_stack(image[None], self.target_size, self.rows)[0], angle)
+
+    def add_rows(self, sino, angle, weight=1.0):
+        """
+        add the detector rows of the selected slices of one projection.
+
+        Parameters
+        ----------
+        sino : np.ndarray
+            (n_rows, width) detector rows; other widths than target_size
+            are resampled horizontally as in resample_stack
+        angle : float
+            projection angle in degrees
+        weight : float
+            -1 removes a projection added before with the same rows and angle
+        """
+        cos_vals, sin_vals = self._direction(angle)
+        self._backproject(sino, cos_vals, sin_vals, weight)
+        self.recon_0 += weight * filter_back_projection_fast(self.filtered_ones, cos_vals, sin_vals, self.center,
+                                                             self.x, self.y, filtered=False)
+        if weight > 0:
+            self.angles.append(float(angle))
+        elif float(angle) in self.angles:
+            self.angles.remove(float(angle))
+
+    def replace_rows(self, old, new, angle):
+        """
+        replace the rows of a projection added before, e.g. after it was shifted.
+
+        FBP is linear and the normalization depends only on the angle, so
+        this costs one filtering and one backprojection (of new - old).
+        """
+        old = np.asarray(old, dtype=np.float64).reshape(len(self.rows), -1)
+        new = np.asarray(new, dtype=np.float64).reshape(len(self.rows), -1)
+        self._backproject(new - old, *self._direction(angle))
+
+    def _direction(self, angle):
+        # direction of the projection, as in prepare_fbp_geometry
+        theta = np.deg2rad([angle]) + np.pi / 2
+        return np.cos(theta), np.sin(theta)
+
+    def _backproject(self, sino, cos_vals, sin_vals, weight=1.0):
+        sino = np.asarray(sino, dtype=np.float64).reshape(len(self.rows), -1)
+        if sino.shape[1] != self.target_size:
+            sino = resample_rows(sino, self.target_size)
+        sino = filter_sinogram(sino, self.filt)
+        for k in range(len(self.rows)):
+            self.recon[k] += weight * filter_back_projection_fast(sino[k:k + 1], cos_vals, sin_vals, self.center,
+                                                                  self.x, self.y, filtered=False)
+
+    def preview(self):
+        """float32 slices (n_rows, target_size, target_size) from the projections added so far."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            recon = self.recon / self.recon_0
+        return np.nan_to_num(recon, nan=0.0, posinf=0.0, neginf=0.0).astype(np.float32)
+
+    def describe(self):
+        """short status text: number of projections and their angular range."""
+        if not self.angles:
+            return "Waiting for projections..."
+        return f"{len(self.angles)} projections, {min(self.angles):.1f}° to {max(self.angles):.1f}°"
+
+    def iter_previews(self, frames, n_total=None, interval=0.25):
+        """
+        add (image, angle) pairs from `frames` and yield (preview, text) at
+        most every `interval` seconds and after the last projection.
+
+        Parameters
+        ----------
+        frames : iterable
+            (image, angle) pairs, e.g. from txrm_frames or folder_frames
+        n_total : int, optional
+            expected number of projections, for the progress percentage
+        interval : float
+            minimum time between previews in seconds
+        """
+        last, pending = time.time(), False
+        for image, angle in frames:
+            if self.is_cancelled:
+                break
+            self.add(image, angle)
+            pending = True
+            if n_total:
+                self.report(min(100, int(self.n_projections / n_total * 100)), self.describe())
+            if time.time() - last >= interval:
+                yield self.preview(), self.describe()
+                last, pending = time.time(), False
+        if pending:
+            yield self.preview(), self.describe()
+
+    def report(self, value, text):
+        if self.progress is not None:
+            self.progress(value, text)
+
+
+def txrm_frames(filename):
+    """
+    (frames, n_total, reference) of a TXRM file read lazily with
+    data_io.read_txm_lazy; frames yields (image, angle) pairs.
+    """
+    images, _, thetas, reference = data_io.read_txm_lazy(filename)
+    return zip(images, thetas), len(thetas), reference
+
+
+def watch_folder(folder, patterns=('*.tif', '*.tiff', '*.xrm'), poll=0.5, idle_timeout=None, stop=None):
+    """
+    yield the image files of `folder` in name order, including files that
+    appear later, e.g. projections written during an acquisition.
+
+    A file is yielded once its size is unchanged over one poll interval, so
+    files that are still being written are not read.
+
+    Parameters
+    ----------
+    folder : str
+    patterns : tuple of str
+        glob patterns of the image files
+    poll : float
+        seconds between directory scans
+    idle_timeout : float, optional
+        stop after this many seconds without a new file; None waits until `stop`
+    stop : callable, optional
+        stop() returns True to end the watch
+    """
+    seen, sizes = set(), {}
+    last_new = time.time()
+    while not (stop is not None and stop()):
+        files = sorted({f for pattern in patterns for f in glob.glob(os.path.join(folder, pattern))})
+        ready = []
+        for f in files:
+            if f in seen:
+                continue
+            try:
+                size = os.path.getsize(f)
+            except OSError:
+                continue
+            if sizes.get(f) == size and size > 0:
+                ready.append(f)
+            sizes[f] = size
+        for f in ready:
+            seen.add(f)
+            sizes.pop(f, None)
+            last_new = time.time()
+            yield f
+        if idle_timeout is not None and time.time() - last_new > idle_timeout:
+            return
+        if not ready:
+            time.sleep(poll)
+
+
+def folder_frames(folder, angle_start=-90.0, angle_interval=1.0, n_total=None, **watch_options):
+    """
+    (image, angle) pairs of the projections arriving in a watch folder.
+
+    Angles stored in .xrm files are used; TIF projections get
+    angle_start + i * angle_interval in arrival order. The watch ends after
+    `n_total` projections if given, see watch_folder for the other options.
+    """
+    for i, path in enumerate(watch_folder(folder, **watch_options)):
+        image, theta = data_io.read_projection(path)
+        yield image, angle_start + i * angle_interval if theta is None else theta
+        if n_total and i + 1 >= n_total:
+            return
@@ -1,3 +1,5 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 
 
@@ -49,16 +51,60 @@ def norm_hs_to_8bit(hs: np.ndarray, clip_lower=0.1, clip_upper=0.1):
     8-bit normalized horizontal sum array
     """
     hs = hs.astype(np.float32)
-    
-    for i in range(hs.shape[0]):
-        vmin = np.percentile(hs[i], clip_lower)
-        vmax = np.percentile(hs[i], 100 - clip_upper)
-        hs[i, :] = (hs[i, :] - vmin) / (vmax - vmin)
-        hs[i, :] = np.clip(hs[i, :], 0, 1)
+
+    # clip points of every row in one call
+    vmin = np.percentile(hs, clip_lower, axis=1, keepdims=True)
+    vmax = np.percentile(hs, 100 - clip_upper, axis=1, keepdims=True)
+    vmax = np.where(vmax == vmin, vmin + 1e-7, vmax)
+    hs = (hs - vmin) / (vmax - vmin)
+    hs = np.clip(hs, 0, 1)
     hs = (hs * 255).astype(np.uint8)
     return hs
 
 
+def norm_stack_to_8bit(imgs: np.ndarray, clip_lower=0.1, clip_upper=0.1, inverse=False, n_workers=None, chunk_size=16):
+    """
+    clip every frame of a stack by its own percentiles and normalize to 8-bit.
+
+    Equivalent to calling norm_to_8bit on each frame, but the clip points of a
+    whole chunk are computed in one vectorized call and chunks are filled in
+    parallel.
+
+    Parameters
+    ----------
+    imgs: input stack of shape (N, H, W)
+    clip_lower: lower clip percentile (darkest pixels)
+    clip_upper: upper clip percentile (brightest pixels)
+    inverse: whether to invert
+    n_workers: number of threads, default os.cpu_count()
+    chunk_size: number of frames per task
+
+    Returns
+    -------
+    8-bit normalized stack of shape (N, H, W)
+    """
+    out = np.empty(imgs.shape, dtype=np.uint8)
+
+    def fill(start):
+        chunk = imgs[start:start + chunk_size]
+        # both clip points from a single partition per frame; keep the dtype a
+        # scalar percentile would return so the result matches norm_to_8bit
+        vmin, vmax = np.percentile(chunk, [clip_lower, 100 - clip_upper], axis=(1, 2), keepdims=True)
+        if np.issubdtype(chunk.dtype, np.floating):
+            vmin, vmax = vmin.astype(chunk.dtype), vmax.astype(chunk.dtype)
+        # Avoid division by zero.
+        vmax = np.where(vmax == vmin, vmin + 1e-7, vmax)
+        chunk = np.clip((chunk - vmin) / (vmax - vmin), 0, 1)
+        if inverse:
+            chunk = 1 - chunk
+        out[start:start + chunk_size] = (chunk * 255).astype(np.uint8)
+
+    n_workers = n_workers or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=n_workers) as pool:
+        list(pool.map(fill, range(0, len(imgs), chunk_size)))
+    return out
+
+
 def split_mosaic(img: np.ndarray, rows: int, cols: int):
     if img.ndim == 2:
         img = img[None, ...]
@@ -97,19 +143,116 @@ def mosaic_stitching(patches: np.ndarray, rows: int, cols: int):
     return mosaic
 
 
-def find_duplicate_angles(thetas: np.ndarray):
+def find_duplicate_angles(thetas: np.ndarray, tol=0.05):
     """
     回傳重複角度的索引集合（例如 [[idx1, idx2], [idx3, idx4, idx5], ...]）。
-    """
-    from collections import defaultdict
-    bucket = defaultdict(list)
-    for idx, t in enumerate(thetas):
-        bucket[t].append(idx)
 
-    duplicates = [v for v in bucket.values() if len(v) > 1]
+    角度排序後依序掃描，與該組第一個角度相差不大於 tol 者視為同一組，
+    因此一組的角度範圍不超過 tol，細密取樣的角度不會串成一組。
+
+    Parameters
+    ----------
+    thetas : np.ndarray
+        array of angles in degrees
+    tol : float
+        maximum angle span (degrees) of a group
+
+    Returns
+    -------
+    list of list of int
+        groups of indices sorted by angle; indices in a group are ascending
+    """
+    thetas = np.asarray(thetas)
+    order = np.argsort(thetas, kind='stable')
+    sorted_thetas = thetas[order]
+    breaks, group_start = [], None
+    for i, theta in enumerate(sorted_thetas):
+        if group_start is None or theta - group_start > tol:
+            if group_start is not None:
+                breaks.append(i)
+            group_start = theta
+    groups = np.split(order, breaks)
+    duplicates = [sorted(g.tolist()) for g in groups if len(g) > 1]
     return duplicates
 
 
+def image_quality_metrics(images: np.ndarray, ref=None, saturation_level=None):
+    """
+    vectorized quality metrics of a stack of candidate projections.
+
+    Parameters
+    ----------
+    images : np.ndarray
+        raw images of shape (N, H, W)
+    ref : np.ndarray, optional
+        reference image for flat-field correction
+    saturation_level : float, optional
+        pixel value regarded as saturated; defaults to the integer dtype
+        maximum, or to the stack maximum for float images
+
+    Returns
+    -------
+    dict of np.ndarray
+        'sharpness': gradient energy relative to the mean intensity,
+        'transmission': mean flat-field corrected intensity,
+        'saturation': fraction of saturated pixels,
+        'score': combined score (higher is better)
+    """
+    raw = np.asarray(images)
+    if saturation_level is None:
+        if np.issubdtype(raw.dtype, np.integer):
+            saturation_level = np.iinfo(raw.dtype).max
+        else:
+            saturation_level = raw.max()
+    saturation = (raw >= saturation_level).mean(axis=(1, 2))
+
+    imgs = raw.astype(np.float32)
+    if ref is not None:
+        if ref.shape != imgs.shape[1:]:
+            ref = image_resize(ref, imgs.shape[-1])
+        imgs = imgs / np.maximum(ref.astype(np.float32), 1e-6)
+    transmission = imgs.mean(axis=(1, 2))
+
+    gy = np.diff(imgs, axis=1)
+    gx = np.diff(imgs, axis=2)
+    energy = (gy**2).mean(axis=(1, 2)) + (gx**2).mean(axis=(1, 2))
+    sharpness = energy / np.maximum(transmission, 1e-12)**2
+
+    score = (sharpness / max(sharpness.max(), 1e-12)) * \
+            (transmission / max(transmission.max(), 1e-12)) * (1 - saturation)
+    return {'sharpness': sharpness, 'transmission': transmission, 'saturation': saturation, 'score': score}
+
+
+def auto_select_duplicates(images: np.ndarray, duplicates, ref=None, n_workers=None):
+    """
+    score all candidates of every duplicate group in parallel and pick the best one.
+
+    Parameters
+    ----------
+    images : np.ndarray
+        raw images of shape (N, H, W)
+    duplicates : list of list of int
+        duplicate groups from find_duplicate_angles
+    ref : np.ndarray, optional
+        reference image for flat-field correction
+    n_workers : int, optional
+        number of threads, default os.cpu_count()
+
+    Returns
+    -------
+    tuple (choices, metrics)
+        choices : list of int
+            position of the chosen candidate within each group
+        metrics : list of dict
+            image_quality_metrics of each group
+    """
+    n_workers = n_workers or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=n_workers) as pool:
+        metrics = list(pool.map(lambda g: image_quality_metrics(images[g], ref), duplicates))
+    choices = [int(np.argmax(m['score'])) for m in metrics]
+    return choices, metrics
+
+
 def angle_sort(images: np.ndarray, thetas: np.ndarray):
     """
     根據角度對影像和角度進行排序。
@@ -127,10 +270,97 @@ def image_resize(img, size):
     return np.array(img)
 
 
-def common_line_method(features, search_range=150, c_line='center', similarity_mode='gradient'):
+def resampling_matrix(n_in: int, n_out: int, a=3):
+    """
+    dense 1D Lanczos resampling matrix.
+
+    Pixel centres are aligned as in PIL (output i samples input
+    (i + 0.5) * n_in / n_out - 0.5) and the kernel is stretched by the scale
+    factor when downsampling, so it also acts as the anti-aliasing filter.
+
+    Parameters
+    ----------
+    n_in, n_out : int
+        input and output length
+    a : int
+        Lanczos window size
+
+    Returns
+    -------
+    np.ndarray
+        float32 matrix of shape (n_out, n_in) whose rows sum to 1
+    """
+    scale = n_in / n_out
+    support = max(scale, 1.0)
+    centers = (np.arange(n_out) + 0.5) * scale - 0.5
+    x = (np.arange(n_in)[None, :] - centers[:, None]) / support
+    weights = np.sinc(x) * np.sinc(x / a)
+    weights[np.abs(x) >= a] = 0
+    weights /= weights.sum(axis=1, keepdims=True)
+    return weights.astype(np.float32)
+
+
+def resample_stack(images: np.ndarray, size: int, rows=None):
+    """
+    resample every image of a stack to (size, size) at once.
+
+    Each axis uses block-mean binning when its length is an integer multiple of
+    `size`, otherwise a separable Lanczos resampler applied as matrix products
+    over the whole stack. Only the input rows that the requested output rows
+    depend on are read.
+
+    Parameters
+    ----------
+    images : np.ndarray
+        stack of shape (N, H, W)
+    size : int
+        output height and width
+    rows : array-like, optional
+        output rows to compute, default all
+
+    Returns
+    -------
+    np.ndarray
+        float32 array of shape (N, len(rows), size)
+    """
+    n, h, w = images.shape
+    rows = np.arange(size) if rows is None else np.asarray(rows, dtype=int)
+
+    if h % size == 0:
+        f = h // size
+        if len(rows) and np.all(np.diff(rows) == 1):
+            selected = images[:, rows[0] * f:(rows[-1] + 1) * f, :]  # view, no copy
+        else:
+            selected = images[:, (rows[:, None] * f + np.arange(f)).ravel(), :]
+        out = selected.reshape(n, len(rows), f, w).mean(axis=2, dtype=np.float32)
+    else:
+        ry = resampling_matrix(h, size)[rows]
+        used = np.flatnonzero(ry.any(axis=0))
+        lo, hi = used[0], used[-1] + 1
+        out = np.matmul(ry[:, lo:hi], images[:, lo:hi, :].astype(np.float32))
+
+    return resample_rows(out, size)
+
+
+def resample_rows(rows: np.ndarray, size: int):
+    """
+    resample the last axis of `rows` (e.g. detector rows of shape (..., W))
+    to `size` samples, the horizontal step of resample_stack.
+    """
+    w = rows.shape[-1]
+    if w % size == 0:
+        return rows.reshape(*rows.shape[:-1], size, w // size).mean(axis=-1)
+    return rows @ resampling_matrix(w, size).T
+
+
+def common_line_method(features, search_range=150, c_line='center', similarity_mode='gradient', subpixel=False):
     '''
     Align tomography vertical shift using common line method.
 
+    The normalized cross-correlation between every projection profile and the
+    reference common line is evaluated for all circular shifts at once with
+    FFTs, so the cost no longer grows with `search_range`.
+
     Parameters:
     -----------
     features: np.ndarray
@@ -142,17 +372,17 @@ def common_line_method(features, search_range=150, c_line='center', similarity_m
         'average' or 'center' - how to calculate reference common line
     similarity_mode: str
         'sum' or 'gradient' - use horizontal sum or its gradient for similarity
+    subpixel: bool
+        refine the correlation peak with a parabolic fit and return float shifts
 
     Returns:
     --------
-    aligned_tomo: numpy array
-        vertically aligned tomography
     shifts: numpy array
-        vertical shift for each projection
+        vertical shift for each projection (int, or float if subpixel=True)
     '''
+    features = np.asarray(features, dtype=np.float64)
     n_proj, size = features.shape
 
-
     # Apply gradient if needed
     if similarity_mode == 'gradient':
         features = np.gradient(features, axis=1)
@@ -163,29 +393,67 @@ def common_line_method(features, search_range=150, c_line='center', similarity_m
     elif c_line == 'center':
         c_line = features[n_proj//2]
 
-    # Grid search for best vertical shift
-    shifts = np.zeros(n_proj, dtype=int)
+    corr = normalized_circular_correlation(features, c_line)
 
-    for i in range(n_proj):
-        best_shift = 0
-        best_score = -np.inf
+    # Candidate shifts in search order; argmax keeps the first maximum like the
+    # original grid search did.
+    candidates = np.arange(-search_range, search_range + 1)
+    scores = corr[:, candidates % size]
+    valid = np.isfinite(scores).all(axis=1)
+    best = np.argmax(np.where(np.isfinite(scores), scores, -np.inf), axis=1)
+    shifts = candidates[best]
+    shifts[~valid] = 0
 
-        # Search in range [-search_range, search_range]
-        for shift in range(-search_range, search_range + 1):
-            signal1 = np.roll(features[i], shift, axis=0)
+    if not subpixel:
+        return shifts.astype(int)
 
-            # Normalize both signals
-            signal1 = signal1 - np.mean(signal1)
-            signal2 = c_line - np.mean(c_line)
+    offsets = _parabolic_peak_offset(corr, shifts % size)
+    offsets[~valid] = 0.
+    return shifts + offsets
 
-            # Compute correlation coefficient
-            correlation = np.sum(signal1 * signal2) / (np.sqrt(np.sum(signal1**2)) * np.sqrt(np.sum(signal2**2)))
 
-            # Update best shift if this is better
-            if correlation > best_score:
-                best_score = correlation
-                best_shift = shift
+def normalized_circular_correlation(signals, reference):
+    """
+    Normalized cross-correlation of each signal with the reference for every circular shift.
 
-        shifts[i] = best_shift
+    Parameters
+    ----------
+    signals : np.ndarray
+        array of shape (N, L)
+    reference : np.ndarray
+        array of shape (L,), or (N, L) for one reference per signal
 
-    return shifts
\ No newline at end of file
+    Returns
+    -------
+    np.ndarray
+        array of shape (N, L); element [i, s] is the correlation coefficient
+        between np.roll(signals[i], s) and the reference.
+    """
+    signals = np.atleast_2d(signals)
+    size = signals.shape[-1]
+    signals = signals - signals.mean(axis=-1, keepdims=True)
+    reference = reference - reference.mean(axis=-1, keepdims=True)
+
+    spec_sig = np.fft.rfft(signals, axis=-1)
+    spec_ref = np.fft.rfft(reference, axis=-1)
+    corr = np.fft.irfft(spec_ref * np.conj(spec_sig), n=size, axis=-1)
+
+    norm = np.sqrt((signals**2).sum(axis=-1)) * np.sqrt((reference**2).sum(axis=-1))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr = corr / norm[:, None]
+    return corr
+
+
+def _parabolic_peak_offset(corr, peaks):
+    """
+    sub-pixel offset of the correlation peak from a parabola through its two neighbours.
+    """
+    size = corr.shape[-1]
+    rows = np.arange(corr.shape[0])
+    c0 = corr[rows, (peaks - 1) % size]
+    c1 = corr[rows, peaks]
+    c2 = corr[rows, (peaks + 1) % size]
+    denom = c0 - 2 * c1 + c2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        offset = np.where(denom < 0, 0.5 * (c0 - c2) / denom, 0.)
+    return np.clip(np.nan_to_num(offset), -0.5, 0.5)
@@ -0,0 +1,210 @@
+import os
+import numpy as np
+from PyQt5.QtCore import QThread, pyqtSignal
+from src.logic.fbp import FBPReconstructor, CenterSweep, progressive_stages, stage_label, to_uint8
+
+
+class FBPWorker(QThread):
+    progress = pyqtSignal(int, str)
+    finished = pyqtSignal(np.ndarray)
+    engine_class = FBPReconstructor
+
+    def __init__(self, *args, **kwargs):
+        """
+        FBP worker thread for reconstruction，重建本身由 engine_class（預設 FBPReconstructor）執行，參數同該類別。
+        """
+        super().__init__()
+        self.engine = self.engine_class(*args, progress=self.progress.emit, **kwargs)
+
+    @property
+    def is_cancelled(self):
+        return self.engine.is_cancelled
+
+    def cancel(self):
+        self.engine.cancel()
+
+    def run(self):
+        recon = self.engine.reconstruct()
+        if not self.is_cancelled:
+            self.finished.emit(to_uint8(recon))
+
+
+class ProgressiveFBPWorker(FBPWorker):
+    preview = pyqtSignal(np.ndarray, str)
+
+    def __init__(self, *args, n_stages=3, min_size=32, **kwargs):
+        """
+        由粗到細的漸進式 FBP：先以抽取的角度子集與低解析度快速重建，再逐步加倍角度與解析度。
+        每個中間結果以 preview 送出，最後結果以 finished 送出。參數同 FBPWorker。
+        Args:
+            n_stages: 階段數（最後一階段為完整角度與目標解析度）
+            min_size: 第一階段的最小解析度
+        """
+        super().__init__(*args, **kwargs)
+        self.stages = progressive_stages(self.engine.target_size, n_stages, min_size)
+
+    @property
+    def stage(self):
+        return self.engine.stage
+
+    def run(self):
+        last = len(self.stages) - 1
+        for k, recon in self.engine.iter_stages(self.stages):
+            if k < last:
+                self.preview.emit(to_uint8(recon), self.stage_label(k))
+            else:
+                self.finished.emit(to_uint8(recon))
+
+    def stage_label(self, k):
+        return stage_label(self.stages, k)
+
+
+class IterativeWorker(FBPWorker):
+    """OS-EM / SIRT 迭代重建執行緒，參數同 IterativeReconstructor。"""
+    @property
+    def engine_class(self):
+        from src.logic.recon_iterative import IterativeReconstructor
+        return IterativeReconstructor
+
+
+class CenterSweepWorker(QThread):
+    progress = pyqtSignal(int, str)
+    finished = pyqtSignal(np.ndarray, np.ndarray)
+    def __init__(self, *args, **kwargs):
+        """旋轉中心搜尋執行緒，參數同 CenterSweep。"""
+        super().__init__()
+        self.engine = CenterSweep(*args, progress=self.progress.emit, **kwargs)
+
+    def cancel(self):
+        self.engine.cancel()
+
+    def run(self):
+        result = self.engine.run()
+        if result is not None:
+            self.finished.emit(*result)
+
+
+class StreamingFBPWorker(QThread):
+    progress = pyqtSignal(int, str)
+    preview = pyqtSignal(np.ndarray, str)
+    finished = pyqtSignal(np.ndarray)
+
+    def __init__(self, frames, *args, n_total=None, interval=0.25, **kwargs):
+        """
+        投影到達時即時重建選定切片（StreamingReconstructor），不需等整個堆疊載入。
+        約每 interval 秒以 preview 送出目前的浮點數切片，讀完或停止後以 finished 送出。
+        Args:
+            frames: (影像, 角度) 序列，例如 txrm_frames 或 folder_frames
+            n_total: 預期的投影數（進度百分比用），可為 None
+            interval: 預覽更新的最短間隔（秒）
+            其餘參數同 StreamingReconstructor
+        """
+        super().__init__()
+        from src.logic.streaming import StreamingReconstructor
+        self.frames = frames
+        self.n_total = n_total
+        self.interval = interval
+        self.engine = StreamingReconstructor(*args, progress=self.progress.emit, **kwargs)
+
+    @property
+    def is_cancelled(self):
+        return self.engine.is_cancelled
+
+    def cancel(self):
+        self.engine.cancel()
+
+    def run(self):
+        for recon, text in self.engine.iter_previews(self.frames, self.n_total, self.interval):
+            self.preview.emit(recon, text)
+        if self.engine.n_projections:
+            self.finished.emit(self.engine.preview())
+
+
+class AlignWorker(QThread):
+    progress = pyqtSignal(int, str)
+    finished = pyqtSignal(np.ndarray)
+    methods = {'multiscale': 'multiscale_align', 'phase_correlation': 'phase_correlation_align'}
+
+    def __init__(self, method, images, **options):
+        """
+        在背景執行緒估計投影位移（src.logic.alignment），完成後以 finished 送出 (N, 2) 的 (dy, dx)；取消時不送出。
+        Args:
+            method: 'multiscale' 或 'phase_correlation'
+            images: 投影影像 (N, H, W)
+            options: 對齊函式的其餘參數，例如 angles、max_shift
+        """
+        super().__init__()
+        from src.logic import alignment
+        self.align = getattr(alignment, self.methods[method])
+        self.images = images
+        self.options = options
+        self.is_cancelled = False
+
+    def cancel(self):
+        self.is_cancelled = True
+
+    def run(self):
+        shifts = self.align(self.images, progress=self.progress.emit, stop=lambda: self.is_cancelled, **self.options)
+        if shifts is not None and not self.is_cancelled:
+            self.finished.emit(np.asarray(shifts))
+
+class SliceBuildWorker(QThread):
+    finished = pyqtSignal(object)
+
+    def __init__(self, rows, angles, *args, **kwargs):
+        """
+        在背景執行緒以所有投影重建 StreamingReconstructor 的切片（例如 AlignViewer 的即時切片），
+        完成後以 finished 送出 StreamingReconstructor；取消時送出 None。
+        Args:
+            rows: 每個投影的偵測器列 (N, W)
+            angles: 投影角度（度）
+            其餘參數同 StreamingReconstructor
+        """
+        super().__init__()
+        from src.logic.streaming import StreamingReconstructor
+        self.rows = rows
+        self.angles = angles
+        self.engine = StreamingReconstructor(*args, **kwargs)
+
+    @property
+    def is_cancelled(self):
+        return self.engine.is_cancelled
+
+    def cancel(self):
+        self.engine.cancel()
+
+    def run(self):
+        for row, angle in zip(self.rows, self.angles):
+            if self.is_cancelled:
+                break
+            self.engine.add_rows(row[None], angle)
+        self.finished.emit(None if self.is_cancelled else self.engine)
+
+class JobSubmitWorker(QThread):
+    finished = pyqtSignal(str)
+    failed = pyqtSignal(str)
+
+    def __init__(self, images, spec):
+        """
+        在背景執行緒把投影存成 spec['stack'] (.npy) 並送到本機工作伺服器，避免大型堆疊寫檔時介面停住。
+        成功時以 finished 送出 job id；失敗時刪除輸入檔並以 failed 送出錯誤訊息。
+        Args:
+            images: 投影影像 (N, H, W)
+            spec: 工作設定，見 jobs.run_job
+        """
+        super().__init__()
+        self.images = images
+        self.spec = spec
+
+    def run(self):
+        from src.logic import jobs
+        stack = self.spec['stack']
+        try:
+            np.save(stack, self.images)
+            job_id = jobs.submit_job(self.spec)
+        except Exception as e:
+            if os.path.exists(stack):
+                os.remove(stack)
+            self.failed.emit(str(e))
+            return
+        self.finished.emit(job_id)
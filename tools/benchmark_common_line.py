@@ -0,0 +1,89 @@
+"""
+Common-line benchmark: the original np.roll grid search vs the FFT version.
+
+    python tools/benchmark_common_line.py                   # 361 projections, 1024 rows
+    python tools/benchmark_common_line.py --proj 721 --height 2048 --search 300 -n 3
+
+Both implementations align the same synthetic horizontal-sum profiles
+(a random profile with known vertical shifts plus noise) for every
+reference / similarity mode; the integer shifts must be identical.
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def common_line_loop(features, search_range=150, c_line='center', similarity_mode='gradient'):
+    """the grid search common_line_method used before it was vectorized."""
+    n_proj, size = features.shape
+    if similarity_mode == 'gradient':
+        features = np.gradient(features, axis=1)
+    if c_line == 'average':
+        c_line = features.mean(axis=0)
+    elif c_line == 'center':
+        c_line = features[n_proj // 2]
+
+    shifts = np.zeros(n_proj, dtype=int)
+    for i in range(n_proj):
+        best_shift = 0
+        best_score = -np.inf
+        for shift in range(-search_range, search_range + 1):
+            signal1 = np.roll(features[i], shift, axis=0)
+            signal1 = signal1 - np.mean(signal1)
+            signal2 = c_line - np.mean(c_line)
+            correlation = np.sum(signal1 * signal2) / (np.sqrt(np.sum(signal1**2)) * np.sqrt(np.sum(signal2**2)))
+            if correlation > best_score:
+                best_score = correlation
+                best_shift = shift
+        shifts[i] = best_shift
+    return shifts
+
+
+def synthetic_profiles(n_proj, height, max_shift, seed=0):
+    rng = np.random.default_rng(seed)
+    base = np.convolve(rng.random(height), np.ones(15) / 15, mode='same')
+    true_shifts = rng.integers(-max_shift, max_shift + 1, n_proj)
+    profiles = np.stack([np.roll(base, s) for s in true_shifts])
+    return profiles + rng.normal(0, 0.01, profiles.shape)
+
+
+def best_of(runs, func):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--runs", type=int, default=1, help="repetitions of the loop version (best is kept)")
+    parser.add_argument("--proj", type=int, default=361, help="number of projections")
+    parser.add_argument("--height", type=int, default=1024, help="profile length (image height)")
+    parser.add_argument("--search", type=int, default=150, help="search range in pixels")
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    from src.logic.utils import common_line_method
+
+    features = synthetic_profiles(args.proj, args.height, args.search // 2)
+    print(f"{args.proj} profiles of {args.height} px, search range ±{args.search}")
+    print(f"{'mode':>16} {'loop [s]':>10} {'fft [s]':>10} {'speed-up':>9} {'identical':>10}")
+    ok = True
+    for c_line in ('center', 'average'):
+        for mode in ('gradient', 'sum'):
+            t_loop, ref = best_of(args.runs, lambda: common_line_loop(features, args.search, c_line, mode))
+            t_fft, out = best_of(max(args.runs, 5), lambda: common_line_method(features, args.search, c_line, mode))
+            same = np.array_equal(out, ref)
+            ok &= same
+            print(f"{c_line + '/' + mode:>16} {t_loop:>10.3f} {t_fft:>10.4f} {t_loop / t_fft:>8.0f}x {str(same):>10}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""
+Startup-time benchmark of the GUI.
+
+    python tools/benchmark_startup.py              # 5 cold launches
+    python tools/benchmark_startup.py -n 10 --size 2048
+
+Every run starts a fresh interpreter and reports
+  launch        : process start -> first main window painted (wall clock, from the parent)
+  first window  : `import app` + QApplication + TXM_ToolBox().show() inside the child
+  first image   : a (N, size, size) stack handed to the window -> first image painted
+Use QT_QPA_PLATFORM=offscreen on machines without a display.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def child(n_images, size):
+    t0 = time.perf_counter()
+    sys.path.insert(0, ROOT)
+    from PyQt5.QtWidgets import QApplication
+    import app
+
+    qt_app = QApplication(sys.argv)
+    window = app.TXM_ToolBox()
+    window.show()
+    qt_app.processEvents()
+    t_window = time.perf_counter()
+
+    import numpy as np
+    images = np.random.default_rng(0).integers(0, 65535, (n_images, size, size), dtype=np.uint16)
+    t1 = time.perf_counter()
+    window.context.set_from_file("benchmark.txrm", 'tomo')
+    window.context.images = app.TXM_Images(images, 'tomo', angles=np.linspace(-90, 90, n_images))
+    window.update_env()
+    qt_app.processEvents()
+    t_image = time.perf_counter()
+
+    print(json.dumps({'first_window': t_window - t0, 'stack': t1 - t_window, 'first_image': t_image - t1}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--runs", type=int, default=5)
+    parser.add_argument("--images", type=int, default=181, help="projections of the synthetic stack")
+    parser.add_argument("--size", type=int, default=1024, help="image size of the synthetic stack")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.images, args.size)
+        return
+
+    rows = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child",
+                              "--images", str(args.images), "--size", str(args.size)],
+                             capture_output=True, text=True, check=True)
+        wall = time.perf_counter() - start
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        # the child exits after painting the image; subtract that part for the launch time
+        launch = wall - result['stack'] - result['first_image']
+        rows.append((launch, result['first_window'], result['first_image']))
+
+    print(f"{'run':>4} {'launch [s]':>11} {'first window [s]':>17} {'first image [s]':>16}")
+    for i, row in enumerate(rows):
+        print(f"{i + 1:>4} {row[0]:>11.3f} {row[1]:>17.3f} {row[2]:>16.3f}")
+    med = [sorted(col)[len(col) // 2] for col in zip(*rows)]
+    print(f"{'med':>4} {med[0]:>11.3f} {med[1]:>17.3f} {med[2]:>16.3f}")
+
+
+if __name__ == "__main__":
+    main()